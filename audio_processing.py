@@ -0,0 +1,250 @@
+"""Audio post-processing shared by the local engines (Kokoro, Chatterbox).
+
+Every segment an engine produces goes through one AudioPostProcessor on its
+way to the WAV file: optional leading/trailing silence trimming, peak or
+loudness normalization, resampling, then clipping and conversion to 16-bit
+PCM. The processor owns its work buffers and reuses them from segment to
+segment (growing only when a longer segment arrives), so an hour of audio is
+converted without allocating temporaries per segment. borrow_post_processor()
+hands out processors from a small pool per sample rate and settings, so later
+requests reuse the buffers of earlier ones instead of allocating their own.
+
+Settings come from the environment (see post_processor_from_env); with none
+set, segments are only clipped and rounded to PCM.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+NORMALIZE_MODES = ("peak", "loudness")
+
+DEFAULT_TARGET_PEAK = 0.95
+DEFAULT_TARGET_LOUDNESS_DB = -20.0
+DEFAULT_MAX_GAIN_DB = 20.0
+DEFAULT_TRIM_THRESHOLD_DB = -50.0
+DEFAULT_TRIM_PAD_MS = 30
+RESAMPLE_TABLE_BLOCK = 1 << 20
+# Idle processors kept per (sample rate, settings), and the largest buffers
+# (in seconds of input) a processor may hold to be kept
+MAX_IDLE_PROCESSORS = 4
+MAX_POOLED_SECONDS = 60
+PCM_MAX = 32767.0
+
+
+def db_to_amplitude(db):
+    return 10.0 ** (db / 20.0)
+
+
+class AudioPostProcessor:
+    """Converts float segments to PCM16 in place on preallocated buffers
+
+    normalize is None, "peak" (scale the segment peak to target_peak) or
+    "loudness" (scale the RMS level to target_loudness_db dBFS, never pushing
+    the peak past target_peak). Normalization is per segment, which also
+    evens out level differences between long-form chunks. Resampling uses
+    linear interpolation, which is adequate for speech.
+    """
+
+    def __init__(self, sample_rate, output_rate=None, normalize=None, target_peak=DEFAULT_TARGET_PEAK,
+                 target_loudness_db=DEFAULT_TARGET_LOUDNESS_DB, max_gain_db=DEFAULT_MAX_GAIN_DB,
+                 trim_silence=False, trim_threshold_db=DEFAULT_TRIM_THRESHOLD_DB, trim_pad_ms=DEFAULT_TRIM_PAD_MS):
+        if normalize is not None and normalize not in NORMALIZE_MODES:
+            raise ValueError(f"normalize must be one of {NORMALIZE_MODES} or None, not {normalize!r}")
+        self.sample_rate = int(sample_rate)
+        self.output_rate = int(output_rate or sample_rate)
+        self.normalize = normalize
+        self.target_peak = float(target_peak)
+        self.target_rms = db_to_amplitude(target_loudness_db)
+        self.max_gain = db_to_amplitude(max_gain_db)
+        self.trim_silence = trim_silence
+        self.trim_threshold = db_to_amplitude(trim_threshold_db)
+        self.trim_pad = int(self.sample_rate * trim_pad_ms / 1000)
+        self._ratio = self.sample_rate / self.output_rate
+        self._capacity = 0
+        self._ensure_capacity(self.sample_rate * 10)
+
+    @property
+    def capacity(self):
+        """Longest segment, in input samples, the current buffers hold"""
+        return self._capacity
+
+    def _ensure_capacity(self, n):
+        if n <= self._capacity:
+            return
+        # Grow geometrically so a run of slightly longer segments reallocates rarely
+        capacity = max(n, int(self._capacity * 1.25))
+        # Drop the old buffers first so they are not held alongside the new ones
+        self._work = self._scratch = self._mask = self._pcm = None
+        out_capacity = capacity
+        if self.output_rate != self.sample_rate:
+            self._resample_idx = self._resample_frac = self._resample_a = self._resample_b = None
+            out_capacity = int(capacity / self._ratio) + 2
+            self._resample_idx = np.empty(out_capacity, dtype=np.int32)
+            self._resample_frac = np.empty(out_capacity, dtype=np.float32)
+            # Positions need float64 precision; fill in blocks to bound the temporaries
+            for block_start in range(0, out_capacity, RESAMPLE_TABLE_BLOCK):
+                block_end = min(out_capacity, block_start + RESAMPLE_TABLE_BLOCK)
+                positions = np.arange(block_start, block_end, dtype=np.float64) * self._ratio
+                whole = np.floor(positions)
+                self._resample_idx[block_start:block_end] = whole
+                self._resample_frac[block_start:block_end] = positions - whole
+            self._resample_a = np.empty(out_capacity, dtype=np.float32)
+            self._resample_b = np.empty(out_capacity, dtype=np.float32)
+        else:
+            self._work = np.empty(capacity, dtype=np.float32)
+        if self.trim_silence or self.normalize:
+            self._scratch = np.empty(capacity, dtype=np.float32)
+        if self.trim_silence:
+            self._mask = np.empty(capacity, dtype=bool)
+        self._pcm = np.empty(out_capacity, dtype=np.int16)
+        self._capacity = capacity
+
+    def _normalization_gain(self, audio, peak):
+        if self.normalize == "peak":
+            gain = self.target_peak / peak
+        else:
+            rms = float(np.sqrt(np.dot(audio, audio) / len(audio)))
+            gain = min(self.target_rms / rms, self.target_peak / peak) if rms > 0 else 1.0
+        # Don't blow near-silent segments up into noise
+        return min(gain, self.max_gain)
+
+    def _resample(self, audio):
+        n_out = int((len(audio) - 1) / self._ratio) + 1
+        a = self._resample_a[:n_out]
+        b = self._resample_b[:n_out]
+        idx = self._resample_idx[:n_out]
+        np.take(audio, idx, out=a, mode="clip")
+        # Right neighbours: the same indices into the input shifted by one;
+        # mode="clip" repeats the last sample for the final output sample
+        np.take(audio[1:] if len(audio) > 1 else audio, idx, out=b, mode="clip")
+        np.subtract(b, a, out=b)
+        np.multiply(b, self._resample_frac[:n_out], out=b)
+        np.add(a, b, out=a)
+        return a
+
+    def process(self, audio):
+        """Return the processed segment as int16 samples at output_rate
+
+        The result is a view of an internal buffer that the next call
+        overwrites; write it out (or copy it) before processing another
+        segment. A segment that is entirely silence comes back empty when
+        trimming is on. The input is never modified.
+        """
+        audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        n = len(audio)
+        if n == 0:
+            return self._pcm[:0]
+        self._ensure_capacity(n)
+        gain = 1.0
+        peak = None
+
+        if self.trim_silence or self.normalize:
+            magnitude = self._scratch[:n]
+            np.abs(audio, out=magnitude)
+            if self.trim_silence:
+                loud = self._mask[:n]
+                np.greater(magnitude, self.trim_threshold, out=loud)
+                first = int(loud.argmax())
+                if not loud[first]:
+                    return self._pcm[:0]
+                last = n - 1 - int(loud[::-1].argmax())
+                start = max(0, first - self.trim_pad)
+                end = min(n, last + 1 + self.trim_pad)
+                audio = audio[start:end]
+                magnitude = magnitude[start:end]
+            if self.normalize:
+                peak = float(magnitude.max())
+                if peak > 0:
+                    gain = self._normalization_gain(audio, peak)
+
+        # The gain is folded into the PCM scale, so the float data is scaled
+        # in the same pass that writes it into the work buffer
+        if self.output_rate != self.sample_rate:
+            work = self._resample(audio)
+            np.multiply(work, PCM_MAX * gain, out=work)
+        else:
+            work = self._work[:len(audio)]
+            np.multiply(audio, PCM_MAX * gain, out=work)
+
+        # A peak known from normalization proves there is nothing to clamp
+        # (linear interpolation never overshoots); otherwise always clamp
+        if peak is None or peak * gain > 1.0:
+            np.clip(work, -PCM_MAX, PCM_MAX, out=work)
+        pcm = self._pcm[:len(work)]
+        np.copyto(pcm, work, casting="unsafe")
+        return pcm
+
+
+def _env_flag(name):
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def post_processing_settings():
+    """Return the AudioPostProcessor keyword arguments set in the environment
+
+    ``TTS_OUTPUT_SAMPLE_RATE`` resamples the saved audio, ``TTS_NORMALIZE``
+    is "peak" or "loudness" (with ``TTS_LOUDNESS_DB`` as the loudness target)
+    and ``TTS_TRIM_SILENCE=1`` trims leading/trailing silence of each segment.
+    """
+    normalize = os.environ.get("TTS_NORMALIZE", "").strip().lower() or None
+    if normalize in ("off", "none", "0"):
+        normalize = None
+    return {
+        "output_rate": int(os.environ.get("TTS_OUTPUT_SAMPLE_RATE", 0)) or None,
+        "normalize": normalize,
+        "target_loudness_db": float(os.environ.get("TTS_LOUDNESS_DB", DEFAULT_TARGET_LOUDNESS_DB)),
+        "trim_silence": _env_flag("TTS_TRIM_SILENCE"),
+    }
+
+
+def post_processing_cache_params():
+    """Return the post-processing settings that change the saved audio, for cache keys
+
+    Empty when nothing is set, so entries made with the defaults keep their keys.
+    """
+    settings = post_processing_settings()
+    params = {}
+    if settings["output_rate"]:
+        params["output_rate"] = settings["output_rate"]
+    if settings["normalize"]:
+        params["normalize"] = settings["normalize"]
+        if settings["normalize"] == "loudness":
+            params["loudness_db"] = settings["target_loudness_db"]
+    if settings["trim_silence"]:
+        params["trim_silence"] = True
+    return params
+
+
+def post_processor_from_env(sample_rate):
+    """Build the processor for an engine's native sample_rate from the environment (see post_processing_settings)"""
+    return AudioPostProcessor(sample_rate, **post_processing_settings())
+
+
+_idle_processors = {}  # (sample_rate, settings) -> [AudioPostProcessor]
+_idle_lock = threading.Lock()
+
+
+@contextmanager
+def borrow_post_processor(sample_rate):
+    """Lend a processor configured from the environment for the duration of a with block
+
+    A processor is only ever used by one borrower at a time. It goes back to
+    the pool afterwards unless an unusually long segment grew its buffers.
+    """
+    settings = post_processing_settings()
+    key = (int(sample_rate), tuple(sorted(settings.items())))
+    with _idle_lock:
+        idle = _idle_processors.get(key)
+        processor = idle.pop() if idle else None
+    if processor is None:
+        processor = AudioPostProcessor(sample_rate, **settings)
+    try:
+        yield processor
+    finally:
+        if processor.capacity <= processor.sample_rate * MAX_POOLED_SECONDS:
+            with _idle_lock:
+                idle = _idle_processors.setdefault(key, [])
+                if len(idle) < MAX_IDLE_PROCESSORS:
+                    idle.append(processor)
@@ -0,0 +1,275 @@
+"""Compressed storage for generated audio (FLAC, Opus or MP3 instead of WAV).
+
+Kokoro, Chatterbox and the Mac provider write 16-bit PCM WAV. With
+``TTS_STORAGE_FORMAT`` set, every new WAV is queued to a background encoder
+thread once synthesis has finished, so Submit latency is unchanged. When the
+encoded file is ready, the history entries and synthesis-cache rows pointing
+at the WAV are repointed to it (recording the codec) and the WAV is removed.
+The encoded file keeps the WAV's name stem, so resolve_audio_path() can still
+find audio for a stale filename.
+
+Encoding uses the ``ffmpeg`` command-line tool; without it files stay WAV.
+migrate_audio_storage.py converts an existing archive in bulk.
+"""
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+import traceback
+import wave
+from pathlib import Path
+
+from history_store import get_history_store
+from perf_metrics import get_metrics
+from synthesis_cache import get_synthesis_cache
+
+DEFAULT_STORAGE_FORMAT = "wav"
+
+STORAGE_FORMATS = {
+    "wav": {"extension": ".wav", "codec": "pcm_s16le", "args": None, "bitrate": None},
+    # Lossless, typically about half the size of WAV for speech
+    "flac": {"extension": ".flac", "codec": "flac", "args": ["-c:a", "flac", "-compression_level", "8"], "bitrate": None},
+    # Speech-tuned Opus in an Ogg container: roughly 1/20 of WAV at 32 kbps
+    "opus": {"extension": ".opus", "codec": "opus", "args": ["-c:a", "libopus", "-application", "voip"], "bitrate": "32k"},
+    "mp3": {"extension": ".mp3", "codec": "mp3", "args": ["-c:a", "libmp3lame"], "bitrate": "64k"},
+}
+
+MIME_TYPES = {
+    ".wav": "audio/wav",
+    ".mp3": "audio/mpeg",
+    ".flac": "audio/flac",
+    ".opus": "audio/ogg",
+    ".ogg": "audio/ogg",
+    ".aiff": "audio/aiff",
+    ".aif": "audio/aiff",
+}
+
+CODECS_BY_EXTENSION = {spec["extension"]: spec["codec"] for spec in STORAGE_FORMATS.values()}
+
+# ElevenLabs' default output format is 128 kbps MP3; only used when ffprobe is missing
+MP3_BYTES_PER_SECOND = 128000 / 8
+
+
+def storage_format():
+    """Return the configured storage format name (``TTS_STORAGE_FORMAT``, default wav)"""
+    name = os.environ.get("TTS_STORAGE_FORMAT", DEFAULT_STORAGE_FORMAT).strip().lower() or DEFAULT_STORAGE_FORMAT
+    if name not in STORAGE_FORMATS:
+        print(f"[audio_storage] unknown TTS_STORAGE_FORMAT {name!r}; keeping WAV")
+        return DEFAULT_STORAGE_FORMAT
+    return name
+
+
+def ffmpeg_path():
+    return shutil.which("ffmpeg")
+
+
+def ffprobe_path():
+    # Installed alongside ffmpeg
+    return shutil.which("ffprobe")
+
+
+def audio_mime_type(path):
+    """Return the MIME type to hand st.audio / st.download_button for an audio file"""
+    return MIME_TYPES.get(Path(path).suffix.lower(), "audio/mpeg")
+
+
+def codec_for_path(path):
+    return CODECS_BY_EXTENSION.get(Path(path).suffix.lower(), Path(path).suffix.lstrip(".").lower() or None)
+
+
+def resolve_audio_path(path):
+    """Return path, or its encoded sibling if the WAV has been replaced since path was recorded"""
+    path = Path(path)
+    if path.exists():
+        return path
+    for spec in STORAGE_FORMATS.values():
+        candidate = path.with_suffix(spec["extension"])
+        if candidate.exists():
+            return candidate
+    return path
+
+
+def probe_duration_seconds(path):
+    """Duration of any audio file according to ffprobe, or None without ffprobe or on failure"""
+    ffprobe = ffprobe_path()
+    if ffprobe is None:
+        return None
+    try:
+        result = subprocess.run(
+            [ffprobe, "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1",
+             str(path)],
+            capture_output=True, text=True, timeout=30,
+        )
+        return float(result.stdout.strip()) if result.returncode == 0 else None
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return None
+
+
+def audio_duration_seconds(path):
+    """Duration of a generated file: read from the header for WAV, from ffprobe for compressed formats
+
+    Without ffprobe, MP3 falls back to a size estimate at ElevenLabs' 128 kbps
+    and other formats return None.
+    """
+    path = Path(path)
+    try:
+        if path.suffix.lower() == ".wav":
+            with wave.open(str(path), "rb") as wav_file:
+                return wav_file.getnframes() / float(wav_file.getframerate())
+        duration = probe_duration_seconds(path)
+        if duration is not None:
+            return duration
+        if path.suffix.lower() == ".mp3":
+            return path.stat().st_size / MP3_BYTES_PER_SECOND
+    except Exception:
+        pass
+    return None
+
+
+def encode_wav(wav_path, format_name, bitrate=None):
+    """Encode wav_path next to itself in format_name with ffmpeg and return the new path"""
+    spec = STORAGE_FORMATS[format_name]
+    ffmpeg = ffmpeg_path()
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg is not installed")
+    wav_path = Path(wav_path)
+    target = wav_path.with_suffix(spec["extension"])
+    # Encode to a temporary name so a half-written file is never picked up
+    partial = target.with_name(f"{target.stem}.part{target.suffix}")
+    command = [ffmpeg, "-nostdin", "-hide_banner", "-loglevel", "error", "-y", "-i", str(wav_path)]
+    command += spec["args"]
+    bitrate = bitrate or spec["bitrate"]
+    if bitrate:
+        command += ["-b:a", bitrate]
+    command.append(str(partial))
+    try:
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {result.stderr.strip() or result.returncode}")
+        os.replace(partial, target)
+    finally:
+        if partial.exists():
+            partial.unlink()
+    return target
+
+
+class AudioEncoder:
+    """Single background thread re-encoding finished WAV files"""
+
+    def __init__(self, audio_dir, format_name, bitrate=None):
+        self.audio_dir = Path(audio_dir)
+        self.format_name = format_name
+        self.bitrate = bitrate
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.encoded = 0
+        self.failed = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+
+    def submit(self, filename):
+        """Queue filename (relative to audio_dir) for encoding"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name="audio-encoder", daemon=True)
+                self._thread.start()
+        self._queue.put(filename)
+
+    def wait(self):
+        """Block until every queued file has been processed"""
+        self._queue.join()
+
+    def encode_and_replace(self, filename, keep_original=False):
+        """Encode one WAV, repoint history and cache rows to it, and remove the WAV
+
+        Returns (bytes_before, bytes_after), or None if there was no WAV to encode.
+        """
+        source = self.audio_dir / filename
+        if source.suffix.lower() != ".wav" or not source.exists():
+            return None
+        bytes_before = source.stat().st_size
+        start = time.perf_counter()
+        target = encode_wav(source, self.format_name, self.bitrate)
+        encode_seconds = time.perf_counter() - start
+        bytes_after = target.stat().st_size
+        # Encoding happens after the request, so it is not tied to a provider here
+        get_metrics().observe("", "encode", encode_seconds)
+
+        history_store = get_history_store(self.audio_dir)
+        updates = {
+            "codec": STORAGE_FORMATS[self.format_name]["codec"],
+            "encoded_bytes": bytes_after,
+            "encode_seconds": round(encode_seconds, 4),
+        }
+        history_store.rename_file(filename, target.name, updates)
+        get_synthesis_cache(self.audio_dir).rename_file(filename, target.name)
+        if not keep_original:
+            source.unlink()
+            # A cache hit recorded between the rename and the unlink may still
+            # name the WAV; repoint it too
+            history_store.rename_file(filename, target.name, updates)
+
+        with self._lock:
+            self.encoded += 1
+            self.bytes_before += bytes_before
+            self.bytes_after += bytes_after
+        return bytes_before, bytes_after
+
+    def _worker(self):
+        while True:
+            filename = self._queue.get()
+            try:
+                self.encode_and_replace(filename)
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                print(f"[audio_storage] encoding {filename} failed, keeping WAV: {e}")
+                traceback.print_exc()
+            finally:
+                self._queue.task_done()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "format": self.format_name,
+                "encoded": self.encoded,
+                "failed": self.failed,
+                "pending": self._queue.qsize(),
+                "bytes_before": self.bytes_before,
+                "bytes_after": self.bytes_after,
+            }
+
+
+_encoders = {}
+_encoders_lock = threading.Lock()
+_warned_missing_ffmpeg = False
+
+
+def get_audio_encoder(audio_dir, format_name=None):
+    """Return the process-wide encoder for audio_dir, or None when storing WAV (or ffmpeg is missing)"""
+    global _warned_missing_ffmpeg
+    format_name = format_name or storage_format()
+    if format_name == "wav":
+        return None
+    if ffmpeg_path() is None:
+        if not _warned_missing_ffmpeg:
+            _warned_missing_ffmpeg = True
+            print(f"[audio_storage] TTS_STORAGE_FORMAT={format_name} needs ffmpeg on PATH; keeping WAV")
+        return None
+    key = (str(Path(audio_dir).resolve()), format_name)
+    with _encoders_lock:
+        if key not in _encoders:
+            bitrate = os.environ.get("TTS_STORAGE_BITRATE") or None
+            _encoders[key] = AudioEncoder(audio_dir, format_name, bitrate=bitrate)
+        return _encoders[key]
+
+
+def wait_for_pending_encodes():
+    """Block until every background encoder is idle (for command-line tools before exit)"""
+    with _encoders_lock:
+        encoders = list(_encoders.values())
+    for encoder in encoders:
+        encoder.wait()
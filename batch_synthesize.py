@@ -0,0 +1,298 @@
+"""Headless batch synthesis: render a JSONL manifest or a folder of .txt files.
+
+Uses the same provider code as the UI (synthesis.synthesize_to_file), so every
+item lands in saved_audio/ and in the Audio History. Finished items are
+appended to a state file as they complete; rerunning the same command skips
+them, so an interrupted overnight run resumes where it stopped.
+
+    python batch_synthesize.py prompts.jsonl --provider kokoro --workers 4
+    python batch_synthesize.py chapters/ --provider chatterbox --long-form
+    python batch_synthesize.py books/ --provider chatterbox --constant-memory
+
+Each manifest line is a JSON object with a "text" field and optionally an
+"id" plus any per-item setting: provider, speed, voice_id, model_id,
+voice_settings, audio_prompt_path, long_form, constant_memory, kokoro_voice,
+kokoro_lang, kokoro_backend, chatterbox_exaggeration, chatterbox_cfg_weight,
+chatterbox_temperature, chatterbox_profile.
+Command-line options give the defaults for fields an item leaves out.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from audio_storage import audio_duration_seconds, resolve_audio_path, wait_for_pending_encodes
+from cancellation import SynthesisCancelled, cancellation_scope
+from engine_registry import CHATTERBOX_PROVIDER, KOKORO_PROVIDER
+from inference_profiles import PROFILES
+from onnx_kokoro import KOKORO_BACKENDS
+from synthesis import DEFAULT_AUDIO_DIR, ELEVENLABS_PROVIDER, MAC_PROVIDER, SynthesisError, synthesize_to_file
+
+PROVIDER_ALIASES = {
+    "mac": MAC_PROVIDER,
+    "elevenlabs": ELEVENLABS_PROVIDER,
+    "kokoro": KOKORO_PROVIDER,
+    "chatterbox": CHATTERBOX_PROVIDER,
+}
+
+# Manifest fields passed straight through to synthesize_to_file
+ITEM_SETTINGS = (
+    "voice_id",
+    "model_id",
+    "audio_prompt_path",
+    "long_form",
+    "constant_memory",
+    "kokoro_voice",
+    "kokoro_lang",
+    "kokoro_backend",
+    "chatterbox_exaggeration",
+    "chatterbox_cfg_weight",
+    "chatterbox_temperature",
+    "chatterbox_profile",
+)
+
+
+def resolve_provider(name):
+    provider = PROVIDER_ALIASES.get(str(name).strip().lower(), name)
+    if provider not in PROVIDER_ALIASES.values():
+        raise ValueError(f"Unknown provider {name!r}; use one of {', '.join(PROVIDER_ALIASES)}")
+    return provider
+
+
+def load_manifest(path):
+    """Yield (item_id, item) from a JSONL manifest; item_id defaults to the line number"""
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON ({e})")
+            if not isinstance(item, dict) or not str(item.get("text", "")).strip():
+                raise ValueError(f"{path}:{line_number}: each line needs a non-empty \"text\" field")
+            yield str(item.get("id", line_number)), item
+
+
+def load_text_dir(path):
+    """Yield (item_id, item) for every .txt file under path; the id is the relative path"""
+    root = Path(path)
+    for text_file in sorted(root.rglob("*.txt")):
+        text = text_file.read_text(encoding="utf-8").strip()
+        if text:
+            yield str(text_file.relative_to(root)), {"text": text}
+
+
+def item_fingerprint(item_id, text, request):
+    """Identify an item by id, text and settings, so edited prompts or changed options render again on resume"""
+    settings = {key: value for key, value in request.items() if key not in ("api_key", "workers", "audio_dir")}
+    payload = json.dumps({"id": item_id, "text": text, "settings": settings}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_done(state_path, audio_dir):
+    """Return fingerprints recorded as finished whose audio file still exists"""
+    done = set()
+    if not state_path.exists():
+        return done
+    with open(state_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write can leave a truncated last line
+                continue
+            # The recorded WAV may since have been re-encoded under another extension
+            if resolve_audio_path(Path(audio_dir) / record.get("filename", "")).is_file():
+                done.add(record["fingerprint"])
+    return done
+
+
+def build_request(item, args):
+    """Merge an item's settings over the command-line defaults into synthesize_to_file kwargs"""
+    kwargs = {
+        "voice_id": args.voice_id,
+        "model_id": args.model_id,
+        "audio_prompt_path": args.audio_prompt,
+        "long_form": args.long_form,
+        "kokoro_voice": args.kokoro_voice,
+        "kokoro_lang": args.kokoro_lang,
+        "chatterbox_exaggeration": args.exaggeration,
+        "chatterbox_cfg_weight": args.cfg_weight,
+        "chatterbox_temperature": args.temperature,
+    }
+    if args.kokoro_backend:
+        kwargs["kokoro_backend"] = args.kokoro_backend
+    if args.chatterbox_profile:
+        kwargs["chatterbox_profile"] = args.chatterbox_profile
+    # Only when set, so state files from earlier runs still match on resume
+    if args.constant_memory:
+        kwargs["constant_memory"] = True
+    kwargs.update({key: item[key] for key in ITEM_SETTINGS if key in item})
+    if "voice_settings" in item:
+        kwargs["voice_settings_override"] = item["voice_settings"]
+    kwargs["tts_provider"] = resolve_provider(item.get("provider", args.provider))
+    kwargs["speed_setting"] = float(item.get("speed", args.speed))
+    kwargs["api_key"] = args.api_key
+    kwargs["workers"] = args.chunk_workers
+    kwargs["audio_dir"] = args.audio_dir
+    return kwargs
+
+
+def run_batch(items, args):
+    """Synthesize items on a thread pool; returns the summary dict"""
+    audio_dir = Path(args.audio_dir)
+    audio_dir.mkdir(exist_ok=True)
+    state_path = Path(args.state)
+    done = load_done(state_path, audio_dir)
+
+    pending = []
+    skipped = 0
+    for item_id, item in items:
+        request = build_request(item, args)
+        fingerprint = item_fingerprint(item_id, item["text"], request)
+        if fingerprint in done:
+            skipped += 1
+        else:
+            pending.append((item_id, item["text"], request, fingerprint))
+
+    stop = threading.Event()
+    state_lock = threading.Lock()
+    summary = {"total": skipped + len(pending), "skipped": skipped, "completed": 0, "failed": 0,
+               "cache_hits": 0, "audio_seconds": 0.0, "failures": []}
+
+    def run_item(item_id, text, request, fingerprint):
+        with cancellation_scope(stop.is_set):
+            filepath, metadata = synthesize_to_file(text, **request)
+        duration = metadata.get("audio_seconds") or audio_duration_seconds(filepath) or 0.0
+        with state_lock, open(state_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "id": item_id,
+                "fingerprint": fingerprint,
+                "entry_id": metadata["id"],
+                "filename": metadata["filename"],
+                "audio_seconds": round(duration, 3),
+            }) + "\n")
+        return duration, metadata.get("cache_hit", False)
+
+    print(f"{summary['total']} items: {skipped} already done, {len(pending)} to synthesize "
+          f"with {args.workers} worker(s)")
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=max(1, args.workers))
+    futures = {executor.submit(run_item, *entry): entry[0] for entry in pending}
+    try:
+        remaining = set(futures)
+        while remaining:
+            finished, remaining = wait(remaining, return_when=FIRST_COMPLETED)
+            for future in finished:
+                item_id = futures[future]
+                try:
+                    duration, cache_hit = future.result()
+                except SynthesisCancelled:
+                    continue
+                except Exception as e:
+                    summary["failed"] += 1
+                    summary["failures"].append({"id": item_id, "error": str(e) or e.__class__.__name__})
+                    print(f"  ✗ {item_id}: {e}", file=sys.stderr)
+                    # Unexpected errors are worth a traceback when debugging a manifest
+                    if args.verbose and not isinstance(e, SynthesisError):
+                        traceback.print_exception(type(e), e, e.__traceback__)
+                    continue
+                summary["completed"] += 1
+                summary["audio_seconds"] += duration
+                summary["cache_hits"] += int(bool(cache_hit))
+                if args.verbose:
+                    print(f"  ✓ {item_id} ({duration:.1f}s audio)")
+                processed = summary["completed"] + summary["failed"]
+                if processed % args.report_every == 0:
+                    elapsed = time.perf_counter() - start
+                    print(f"  {processed}/{len(pending)} processed, {processed / elapsed:.2f} items/s")
+    except KeyboardInterrupt:
+        # Running items stop at their next cancellation check; queued ones never start
+        print("\nInterrupted: cancelling remaining items (rerun the same command to resume)")
+        stop.set()
+        for future in futures:
+            future.cancel()
+    finally:
+        executor.shutdown(wait=True)
+        # Let background compression (TTS_STORAGE_FORMAT) finish before exiting
+        wait_for_pending_encodes()
+
+    summary["wall_seconds"] = time.perf_counter() - start
+    summary["interrupted"] = stop.is_set()
+    return summary
+
+
+def print_summary(summary):
+    wall = summary["wall_seconds"] or 1e-9
+    print("\n=== Batch summary ===")
+    print(f"Items:          {summary['total']} total, {summary['completed']} synthesized, "
+          f"{summary['skipped']} skipped (already done), {summary['failed']} failed")
+    print(f"Cache hits:     {summary['cache_hits']}")
+    print(f"Wall time:      {summary['wall_seconds']:.1f}s")
+    print(f"Throughput:     {summary['completed'] / wall:.2f} items/s, "
+          f"{summary['audio_seconds'] / wall:.2f} audio-seconds/s")
+    print(f"Audio produced: {summary['audio_seconds']:.1f}s")
+    if summary["failures"]:
+        print("Failures:")
+        for failure in summary["failures"]:
+            print(f"  {failure['id']}: {failure['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("source", help="JSONL manifest, or a directory of .txt files")
+    parser.add_argument("--provider", default="kokoro", help="Default provider: " + ", ".join(PROVIDER_ALIASES))
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--workers", type=int, default=2, help="Items synthesized concurrently")
+    parser.add_argument("--long-form", action="store_true", help="Chunk each item and render the chunks in parallel (local engines)")
+    parser.add_argument("--constant-memory", action="store_true",
+                        help="Chatterbox: render token-budgeted chunks one at a time, appending each to the file")
+    parser.add_argument("--chunk-workers", type=int, default=None, help="Workers per long-form item (default: CPU count - 1)")
+    parser.add_argument("--state", default=None, help="Resume state file (default: <source>.done.jsonl)")
+    parser.add_argument("--audio-dir", default=DEFAULT_AUDIO_DIR)
+    parser.add_argument("--api-key", default=os.environ.get("ELEVENLABS_API_KEY"), help="ElevenLabs API key (default: $ELEVENLABS_API_KEY)")
+    parser.add_argument("--voice-id", default=None, help="ElevenLabs voice id")
+    parser.add_argument("--model-id", default=None, help="ElevenLabs model id")
+    parser.add_argument("--kokoro-voice", default="af_heart")
+    parser.add_argument("--kokoro-lang", default="a")
+    parser.add_argument("--kokoro-backend", choices=list(KOKORO_BACKENDS), default=None,
+                        help="Kokoro inference engine (default: $TTS_KOKORO_BACKEND or torch)")
+    parser.add_argument("--audio-prompt", default=None, help="Chatterbox reference clip for voice cloning")
+    parser.add_argument("--exaggeration", type=float, default=0.5)
+    parser.add_argument("--cfg-weight", type=float, default=0.5)
+    parser.add_argument("--temperature", type=float, default=0.8)
+    parser.add_argument("--chatterbox-profile", choices=list(PROFILES), default=None,
+                        help="Chatterbox inference profile (default: $TTS_CHATTERBOX_PROFILE or standard)")
+    parser.add_argument("--report-every", type=int, default=25, help="Print progress every N items")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+    args.report_every = max(1, args.report_every)
+
+    source = Path(args.source)
+    if args.state is None:
+        args.state = str(source.with_name(source.name.rstrip("/") + ".done.jsonl"))
+    try:
+        resolve_provider(args.provider)
+        items = list(load_text_dir(source) if source.is_dir() else load_manifest(source))
+        summary = run_batch(items, args)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+    sys.exit(1 if summary["failed"] or summary["interrupted"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""Cross-session dynamic batching of Kokoro forward passes.
+
+Every session (and every long-form worker) used to run its own KModel forward,
+one sentence per pass, with concurrent passes competing for the same CPU
+threads. install_batching() swaps a KPipeline's model for a stand-in that
+hands each forward to a process-wide InferenceBatcher: a worker thread per
+model collects the requests that arrive within ``TTS_BATCH_MAX_WAIT_MS`` (up
+to ``TTS_BATCH_MAX_SIZE``), runs them together and routes each result back to
+its caller. G2P, text splitting and voice packs stay on the caller's thread.
+
+The text front end (ALBERT, duration predictor, text encoder) runs as one
+padded, masked batch with packed LSTMs, so every item gets exactly the
+durations and features it would get alone. F0/N prediction and the iSTFTNet
+decoder normalize over time (instance norm), so padding would change the
+audio; they run item by item on the batch thread. On CPU the decoder is most
+of the work and batching it does not pay off even for equal lengths, so the
+gain comes from the batched front end and from passes no longer contending
+for threads. benchmarks/load_test_batching.py measures it against
+single-request mode.
+
+Batching is opt-in (``TTS_BATCH_MAX_SIZE`` above 1). Batchers hold their
+model weakly and their worker thread stops once the model is freed, so an
+engine evicted from the EngineRegistry still releases its memory. The batched
+forward relies on KModel's submodules; if a Kokoro release lacks them the
+model keeps its own per-request forward.
+
+Chatterbox is not batched: ChatterboxTTS.generate() decodes one text at a
+time and has no batched entry point, so its requests keep running per
+session. The ONNX Kokoro engine is exported with a batch size of one.
+"""
+import itertools
+import os
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from cancellation import SynthesisCancelled, check_cancelled
+
+DEFAULT_MAX_BATCH_SIZE = 1
+DEFAULT_MAX_WAIT_MS = 10
+# How often a waiting caller checks whether its job was cancelled
+CANCEL_POLL_SECONDS = 0.05
+# KModel attributes kokoro_forward_batch uses besides forward_with_tokens
+KMODEL_BATCH_ATTRIBUTES = (
+    "bert", "bert_encoder", "text_encoder", "decoder",
+    "predictor.text_encoder", "predictor.lstm", "predictor.duration_proj", "predictor.F0Ntrain",
+)
+_STOP = object()
+
+
+def batch_settings():
+    """Return (max_batch_size, max_wait_seconds) from the environment"""
+    max_batch_size = int(os.environ.get("TTS_BATCH_MAX_SIZE", DEFAULT_MAX_BATCH_SIZE))
+    max_wait_ms = float(os.environ.get("TTS_BATCH_MAX_WAIT_MS", DEFAULT_MAX_WAIT_MS))
+    return max(1, max_batch_size), max(0.0, max_wait_ms) / 1000
+
+
+class _Request:
+    __slots__ = ("item", "future", "submitted")
+
+    def __init__(self, item):
+        self.item = item
+        self.future = Future()
+        self.submitted = time.perf_counter()
+
+
+class InferenceBatcher:
+    """Collects submitted items into batches for run_batch(items) -> results, on one worker thread"""
+
+    def __init__(self, run_batch, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT_MS / 1000,
+                 name="batcher"):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait))
+        self.name = name
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.queue_seconds = 0.0
+        self.failures = 0
+
+    def submit(self, item):
+        """Queue item and return a Future for its result"""
+        request = _Request(item)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"{self.name} is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        self._queue.put(request)
+        return request.future
+
+    def close(self):
+        """Stop the worker thread; requests still queued fail with RuntimeError"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(_STOP)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is _STOP:
+                # Run what was collected, then stop on the next call
+                self._queue.put(_STOP)
+                break
+            batch.append(request)
+        # Callers that gave up (cancelled jobs) are dropped before any work is done
+        return [request for request in batch if request.future.set_running_or_notify_cancel()]
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                break
+            if not batch:
+                continue
+            started = time.perf_counter()
+            with self._lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+                self.queue_seconds += sum(started - request.submitted for request in batch)
+            try:
+                results = self.run_batch([request.item for request in batch])
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            for request, result in zip(batch, results):
+                if isinstance(result, BaseException):
+                    request.future.set_exception(result)
+                else:
+                    request.future.set_result(result)
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not _STOP and request.future.set_running_or_notify_cancel():
+                request.future.set_exception(RuntimeError(f"{self.name} is closed"))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+                "mean_queue_ms": round(self.queue_seconds / self.items * 1000, 2) if self.items else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+                "failures": self.failures,
+                "closed": self._closed,
+            }
+
+
+def wait_for(future):
+    """Return the future's result, abandoning it if this thread's job is cancelled meanwhile"""
+    while True:
+        try:
+            return future.result(timeout=CANCEL_POLL_SECONDS)
+        except FutureTimeout:
+            try:
+                check_cancelled()
+            except SynthesisCancelled:
+                future.cancel()
+                raise
+
+
+def kokoro_forward_single(model, item):
+    """One (input_ids, ref_s, speed) item through KModel's own forward; returns (audio, pred_dur) on the CPU"""
+    import torch
+
+    input_ids, ref_s, speed = item
+    audio, pred_dur = model.forward_with_tokens(
+        torch.LongTensor([input_ids]).to(model.device), ref_s.to(model.device), speed
+    )
+    return audio.squeeze().cpu(), pred_dur.cpu() if pred_dur is not None else None
+
+
+def kokoro_forward_batch(model, items):
+    """Run (input_ids, ref_s, speed) items through a KModel together; returns [(audio, pred_dur), ...]
+
+    Mirrors KModel.forward_with_tokens: the text front end runs as one padded
+    batch, the decoder once per item on its unpadded slice.
+    """
+    import torch
+    from torch.nn.utils.rnn import pack_padded_sequence, pad_packed_sequence
+
+    device = model.device
+    batch = len(items)
+    lengths = torch.tensor([len(input_ids) for input_ids, _, _ in items], dtype=torch.long)
+    max_length = int(lengths.max())
+    input_ids = torch.zeros((batch, max_length), dtype=torch.long)
+    for i, (ids, _, _) in enumerate(items):
+        input_ids[i, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+    input_ids = input_ids.to(device)
+    ref_s = torch.cat([ref.reshape(1, -1) for _, ref, _ in items]).to(device)
+    speed = torch.tensor([float(value) for _, _, value in items], device=device)
+    text_mask = (torch.arange(max_length).unsqueeze(0) + 1 > lengths.unsqueeze(1)).to(device)  # True on padding
+
+    with torch.no_grad():
+        bert_dur = model.bert(input_ids, attention_mask=(~text_mask).int())
+        d_en = model.bert_encoder(bert_dur).transpose(-1, -2)
+        s = ref_s[:, 128:]
+        d = model.predictor.text_encoder(d_en, s, lengths, text_mask)
+        # Packed so padding never reaches the backward direction of the LSTM
+        x = pack_padded_sequence(d, lengths, batch_first=True, enforce_sorted=False)
+        x, _ = model.predictor.lstm(x)
+        x, _ = pad_packed_sequence(x, batch_first=True, total_length=max_length)
+        duration = torch.sigmoid(model.predictor.duration_proj(x)).sum(axis=-1) / speed.unsqueeze(1)
+        t_en = model.text_encoder(input_ids, lengths, text_mask)
+
+        outputs = []
+        for i, n in enumerate(lengths.tolist()):
+            pred_dur = torch.round(duration[i, :n]).clamp(min=1).long()
+            indices = torch.repeat_interleave(torch.arange(n, device=device), pred_dur)
+            alignment = torch.zeros((n, indices.shape[0]), device=device)
+            alignment[indices, torch.arange(indices.shape[0], device=device)] = 1
+            alignment = alignment.unsqueeze(0)
+            en = d[i:i + 1, :n].transpose(-1, -2) @ alignment
+            F0_pred, N_pred = model.predictor.F0Ntrain(en, s[i:i + 1])
+            asr = t_en[i:i + 1, :, :n] @ alignment
+            audio = model.decoder(asr, F0_pred, N_pred, ref_s[i:i + 1, :128])
+            outputs.append((audio.squeeze().cpu(), pred_dur.cpu()))
+        return outputs
+
+
+def supports_batched_forward(model):
+    """True when a KModel has the submodules kokoro_forward_batch runs"""
+    for path in KMODEL_BATCH_ATTRIBUTES:
+        target = model
+        for name in path.split("."):
+            target = getattr(target, name, None)
+            if target is None:
+                return False
+    return True
+
+
+class _KokoroBatchRunner:
+    """run_batch for a KModel, held weakly so the batcher never keeps an evicted model alive"""
+
+    def __init__(self, model):
+        self.model_ref = weakref.ref(model)
+        self.batched = True
+
+    def __call__(self, items):
+        model = self.model_ref()
+        if model is None:
+            # Callers hold the model while they wait, so this only happens after they gave up
+            raise RuntimeError("Kokoro model was freed")
+        if len(items) > 1 and self.batched:
+            try:
+                return kokoro_forward_batch(model, items)
+            except Exception as e:
+                # Most likely a Kokoro release with different internals: stop batching this
+                # model and run every later request one by one through KModel's own forward
+                self.batched = False
+                print(f"[batching] batched Kokoro forward failed, batching disabled for this model: {e}")
+        results = []
+        for item in items:
+            try:
+                results.append(kokoro_forward_single(model, item))
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+class BatchedKModel:
+    """Stands in for KPipeline.model: forwards go through the model's shared batcher"""
+
+    def __init__(self, model, batcher):
+        self.model = model
+        self.batcher = batcher
+
+    def __getattr__(self, name):
+        return getattr(self.__dict__["model"], name)
+
+    def __call__(self, phonemes, ref_s, speed=1, return_output=False):
+        model = self.model
+        input_ids = [i for i in map(model.vocab.get, phonemes) if i is not None]
+        if len(input_ids) + 2 > model.context_length:
+            # KModel raises its usual error for over-long input
+            return model(phonemes, ref_s, speed, return_output)
+        audio, pred_dur = wait_for(self.batcher.submit(([0, *input_ids, 0], ref_s, speed)))
+        return model.Output(audio=audio, pred_dur=pred_dur) if return_output else audio
+
+
+_batchers = weakref.WeakKeyDictionary()  # KModel -> InferenceBatcher, dropped when the model is freed
+_batchers_lock = threading.Lock()
+_batcher_numbers = itertools.count()
+
+
+def get_batcher(model):
+    """Return the process-wide batcher for a KModel, created on first use with batch_settings()
+
+    The batcher is closed (its thread stops) when the model is garbage collected,
+    e.g. after the EngineRegistry evicts the pipeline holding it.
+    """
+    with _batchers_lock:
+        batcher = _batchers.get(model)
+        if batcher is None:
+            max_batch_size, max_wait = batch_settings()
+            batcher = _batchers[model] = InferenceBatcher(
+                _KokoroBatchRunner(model), max_batch_size, max_wait,
+                name=f"kokoro-batcher-{next(_batcher_numbers)}",
+            )
+            weakref.finalize(model, batcher.close)
+        return batcher
+
+
+def install_batching(pipeline):
+    """Route a KPipeline's forwards through the shared batcher; safe to call on every request
+
+    No-op when ``TTS_BATCH_MAX_SIZE`` is 1 (the default), for model-less
+    pipelines, for engines that are not a KPipeline around a KModel (e.g. ONNX
+    Runtime) and for KModels without the submodules the batched forward uses.
+    """
+    model = getattr(pipeline, "model", None)
+    if model is None or isinstance(model, BatchedKModel) or not callable(getattr(model, "forward_with_tokens", None)):
+        return
+    if batch_settings()[0] <= 1:
+        return
+    if not supports_batched_forward(model):
+        print("[batching] this Kokoro release has an unfamiliar KModel layout, batching stays off")
+        return
+    pipeline.model = BatchedKModel(model, get_batcher(model))
+
+
+def batching_stats():
+    """Return stats() of every batcher in this process"""
+    with _batchers_lock:
+        batchers = list(_batchers.values())
+    return [batcher.stats() for batcher in batchers]
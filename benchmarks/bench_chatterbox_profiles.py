@@ -0,0 +1,171 @@
+"""Compare Chatterbox inference profiles for speed and output fidelity.
+
+Loads the model once per profile (see inference_profiles.py), renders the
+same sentences with the same seed under each, and prints per profile:
+
+  * load time and estimated model size
+  * real-time factor (synthesis seconds per audio second; below 1.0 is
+    faster than real time) and the speed-up over the baseline
+  * the difference from the baseline (fp32) waveform:
+      - duration ratio
+      - SNR in dB over the overlapping samples (high only while both runs
+        sample the same speech tokens)
+      - log-spectral distance in dB (robust to small timing shifts)
+
+    python benchmarks/bench_chatterbox_profiles.py
+    python benchmarks/bench_chatterbox_profiles.py --profiles cpu cpu-int8 --threads 8 --json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from engine_registry import CHATTERBOX_PROVIDER, chatterbox_engine_args, get_engine_registry
+from inference_profiles import PROFILES
+
+SENTENCES = [
+    "The quick brown fox jumps over the lazy dog.",
+    "Please remember to bring your umbrella, because the forecast calls for rain this afternoon.",
+    "Modern speech synthesis learns the mapping from text to sound directly from recordings.",
+    "Our quarterly report shows steady growth across every region, with the strongest gains in Europe.",
+]
+
+
+def generate(model, text, seed, temperature):
+    import torch
+
+    torch.manual_seed(seed)
+    wav = model.generate(text, exaggeration=0.5, cfg_weight=0.5, temperature=temperature,
+                         repetition_penalty=1.2, min_p=0.05, top_p=1.0)
+    return wav.squeeze(0).detach().cpu().float().numpy()
+
+
+def snr_db(reference, candidate):
+    n = min(len(reference), len(candidate))
+    if n == 0:
+        return None
+    noise = np.sum((reference[:n] - candidate[:n]) ** 2)
+    signal = np.sum(reference[:n] ** 2)
+    if noise == 0:
+        return float("inf")
+    return float(10 * np.log10(signal / noise)) if signal > 0 else None
+
+
+def log_spectrum(audio, frame=1024, hop=256):
+    if len(audio) < frame:
+        audio = np.pad(audio, (0, frame - len(audio)))
+    count = 1 + (len(audio) - frame) // hop
+    frames = np.lib.stride_tricks.as_strided(
+        audio, shape=(count, frame), strides=(audio.strides[0] * hop, audio.strides[0])
+    )
+    magnitude = np.abs(np.fft.rfft(frames * np.hanning(frame), axis=1))
+    return 20 * np.log10(magnitude + 1e-5)
+
+
+def log_spectral_distance_db(reference, candidate):
+    """RMS difference of the log magnitude spectra per frame, averaged over the shared frames"""
+    a, b = log_spectrum(reference), log_spectrum(candidate)
+    n = min(len(a), len(b))
+    return float(np.mean(np.sqrt(np.mean((a[:n] - b[:n]) ** 2, axis=1))))
+
+
+def run_profile(profile, sentences, seed, temperature, warmup):
+    registry = get_engine_registry()
+    device, profile = chatterbox_engine_args(profile)
+    start = time.perf_counter()
+    model = registry.get(CHATTERBOX_PROVIDER, device=device, profile=profile)
+    load_seconds = time.perf_counter() - start
+    key = registry.make_key(CHATTERBOX_PROVIDER, device, None, profile)
+    size_mb = next((e["size_mb"] for e in registry.stats()["engines"] if e["key"] == key), None)
+
+    if warmup:
+        generate(model, "Warming up.", seed, temperature)
+
+    outputs = []
+    synthesis_seconds = 0.0
+    for text in sentences:
+        start = time.perf_counter()
+        outputs.append(generate(model, text, seed, temperature))
+        synthesis_seconds += time.perf_counter() - start
+    audio_seconds = sum(len(audio) for audio in outputs) / model.sr
+    # Drop the model before loading the next profile
+    registry.evict(CHATTERBOX_PROVIDER, device, None, profile)
+    return {
+        "profile": profile,
+        "device": device,
+        "load_seconds": round(load_seconds, 2),
+        "size_mb": size_mb,
+        "audio_seconds": round(audio_seconds, 2),
+        "synthesis_seconds": round(synthesis_seconds, 2),
+        "rtf": round(synthesis_seconds / audio_seconds, 3) if audio_seconds else None,
+    }, outputs
+
+
+def compare(reference_outputs, outputs):
+    ratios, snrs, distances = [], [], []
+    for reference, candidate in zip(reference_outputs, outputs):
+        ratios.append(len(candidate) / len(reference) if len(reference) else 0.0)
+        snr = snr_db(reference, candidate)
+        if snr is not None:
+            snrs.append(snr)
+        distances.append(log_spectral_distance_db(reference, candidate))
+    return {
+        "duration_ratio": round(float(np.mean(ratios)), 3),
+        "snr_db": round(float(np.mean(snrs)), 1) if snrs else None,
+        "log_spectral_distance_db": round(float(np.mean(distances)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", nargs="+", choices=list(PROFILES), default=["cpu", "cpu-int8"])
+    parser.add_argument("--baseline", choices=list(PROFILES), default="cpu", help="fp32 profile to compare against")
+    parser.add_argument("--sentences", type=int, default=len(SENTENCES), help="How many test sentences to render")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--temperature", type=float, default=0.8)
+    parser.add_argument("--threads", type=int, default=None, help="Sets TTS_CPU_THREADS for the CPU profiles")
+    parser.add_argument("--no-warmup", action="store_true", help="Include first-call overhead in the timings")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    if args.threads:
+        os.environ["TTS_CPU_THREADS"] = str(args.threads)
+    sentences = (SENTENCES * (args.sentences // len(SENTENCES) + 1))[:args.sentences]
+    profiles = [args.baseline] + [name for name in args.profiles if name != args.baseline]
+
+    results = []
+    baseline_outputs = None
+    for profile in profiles:
+        result, outputs = run_profile(profile, sentences, args.seed, args.temperature, warmup=not args.no_warmup)
+        if baseline_outputs is None:
+            baseline_outputs = outputs
+        result.update(compare(baseline_outputs, outputs))
+        results.append(result)
+
+    baseline_rtf = results[0]["rtf"]
+    for result in results:
+        result["speedup"] = round(baseline_rtf / result["rtf"], 2) if baseline_rtf and result["rtf"] else None
+
+    if args.json:
+        print(json.dumps({"baseline": args.baseline, "sentences": len(sentences), "results": results}, indent=2))
+        return
+
+    print(f"{len(sentences)} sentences, seed {args.seed}, baseline {args.baseline}\n")
+    print(f"{'profile':<10}{'device':>7}{'load s':>8}{'MB':>8}{'audio s':>9}{'RTF':>8}{'speedup':>9}"
+          f"{'dur':>7}{'SNR dB':>8}{'LSD dB':>8}")
+    for r in results:
+        snr = "—" if r["snr_db"] is None else f"{r['snr_db']:.1f}"
+        size = "—" if r["size_mb"] is None else f"{r['size_mb']:.0f}"
+        print(f"{r['profile']:<10}{r['device']:>7}{r['load_seconds']:>8.1f}{size:>8}{r['audio_seconds']:>9.1f}"
+              f"{r['rtf']:>8.3f}{r['speedup']:>9.2f}{r['duration_ratio']:>7.2f}{snr:>8}"
+              f"{r['log_spectral_distance_db']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
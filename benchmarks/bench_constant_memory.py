@@ -0,0 +1,112 @@
+"""Peak memory of Chatterbox on growing documents: whole text, long-form and constant-memory mode.
+
+Renders the long benchmark text repeated ``--lengths`` times with Chatterbox,
+each (mode, length) pair in a fresh subprocess so its peak RSS is its own:
+
+  * whole     - one model.generate call over the full text (the default path)
+  * long-form - sentence chunks on ``--workers`` threads
+  * constant  - token-budgeted chunks one at a time, appended to the file
+
+Prints peak RSS, wall time, audio length and RTF per run. In constant-memory
+mode the peak should stay flat as the document grows.
+
+    python benchmarks/bench_constant_memory.py --lengths 1 4 16
+    python benchmarks/bench_constant_memory.py --modes whole constant --chunk-tokens 150 --json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_suite import CORPUS, machine_info, peak_rss_mb
+
+MODES = ("whole", "long-form", "constant")
+
+
+def run_child(mode, length, workers):
+    """Render one document in this process and return its results dict"""
+    from synthesis import CHATTERBOX_PROVIDER, synthesize_to_file
+
+    text = "\n\n".join([CORPUS["long"]] * length)
+    options = {
+        "whole": {},
+        "long-form": {"long_form": True, "workers": workers},
+        "constant": {"constant_memory": True},
+    }[mode]
+    with tempfile.TemporaryDirectory() as audio_dir:
+        start = time.perf_counter()
+        _, metadata = synthesize_to_file(text, 1.0, CHATTERBOX_PROVIDER, audio_dir=audio_dir, **options)
+        elapsed = time.perf_counter() - start
+    audio_seconds = metadata.get("audio_seconds")
+    return {
+        "mode": mode,
+        "length": length,
+        "chars": len(text),
+        "seconds": round(elapsed, 3),
+        "audio_seconds": round(audio_seconds, 3) if audio_seconds else None,
+        "rtf": round(elapsed / audio_seconds, 4) if audio_seconds else None,
+        "chunks": (metadata.get("long_form") or {}).get("chunks", 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--lengths", type=int, nargs="+", default=[1, 4, 16],
+                        help="Copies of the long benchmark text per document")
+    parser.add_argument("--workers", type=int, default=None, help="Long-form worker threads")
+    parser.add_argument("--chunk-tokens", type=int, default=None, help="TTS_CHATTERBOX_CHUNK_TOKENS for constant mode")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "LENGTH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child[0], int(args.child[1]), args.workers)))
+        return
+
+    env = os.environ.copy()
+    env.update({
+        "CUDA_VISIBLE_DEVICES": "",
+        "TTS_SYNTHESIS_CACHE_MAX_MB": "0",
+        "TTS_STORAGE_FORMAT": "wav",
+        "TTS_PRELOAD_ENGINES": "",
+    })
+    if args.chunk_tokens:
+        env["TTS_CHATTERBOX_CHUNK_TOKENS"] = str(args.chunk_tokens)
+
+    results = []
+    for length in args.lengths:
+        for mode in args.modes:
+            command = [sys.executable, __file__, "--child", mode, str(length)]
+            if args.workers:
+                command += ["--workers", str(args.workers)]
+            output = subprocess.run(command, capture_output=True, text=True, env=env)
+            lines = output.stdout.strip().splitlines()
+            if output.returncode != 0 or not lines:
+                error = (output.stderr.strip().splitlines() or ["failed"])[-1]
+                results.append({"mode": mode, "length": length, "error": error})
+                continue
+            results.append(json.loads(lines[-1]))
+
+    if args.json:
+        print(json.dumps({"machine": machine_info(), "results": results}, indent=2))
+        return
+
+    print(f"{'mode':<11}{'chars':>8}{'chunks':>8}{'audio s':>9}{'wall s':>9}{'RTF':>8}{'peak MB':>9}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['mode']:<11}{'x' + str(r['length']):>8}  failed: {r['error']}")
+            continue
+        print(f"{r['mode']:<11}{r['chars']:>8}{r['chunks']:>8}{r['audio_seconds'] or 0:>9.1f}{r['seconds']:>9.2f}"
+              f"{r['rtf'] or 0:>8.3f}{r['peak_rss_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Compare the pooled streaming ElevenLabs client with bare per-call requests.
+
+Starts the local mock API, then issues the same TTS requests through
+elevenlabs_client.stream_speech_to_file and through two baselines, and
+reports latency, time to first byte and TCP connections opened:
+
+  * bare         - the old pattern: ``requests.post`` without a session,
+                   full body buffered in memory
+  * bare stream  - the stream endpoint without a session, so streaming is
+                   compared with streaming and only connection reuse differs
+  * pooled       - the shared session, streamed to the file
+
+The mock spends ``--chunk-delay`` generating each chunk on both endpoints.
+
+    python benchmarks/bench_elevenlabs_client.py --requests 50 --first-byte-delay 0.05
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import requests
+
+import elevenlabs_client
+from mock_elevenlabs import start_mock_server
+
+TEXT = "Connection reuse matters most for the many short announcements we synthesize every day. " * 3
+
+
+def run_bare(base_url, count, out_dir):
+    latencies, first_bytes = [], []
+    for i in range(count):
+        start = time.perf_counter()
+        response = requests.post(
+            f"{base_url}/v1/text-to-speech/mock-rachel",
+            json={"text": TEXT, "model_id": "eleven_monolingual_v1"},
+            headers={"xi-api-key": "bench", "Accept": "audio/mpeg"},
+        )
+        first_bytes.append(time.perf_counter() - start)  # body is only available once complete
+        (out_dir / f"bare_{i}.mp3").write_bytes(response.content)
+        latencies.append(time.perf_counter() - start)
+    return latencies, first_bytes
+
+
+def run_bare_stream(base_url, count, out_dir):
+    latencies, first_bytes = [], []
+    for i in range(count):
+        start = time.perf_counter()
+        first = None
+        with requests.post(
+            f"{base_url}/v1/text-to-speech/mock-rachel/stream",
+            json={"text": TEXT, "model_id": "eleven_monolingual_v1"},
+            headers={"xi-api-key": "bench", "Accept": "audio/mpeg"},
+            stream=True,
+        ) as response, open(out_dir / f"bare_stream_{i}.mp3", "wb") as f:
+            for chunk in response.iter_content(chunk_size=None):
+                if first is None:
+                    first = time.perf_counter() - start
+                f.write(chunk)
+        latencies.append(time.perf_counter() - start)
+        first_bytes.append(first if first is not None else latencies[-1])
+    return latencies, first_bytes
+
+
+def run_pooled(count, out_dir):
+    latencies, first_bytes = [], []
+    for i in range(count):
+        start = time.perf_counter()
+        first = []
+
+        def on_chunk(chunk):
+            if not first:
+                first.append(time.perf_counter() - start)
+
+        elevenlabs_client.stream_speech_to_file(TEXT, "bench", "mock-rachel", out_dir / f"pooled_{i}.mp3", on_chunk=on_chunk)
+        latencies.append(time.perf_counter() - start)
+        first_bytes.append(first[0] if first else latencies[-1])
+    return latencies, first_bytes
+
+
+def report(label, latencies, first_bytes, connections):
+    ms = sorted(x * 1000 for x in latencies)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    print(f"{label:<13}{statistics.mean(ms):>10.1f}{p95:>10.1f}"
+          f"{statistics.mean(first_bytes) * 1000:>12.1f}{connections:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--first-byte-delay", type=float, default=0.02)
+    parser.add_argument("--chunk-delay", type=float, default=0.005)
+    args = parser.parse_args()
+
+    server = start_mock_server(first_byte_delay=args.first_byte_delay, chunk_delay=args.chunk_delay)
+    os.environ["ELEVENLABS_API_BASE"] = server.base_url
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(tmp)
+        print(f"{'client':<13}{'mean ms':>10}{'p95 ms':>10}{'1st byte ms':>12}{'conns':>8}")
+
+        before = server.connections
+        latencies, first_bytes = run_bare(server.base_url, args.requests, out_dir)
+        report("bare", latencies, first_bytes, server.connections - before)
+
+        before = server.connections
+        latencies, first_bytes = run_bare_stream(server.base_url, args.requests, out_dir)
+        report("bare stream", latencies, first_bytes, server.connections - before)
+
+        before = server.connections
+        latencies, first_bytes = run_pooled(args.requests, out_dir)
+        report("pooled", latencies, first_bytes, server.connections - before)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Tail latency of ElevenLabs alone vs. hedged with a local provider.
+
+Runs ``--requests`` synthesize requests against the local ElevenLabs mock,
+with ``--slow-rate`` of them stuck in a latency tail (``--slow-delay`` extra
+seconds before the first byte), first with ElevenLabs alone and then through
+hedging.synthesize_hedged for each ``--deadlines`` value (milliseconds), with
+``--secondary`` as the backup provider. Prints p50 / p95 / p99 / max latency,
+how often the backup was started and how often it served the request.
+
+It also checks the bookkeeping of every run: exactly one history entry per
+request, with ``provider`` naming the provider that served it, and no audio
+file left behind by the cancelled attempt.
+
+    python benchmarks/bench_hedging.py --secondary kokoro --slow-rate 0.1 --slow-delay 3
+    python benchmarks/bench_hedging.py --secondary mac --deadlines 250 500 1000 --json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_suite import PROVIDERS, machine_info, percentile
+from mock_elevenlabs import MOCK_VOICES, start_mock_server
+
+TEXTS = [
+    "Your order has shipped and should arrive on Thursday.",
+    "The meeting has been moved to three o'clock in the small conference room.",
+    "Please remember to bring your badge; the front desk cannot print new ones today.",
+    "Traffic on the northbound bridge is heavy, so allow twenty extra minutes.",
+]
+
+
+def run_mode(name, requests, synthesize, audio_dir):
+    from history_store import get_history_store
+
+    latencies, served_by, hedged, errors = [], {}, 0, []
+    for i in range(requests):
+        text = TEXTS[i % len(TEXTS)]
+        start = time.perf_counter()
+        try:
+            _, metadata = synthesize(text)
+        except Exception as e:
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - start)
+        served_by[metadata["provider"]] = served_by.get(metadata["provider"], 0) + 1
+        hedged += bool((metadata.get("hedge") or {}).get("hedged"))
+
+    # Let cancelled attempts finish cleaning up before the directory is checked
+    time.sleep(0.5)
+    entries = get_history_store(audio_dir).list_entries()
+    files = sorted(p.name for p in Path(audio_dir).iterdir() if p.suffix in (".wav", ".mp3", ".part"))
+    return {
+        "mode": name,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        "max_ms": round(max(latencies) * 1000, 1) if latencies else None,
+        "hedged": hedged,
+        "served_by": served_by,
+        "history_entries": len(entries),
+        "entries_match": all(
+            entry["provider"] == (entry.get("hedge") or {}).get("served_by", entry["provider"]) for entry in entries
+        ),
+        "audio_files": len(files),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--secondary", choices=[name for name in PROVIDERS if name != "elevenlabs"], default="kokoro")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--deadlines", type=float, nargs="+", default=[500, 1000], help="Hedge deadlines in ms")
+    parser.add_argument("--first-byte-delay", type=float, default=0.15, help="Mock first-byte delay (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Mock extra random first-byte delay (seconds)")
+    parser.add_argument("--slow-rate", type=float, default=0.1, help="Fraction of mock requests in the tail")
+    parser.add_argument("--slow-delay", type=float, default=3.0, help="Extra first-byte delay in the tail (seconds)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    os.environ.update({
+        "CUDA_VISIBLE_DEVICES": "",
+        "TTS_SYNTHESIS_CACHE_MAX_MB": "0",
+        "TTS_STORAGE_FORMAT": "wav",
+        "TTS_PRELOAD_ENGINES": "",
+    })
+    server = start_mock_server(first_byte_delay=args.first_byte_delay, jitter=args.jitter,
+                               slow_rate=args.slow_rate, slow_delay=args.slow_delay)
+    os.environ["ELEVENLABS_API_BASE"] = server.base_url
+
+    from hedging import synthesize_hedged
+    from synthesis import ELEVENLABS_PROVIDER, synthesize_to_file
+
+    secondary = PROVIDERS[args.secondary]
+    elevenlabs_options = {"api_key": "bench", "voice_id": MOCK_VOICES[0]["voice_id"]}
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_hedging_") as tmp:
+        # The backup's model load stays out of the measurement
+        synthesize_to_file("Warming up.", 1.0, secondary, audio_dir=Path(tmp) / "warmup")
+
+        random.seed(args.seed)
+        audio_dir = Path(tmp) / "primary-only"
+        results.append(run_mode("ElevenLabs only", args.requests, lambda text: synthesize_to_file(
+            text, 1.0, ELEVENLABS_PROVIDER, audio_dir=audio_dir, **elevenlabs_options), audio_dir))
+
+        for deadline_ms in args.deadlines:
+            random.seed(args.seed)
+            audio_dir = Path(tmp) / f"hedged-{deadline_ms:g}"
+            audio_dir.mkdir()
+            results.append(run_mode(f"hedged @ {deadline_ms:g} ms", args.requests, lambda text: synthesize_hedged(
+                text, 1.0, ELEVENLABS_PROVIDER, secondary, deadline=deadline_ms / 1000,
+                primary_options={"audio_dir": audio_dir, **elevenlabs_options},
+                secondary_options={"audio_dir": audio_dir}), audio_dir))
+    server.shutdown()
+
+    for result in results:
+        # One entry per request and one file per entry, whoever served it
+        result["bookkeeping_ok"] = (
+            result["history_entries"] == result["audio_files"] == result["requests"] and result["entries_match"]
+        )
+
+    if args.json:
+        print(json.dumps({"machine": machine_info(), "secondary": secondary, "results": results}, indent=2))
+        return
+
+    print(f"ElevenLabs mock: {args.first_byte_delay:g}s + up to {args.jitter:g}s first byte, "
+          f"{args.slow_rate:.0%} of requests +{args.slow_delay:g}s; backup: {secondary}\n")
+    print(f"{'mode':<20}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'hedged':>8}{'backup won':>12}{'books':>7}")
+    for r in results:
+        print(f"{r['mode']:<20}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['max_ms']:>9.1f}"
+              f"{r['hedged']:>8}{r['served_by'].get(secondary, 0):>12}{'ok' if r['bookkeeping_ok'] else 'FAIL':>7}")
+        if r["errors"]:
+            print(f"    {r['errors']} failed requests, e.g. {r['first_error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""History search latency at scale.
+
+Fills a throwaway history database with ``--entries`` synthetic entries
+(random sentences over a fixed vocabulary, spread over providers, voices,
+languages, speeds and a year of dates), then times HistoryStore.search for a
+set of typical queries: a rare word, a common word, a prefix being typed,
+filters alone and filters combined with words. Prints the number of matches
+and the median / p95 latency in milliseconds of what the history page runs on
+every rerun (count_matches plus one page of search results), and the cost of
+add() and delete() with the index kept up to date.
+
+Each query's matches are checked against a brute-force scan of the generated
+entries, so a wrong or stale index shows up as a mismatch.
+
+    python benchmarks/bench_history_search.py --entries 100000
+    python benchmarks/bench_history_search.py --entries 20000 --repeats 50 --json
+"""
+import argparse
+import datetime
+import json
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_suite import machine_info, percentile
+from history_store import HistoryStore
+
+WORDS = (
+    "the a of and to in is it that for on with as was at by this from but not are or have be one had word "
+    "river mountain forest city morning evening winter summer letter chapter meeting report invoice weather "
+    "garden kitchen station harbour bridge library museum market village train ferry lantern compass meadow"
+).split()
+RARE_WORDS = ["zeppelin", "quokka", "marzipan", "obsidian", "kaleidoscope"]
+PROVIDERS = ["Mac (say command)", "ElevenLabs", "Kokoro (local open model)", "Chatterbox (open-source)"]
+VOICES = ["af_heart", "af_bella", "am_adam", "bf_emma", "21m00Tcm4TlvDq8ikWAM"]
+LANGS = ["a", "b", "e", "f"]
+SPEEDS = [0.75, 1.0, 1.25, 1.5]
+START = datetime.datetime(2025, 1, 1)
+
+
+def make_entry(rng, index):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 60))]
+    if rng.random() < 0.001:
+        words.insert(rng.randrange(len(words)), rng.choice(RARE_WORDS))
+    text = " ".join(words).capitalize() + "."
+    provider = rng.choice(PROVIDERS)
+    return {
+        "id": f"{index:08d}",
+        "filename": f"tts_bench_{index:08d}.wav",
+        "provider": provider,
+        "kokoro_voice": rng.choice(VOICES) if provider == "Kokoro (local open model)" else None,
+        "kokoro_lang": rng.choice(LANGS) if provider == "Kokoro (local open model)" else None,
+        "speed": rng.choice(SPEEDS),
+        "created": (START + datetime.timedelta(seconds=rng.randrange(365 * 86400))).isoformat(),
+        "title": " ".join(words[:5]).capitalize() + "...",
+        "text": text,
+    }
+
+
+def brute_force(entries, query=None, provider=None, voice=None, lang=None, speed=None, created_from=None,
+                created_to=None):
+    """Count matches the slow way, with the same semantics as HistoryStore.search"""
+    terms = [term.lower() for term in re.findall(r"\w+", query or "")]
+    count = 0
+    for entry in entries:
+        words = re.findall(r"\w+", f"{entry['title']} {entry['text']}".lower())
+        if terms and not all(term in words for term in terms[:-1]):
+            continue
+        if terms and not any(word.startswith(terms[-1]) for word in words):
+            continue
+        if provider is not None and entry["provider"] != provider:
+            continue
+        if voice is not None and entry["kokoro_voice"] != voice:
+            continue
+        if lang is not None and entry["kokoro_lang"] != lang:
+            continue
+        if speed is not None and entry["speed"] != speed:
+            continue
+        if created_from is not None and entry["created"] < str(created_from):
+            continue
+        if created_to is not None and entry["created"] >= str(created_to + datetime.timedelta(days=1)):
+            continue
+        count += 1
+    return count
+
+
+QUERIES = {
+    "rare word": {"query": "zeppelin"},
+    "common word": {"query": "river"},
+    "two words": {"query": "winter harbour"},
+    "prefix (typing)": {"query": "lant"},
+    "provider filter": {"provider": "Kokoro (local open model)"},
+    "voice + speed": {"voice": "af_heart", "speed": 1.25},
+    "date range": {"created_from": datetime.date(2025, 3, 1), "created_to": datetime.date(2025, 3, 31)},
+    "words + filters": {"query": "mountain letter", "provider": "Kokoro (local open model)", "lang": "b"},
+    "best match": {"query": "ferry village", "sort_by": "relevance"},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    entries = [make_entry(rng, i) for i in range(args.entries)]
+    with tempfile.TemporaryDirectory(prefix="bench_history_search_") as tmp:
+        store = HistoryStore(tmp)
+        start = time.perf_counter()
+        for batch_start in range(0, len(entries), 5000):
+            store.add_many([dict(entry) for entry in entries[batch_start:batch_start + 5000]])
+        load_seconds = time.perf_counter() - start
+
+        results = []
+        for name, options in QUERIES.items():
+            filters = {key: value for key, value in options.items() if key != "sort_by"}
+            latencies = []
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                total = store.count_matches(**filters)
+                store.search(limit=args.page_size, **options)
+                latencies.append(time.perf_counter() - start)
+            results.append({
+                "query": name,
+                "matches": total,
+                "expected": brute_force(entries, **filters),
+                "median_ms": round(statistics.median(latencies) * 1000, 2),
+                "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            })
+
+        # Upkeep: the index follows single adds and deletes
+        add_latencies, delete_latencies = [], []
+        for i in range(args.repeats):
+            entry = make_entry(rng, args.entries + i)
+            entry["text"] += " quixotic"
+            start = time.perf_counter()
+            store.add(entry)
+            add_latencies.append(time.perf_counter() - start)
+        added = store.count_matches("quixotic")
+        for i in range(args.repeats):
+            start = time.perf_counter()
+            store.delete(f"{args.entries + i:08d}")
+            delete_latencies.append(time.perf_counter() - start)
+        remaining = store.count_matches("quixotic")
+
+    upkeep = {
+        "load_seconds": round(load_seconds, 2),
+        "add_median_ms": round(statistics.median(add_latencies) * 1000, 2),
+        "delete_median_ms": round(statistics.median(delete_latencies) * 1000, 2),
+        "index_follows_writes": added == args.repeats and remaining == 0,
+    }
+    if args.json:
+        print(json.dumps({"machine": machine_info(), "entries": args.entries, "search_enabled": store.search_enabled,
+                          "results": results, "upkeep": upkeep}, indent=2))
+        return
+
+    print(f"{args.entries} entries loaded in {load_seconds:.1f}s "
+          f"({'FTS5' if store.search_enabled else 'LIKE fallback'}), page size {args.page_size}\n")
+    print(f"{'query':<18}{'matches':>9}{'median ms':>11}{'p95 ms':>9}{'check':>7}")
+    for r in results:
+        check = "ok" if r["matches"] == r["expected"] else f"!= {r['expected']}"
+        print(f"{r['query']:<18}{r['matches']:>9}{r['median_ms']:>11.2f}{r['p95_ms']:>9.2f}{check:>7}")
+    print(f"\nadd {upkeep['add_median_ms']:.2f} ms, delete {upkeep['delete_median_ms']:.2f} ms (median); "
+          f"index follows writes: {'ok' if upkeep['index_follows_writes'] else 'FAIL'}")
+
+
+if __name__ == "__main__":
+    main()
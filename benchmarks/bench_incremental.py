@@ -0,0 +1,135 @@
+"""Re-synthesis of an edited script: whole text vs. incremental mode.
+
+Renders the long benchmark text once, then simulates ``--edits`` rounds of an
+editor changing ``--changed`` sentences and resubmitting. Each edited version
+goes through synthesize_to_file twice, once in long-form mode (every sentence
+rendered again on the same worker pool) and once in incremental mode. Prints
+per round the wall time of both, the speed-up, how many sentences incremental
+mode reused and regenerated, and how much of the start and end of the file is
+sample-identical to the previous version.
+
+    python benchmarks/bench_incremental.py --provider kokoro --edits 3 --changed 1
+    python benchmarks/bench_incremental.py --provider chatterbox --changed 2 --json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from bench_suite import CORPUS, PROVIDERS, machine_info
+from long_form import split_sentences
+
+EDITS = [
+    "A heron stands motionless in the shallows.",
+    "Somewhere a radio is playing an old song.",
+    "The ferry from the island is running late today.",
+    "Two cats sleep on the warm stones of the wall.",
+    "Clouds gather over the hills to the west.",
+    "A delivery van backs slowly down the narrow lane.",
+]
+
+
+def read_pcm(path):
+    with wave.open(str(path), "rb") as f:
+        return np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+
+
+def sample_rate(path):
+    with wave.open(str(path), "rb") as f:
+        return f.getframerate()
+
+
+def shared_edges(a, b):
+    """Samples the two files share at the start and at the end"""
+    n = min(len(a), len(b))
+    prefix = int(np.argmax(a[:n] != b[:n])) if np.any(a[:n] != b[:n]) else n
+    suffix = int(np.argmax(a[::-1][:n] != b[::-1][:n])) if np.any(a[::-1][:n] != b[::-1][:n]) else n
+    return prefix, suffix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--provider", choices=["kokoro", "chatterbox"], default="kokoro")
+    parser.add_argument("--edits", type=int, default=3, help="Edit-and-resubmit rounds")
+    parser.add_argument("--changed", type=int, default=1, help="Sentences changed per round")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    os.environ.update({
+        "CUDA_VISIBLE_DEVICES": "",
+        "TTS_SYNTHESIS_CACHE_MAX_MB": "0",
+        "TTS_STORAGE_FORMAT": "wav",
+        "TTS_PRELOAD_ENGINES": "",
+    })
+    from synthesis import synthesize_to_file
+
+    provider = PROVIDERS[args.provider]
+    rng = random.Random(args.seed)
+    sentences = split_sentences(CORPUS["long"])
+    rounds = []
+    with tempfile.TemporaryDirectory(prefix="bench_incremental_") as tmp:
+        options = {"audio_dir": tmp, "workers": args.workers}
+        synthesize_to_file("Warming up.", 1.0, provider, **options)
+        previous_text = " ".join(sentences)
+        start = time.perf_counter()
+        previous_path, _ = synthesize_to_file(previous_text, 1.0, provider, incremental=True, **options)
+        first_seconds = time.perf_counter() - start
+
+        for round_index in range(args.edits):
+            edited = list(sentences)
+            for index in rng.sample(range(len(sentences)), min(args.changed, len(sentences))):
+                edited[index] = rng.choice(EDITS)
+            text = " ".join(edited)
+
+            start = time.perf_counter()
+            synthesize_to_file(text, 1.0, provider, long_form=True, **options)
+            full_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            path, metadata = synthesize_to_file(text, 1.0, provider, incremental=True, previous_text=previous_text,
+                                                **options)
+            incremental_seconds = time.perf_counter() - start
+            prefix, suffix = shared_edges(read_pcm(previous_path), read_pcm(path))
+            stats = metadata["incremental"]
+            rounds.append({
+                "round": round_index + 1,
+                "segments": stats["segments"],
+                "reused": stats["reused"],
+                "regenerated": stats["regenerated"],
+                "changed_since_previous": stats["previous"]["changed"] + stats["previous"]["inserted"],
+                "full_seconds": round(full_seconds, 3),
+                "incremental_seconds": round(incremental_seconds, 3),
+                "speedup": round(full_seconds / incremental_seconds, 2) if incremental_seconds else None,
+                "shared_prefix_seconds": round(prefix / sample_rate(path), 2),
+                "shared_suffix_seconds": round(suffix / sample_rate(path), 2),
+            })
+            sentences, previous_text, previous_path = edited, text, path
+
+    if args.json:
+        print(json.dumps({"machine": machine_info(), "provider": provider, "first_render_seconds": round(first_seconds, 3),
+                          "rounds": rounds}, indent=2))
+        return
+
+    print(f"{provider}: {len(split_sentences(CORPUS['long']))} sentences, first render {first_seconds:.1f}s, "
+          f"{args.changed} changed per round\n")
+    print(f"{'round':>5}{'reused':>8}{'regen':>7}{'changed':>9}{'full s':>8}{'incr s':>8}{'speedup':>9}"
+          f"{'same start s':>14}{'same end s':>12}")
+    for r in rounds:
+        print(f"{r['round']:>5}{r['reused']:>8}{r['regenerated']:>7}{r['changed_since_previous']:>9}"
+              f"{r['full_seconds']:>8.2f}{r['incremental_seconds']:>8.2f}{r['speedup']:>9.2f}"
+              f"{r['shared_prefix_seconds']:>14.2f}{r['shared_suffix_seconds']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Compare Kokoro on PyTorch with Kokoro on ONNX Runtime (CPU).
+
+Each backend runs in its own subprocess so memory numbers are not mixed up,
+through the same engine registry path the app uses, and reports:
+
+  * load time (including the one-time ONNX export if the model is missing)
+  * resident memory after loading, and peak RSS over the whole run
+  * latency: per-sentence wall time (p50 / p95) for short requests
+  * throughput: audio-seconds per second with several concurrent requests
+
+    python benchmarks/bench_kokoro_onnx.py
+    python benchmarks/bench_kokoro_onnx.py --backends onnx --concurrency 4 --json
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from engine_registry import KOKORO_ONNX_ENGINE, KOKORO_PROVIDER, get_engine_registry
+from onnx_kokoro import KOKORO_BACKENDS
+
+SAMPLE_RATE = 24000
+
+SENTENCES = [
+    "The quick brown fox jumps over the lazy dog.",
+    "Please remember to bring your umbrella this afternoon.",
+    "Modern speech synthesis learns the mapping from text to sound directly from recordings.",
+    "Our quarterly report shows steady growth across every region.",
+    "Turn left at the next intersection, then continue for two miles.",
+    "Thank you for calling, your call is important to us.",
+]
+
+
+def current_rss_mb():
+    """Resident set size right now (Linux /proc; falls back to the peak elsewhere)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def render(pipeline, text, voice):
+    samples = 0
+    for result in pipeline(text, voice=voice, speed=1.0, split_pattern=r"\n+"):
+        if result.audio is not None:
+            samples += len(result.audio.numpy())
+    return samples / SAMPLE_RATE
+
+
+def run_backend(backend, args):
+    """Measure one backend in this process and return the results dict"""
+    engine = KOKORO_ONNX_ENGINE if backend == "onnx" else KOKORO_PROVIDER
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    pipeline = get_engine_registry().get(engine, lang_code="a")
+    load_seconds = time.perf_counter() - start
+    rss_loaded = current_rss_mb()
+
+    # First call pays for voice loading and lazy initialization
+    render(pipeline, "Warming up.", args.voice)
+
+    latencies = []
+    for i in range(args.requests):
+        start = time.perf_counter()
+        render(pipeline, SENTENCES[i % len(SENTENCES)], args.voice)
+        latencies.append(time.perf_counter() - start)
+
+    batch = [" ".join(SENTENCES)] * args.throughput_requests
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        audio_seconds = sum(pool.map(lambda text: render(pipeline, text, args.voice), batch))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 2),
+        "rss_model_mb": round(rss_loaded - rss_before, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "latency_p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 1),
+        "latency_p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 1),
+        "throughput_audio_s_per_s": round(audio_seconds / elapsed, 2),
+        "rtf": round(elapsed / audio_seconds, 3) if audio_seconds else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", choices=list(KOKORO_BACKENDS), default=list(KOKORO_BACKENDS))
+    parser.add_argument("--voice", default="af_heart")
+    parser.add_argument("--requests", type=int, default=30, help="Sequential short requests for latency")
+    parser.add_argument("--throughput-requests", type=int, default=8, help="Paragraph requests for throughput")
+    parser.add_argument("--concurrency", type=int, default=2, help="Concurrent requests in the throughput run")
+    parser.add_argument("--threads", type=int, default=None, help="Sets TTS_CPU_THREADS (intra-op threads)")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    parser.add_argument("--child", choices=list(KOKORO_BACKENDS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.threads:
+        os.environ["TTS_CPU_THREADS"] = str(args.threads)
+        os.environ.setdefault("OMP_NUM_THREADS", str(args.threads))
+    if args.child:
+        print(json.dumps(run_backend(args.child, args)))
+        return
+
+    results = []
+    passthrough = [arg for arg in sys.argv[1:] if arg != "--json"]
+    for backend in args.backends:
+        output = subprocess.run(
+            [sys.executable, __file__, *passthrough, "--child", backend],
+            capture_output=True, text=True, env=os.environ.copy(),
+        )
+        if output.returncode != 0:
+            print(f"{backend}: failed\n{output.stderr.strip()}", file=sys.stderr)
+            continue
+        results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'backend':<8}{'load s':>8}{'model MB':>10}{'peak MB':>9}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'audio-s/s':>11}{'RTF':>8}")
+    for r in results:
+        print(f"{r['backend']:<8}{r['load_seconds']:>8.1f}{r['rss_model_mb']:>10.0f}{r['peak_rss_mb']:>9.0f}"
+              f"{r['latency_p50_ms']:>9.1f}{r['latency_p95_ms']:>9.1f}"
+              f"{r['throughput_audio_s_per_s']:>11.1f}{r['rtf']:>8.3f}")
+    by_backend = {r["backend"]: r for r in results}
+    if "torch" in by_backend and "onnx" in by_backend:
+        torch_r, onnx_r = by_backend["torch"], by_backend["onnx"]
+        print(f"\nonnx vs torch: {torch_r['latency_p50_ms'] / onnx_r['latency_p50_ms']:.2f}x latency, "
+              f"{onnx_r['throughput_audio_s_per_s'] / torch_r['throughput_audio_s_per_s']:.2f}x throughput")
+
+
+if __name__ == "__main__":
+    main()
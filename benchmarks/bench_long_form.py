@@ -0,0 +1,105 @@
+"""Compare serial synthesis with long-form parallel chunking.
+
+Runs the same text through the single-call path used by save_audio_file and
+through long_form.synthesize_long_form at several worker counts, then prints
+the real-time factor (synthesis seconds per audio second) for each.
+
+    python benchmarks/bench_long_form.py --provider kokoro --workers 1 2 4 8
+"""
+import argparse
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from engine_registry import (
+    CHATTERBOX_PROVIDER,
+    KOKORO_PROVIDER,
+    get_engine_registry,
+    pick_torch_device,
+)
+from long_form import (
+    make_chatterbox_chunk_synth,
+    make_kokoro_chunk_synth,
+    synthesize_long_form,
+)
+
+PARAGRAPH = (
+    "The history of speech synthesis goes back further than most people expect. "
+    "Long before computers, inventors built bellows and reeds that imitated the human vocal tract. "
+    "Modern systems instead learn the mapping from text to sound directly from recordings. "
+    "They can now read an entire article aloud with natural rhythm and intonation."
+)
+
+
+def serial_kokoro(pipeline, text, voice, path):
+    with wave.open(str(path), "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(24000)
+        samples = 0
+        for result in pipeline(text, voice=voice, speed=1.0, split_pattern=r"\n+"):
+            if result.audio is None:
+                continue
+            audio = (result.audio.numpy() * 32767).astype(np.int16)
+            samples += len(audio)
+            wav_file.writeframes(audio.tobytes())
+    return samples / 24000
+
+
+def serial_chatterbox(model, text, path):
+    import torchaudio as ta
+
+    wav = model.generate(text, exaggeration=0.5, cfg_weight=0.5, temperature=0.8,
+                         repetition_penalty=1.2, min_p=0.05, top_p=1.0)
+    ta.save(str(path), wav, model.sr)
+    return wav.shape[-1] / model.sr
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--provider", choices=["kokoro", "chatterbox"], default="kokoro")
+    parser.add_argument("--paragraphs", type=int, default=8, help="Length of the synthetic article")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--voice", default="af_heart", help="Kokoro voice")
+    args = parser.parse_args()
+
+    text = "\n\n".join([PARAGRAPH] * args.paragraphs)
+    registry = get_engine_registry()
+    if args.provider == "kokoro":
+        engine = registry.get(KOKORO_PROVIDER, lang_code="a")
+        def make_synth():
+            return make_kokoro_chunk_synth(engine, args.voice, 1.0)
+        sample_rate = 24000
+    else:
+        engine = registry.get(CHATTERBOX_PROVIDER, device=pick_torch_device())
+        def make_synth():
+            return make_chatterbox_chunk_synth(engine)
+        sample_rate = engine.sr
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(tmp) / "out.wav"
+        start = time.perf_counter()
+        if args.provider == "kokoro":
+            audio_seconds = serial_kokoro(engine, text, args.voice, out)
+        else:
+            audio_seconds = serial_chatterbox(engine, text, out)
+        elapsed = time.perf_counter() - start
+        serial_rtf = elapsed / audio_seconds
+        print(f"{'mode':<18}{'audio s':>10}{'wall s':>10}{'RTF':>9}{'speedup':>9}")
+        print(f"{'serial':<18}{audio_seconds:>10.1f}{elapsed:>10.1f}{serial_rtf:>9.3f}{1.0:>9.2f}")
+
+        for workers in args.workers:
+            stats = synthesize_long_form(text, make_synth(), out, sample_rate, workers=workers)
+            label = f"long-form x{stats['workers']}"
+            print(f"{label:<18}{stats['audio_seconds']:>10.1f}{stats['synthesis_seconds']:>10.1f}"
+                  f"{stats['rtf']:>9.3f}{serial_rtf / stats['rtf']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Compare per-segment PCM conversion with the shared AudioPostProcessor.
+
+Feeds an hour (by default) of synthetic speech-like segments through:
+
+  * legacy     - ``(segment * 32767).astype(np.int16).tobytes()``, the
+                 conversion the Kokoro path used (no clipping: overs wrap)
+  * legacy+clip - the same with ``np.clip``, i.e. the output the processor
+                 produces
+  * processor  - AudioPostProcessor with clipping only
+  * full chain - trimming, loudness normalization and 24k -> 22.05k resampling
+
+and prints wall time, throughput in audio-seconds per second, and the peak
+memory allocated by the conversion (tracked with tracemalloc) for each.
+Clipping is an extra pass over the samples, so the processor is compared with
+both baselines; only the clipped one produces the same audio.
+
+    python benchmarks/bench_post_processing.py --hours 1 --segment-seconds 4
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from audio_processing import AudioPostProcessor
+
+SAMPLE_RATE = 24000
+
+
+def make_segment_pool(segment_seconds, count=16, seed=0, overs=True):
+    """A few distinct segments (tone bursts with noise and silent edges) cycled through the run"""
+    rng = np.random.default_rng(seed)
+    pool = []
+    for _ in range(count):
+        # Vary length a little, like real sentences
+        n = int(SAMPLE_RATE * segment_seconds * rng.uniform(0.7, 1.3))
+        t = np.arange(n, dtype=np.float32) / SAMPLE_RATE
+        audio = 0.3 * np.sin(2 * np.pi * rng.uniform(100, 300) * t) + 0.05 * rng.standard_normal(n)
+        edge = n // 10
+        audio[:edge] *= 0.001
+        audio[-edge:] *= 0.001
+        # A few overs, which the legacy conversion wraps around instead of clipping
+        audio[n // 2:n // 2 + 10] = 1.2 if overs else 0.3
+        pool.append(audio.astype(np.float32))
+    return pool
+
+
+def run(name, convert, segments, total_audio_seconds):
+    tracemalloc.start()
+    start = time.perf_counter()
+    samples = 0
+    for segment in segments:
+        samples += memoryview(convert(segment)).nbytes // 2
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:<12} {elapsed:8.2f}s  {total_audio_seconds / elapsed:10.0f} audio-s/s  "
+        f"peak alloc {peak / (1024 * 1024):7.1f} MB  ({samples} samples out)"
+    )
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--hours", type=float, default=1.0)
+    parser.add_argument("--segment-seconds", type=float, default=4.0,
+                        help="Typical sentence length; use e.g. 3600 for one hour-long segment")
+    parser.add_argument("--no-overs", action="store_true", help="Keep every sample within full scale")
+    args = parser.parse_args()
+
+    pool = make_segment_pool(args.segment_seconds, count=1 if args.segment_seconds >= 600 else 16,
+                             overs=not args.no_overs)
+    mean_seconds = sum(len(s) for s in pool) / len(pool) / SAMPLE_RATE
+    count = max(1, round(args.hours * 3600 / mean_seconds))
+    segments = [pool[i % len(pool)] for i in range(count)]
+    total_audio_seconds = sum(len(s) for s in segments) / SAMPLE_RATE
+    print(f"{count} segments, {total_audio_seconds / 3600:.2f} h of audio at {SAMPLE_RATE} Hz\n")
+
+    def legacy(segment):
+        return (segment * 32767).astype(np.int16).tobytes()
+
+    def legacy_clipped(segment):
+        return np.clip(segment * 32767, -32767, 32767).astype(np.int16).tobytes()
+
+    clip_only = AudioPostProcessor(SAMPLE_RATE)
+    full_chain = AudioPostProcessor(SAMPLE_RATE, output_rate=22050, normalize="loudness", trim_silence=True)
+
+    baseline = run("legacy", legacy, segments, total_audio_seconds)
+    clipped = run("legacy+clip", legacy_clipped, segments, total_audio_seconds)
+    processed = run("processor", clip_only.process, segments, total_audio_seconds)
+    run("full chain", full_chain.process, segments, total_audio_seconds)
+    print(f"\nprocessor vs legacy: {baseline / processed:.2f}x, vs legacy+clip: {clipped / processed:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""Start-up benchmark: app import time, script reruns and first-request latency.
+
+Every measurement runs in a fresh subprocess, so nothing is already imported
+or loaded:
+
+  * import    - importing the app's own modules (everything streamlit_app.py
+                imports except Streamlit), median / p95 over ``--repeats``
+                processes, plus the slowest modules from ``-X importtime``
+  * rerun     - with Streamlit installed: the first script run and the median
+                rerun of streamlit_app.py under streamlit.testing's AppTest
+  * per provider and start-up mode (see startup.py):
+      - lazy     nothing preloaded; the first request pays for everything
+      - imports  TTS_STARTUP_MODE=preload (heavy modules imported at launch)
+      - engines  imports plus TTS_PRELOAD_ENGINES for the provider
+    reporting the preload time, the first and second request, and the
+    import / model_load stages of the first request
+
+Results are JSON in the same layout as bench_suite.py, and ``--baseline`` /
+``--compare`` flag regressions the same way:
+
+    python benchmarks/bench_startup.py --output before.json
+    python benchmarks/bench_startup.py --output after.json --baseline before.json
+"""
+import argparse
+import ast
+import datetime
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_suite import PROVIDERS, child_environment, compare, machine_info, peak_rss_mb, percentile, print_comparison
+
+STARTUP_VERSION = 1
+APP_PATH = Path(__file__).resolve().parent.parent / "streamlit_app.py"
+TEXT = "The meeting has been moved to three o'clock this afternoon."
+
+STARTUP_MODES = ("lazy", "imports", "engines")
+# TTS_PRELOAD_ENGINES for the engines mode
+PRELOAD_SPECS = {"kokoro": "kokoro:a", "chatterbox": "chatterbox"}
+
+# Metric (lower is better) -> smallest absolute change worth flagging
+STARTUP_METRICS = {
+    "import_median_seconds": 0.01,
+    "import_p95_seconds": 0.01,
+    "first_run_seconds": 0.05,
+    "rerun_median_seconds": 0.005,
+    "preload_seconds": 0.05,
+    "first_request_seconds": 0.05,
+    "second_request_seconds": 0.01,
+    "peak_rss_mb": 10.0,
+}
+
+
+def app_modules():
+    """The repo modules streamlit_app.py imports at top level, in order"""
+    root = APP_PATH.parent
+    modules = []
+    for node in ast.parse(APP_PATH.read_text(encoding="utf-8")).body:
+        names = [node.module] if isinstance(node, ast.ImportFrom) and node.module else []
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        modules += [name for name in names if (root / f"{name}.py").exists() and name not in modules]
+    return modules
+
+
+def measure_imports(repeats, env):
+    """Import the app modules in fresh interpreters; return timings and the slowest modules"""
+    code = (
+        "import time; start = time.perf_counter()\n"
+        f"import {', '.join(app_modules())}\n"
+        "print(time.perf_counter() - start)"
+    )
+    seconds, cumulative = [], {}
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                                env=env, cwd=APP_PATH.parent)
+        if output.returncode != 0:
+            raise RuntimeError((output.stderr.strip().splitlines() or ["import failed"])[-1])
+        seconds.append(float(output.stdout.strip().splitlines()[-1]))
+        # "import time: self [us] | cumulative | imported package", indented by nesting depth
+        for line in output.stderr.splitlines():
+            match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)", line)
+            if match and not match.group(3):
+                cumulative.setdefault(match.group(4), []).append(int(match.group(2)) / 1e6)
+    slowest = sorted(((statistics.median(values), name) for name, values in cumulative.items()), reverse=True)[:10]
+    return {
+        "provider": "app",
+        "size": "import",
+        "modules": len(app_modules()),
+        "import_median_seconds": round(statistics.median(seconds), 4),
+        "import_p95_seconds": round(percentile(seconds, 0.95), 4),
+        "slowest_imports": [{"module": name, "seconds": round(value, 4)} for value, name in slowest],
+    }
+
+
+def run_rerun_child(repeats):
+    """Run streamlit_app.py under AppTest in this process and time the first run and the reruns"""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(str(APP_PATH), default_timeout=120)
+    start = time.perf_counter()
+    app.run()
+    first_run = time.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(str(app.exception[0].message))
+    reruns = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        app.run()
+        reruns.append(time.perf_counter() - start)
+    return {
+        "provider": "app",
+        "size": "rerun",
+        "first_run_seconds": round(first_run, 4),
+        "rerun_median_seconds": round(statistics.median(reruns), 4),
+        "rerun_p95_seconds": round(percentile(reruns, 0.95), 4),
+    }
+
+
+def run_request_child(provider_name, mode, mock_delays):
+    """Start up like the app in mode, then time two requests; return the results dict"""
+    launched = time.perf_counter()
+    extra = {}
+    if provider_name == "elevenlabs":
+        from mock_elevenlabs import start_mock_server
+
+        server = start_mock_server(first_byte_delay=mock_delays[0], chunk_delay=mock_delays[1])
+        os.environ["ELEVENLABS_API_BASE"] = server.base_url
+        extra = {"api_key": "bench", "voice_id": "mock-rachel"}
+
+    from startup import start_from_env
+    from synthesis import synthesize_to_file
+
+    # Wait for the preload so the first request measures what a user gets once the app is ready
+    preload_start = time.perf_counter()
+    thread = start_from_env()
+    if thread is not None:
+        thread.join()
+    preload_seconds = time.perf_counter() - preload_start
+
+    requests = []
+    with tempfile.TemporaryDirectory() as audio_dir:
+        for _ in range(2):
+            start = time.perf_counter()
+            _, metadata = synthesize_to_file(TEXT, 1.0, PROVIDERS[provider_name], audio_dir=audio_dir, **extra)
+            requests.append((time.perf_counter() - start, metadata.get("timings") or {}))
+            if metadata.get("cache_hit"):
+                raise RuntimeError("synthesis cache hit; the benchmark must run with caching disabled")
+    (first, first_timings), (second, _) = requests
+    return {
+        "provider": provider_name,
+        "size": mode,
+        "preload_seconds": round(preload_seconds, 4) if thread is not None else None,
+        "first_request_seconds": round(first, 4),
+        "first_import_seconds": first_timings.get("import"),
+        "first_model_load_seconds": first_timings.get("model_load"),
+        "second_request_seconds": round(second, 4),
+        "ready_after_seconds": round(time.perf_counter() - launched - second, 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def mode_environment(env, provider_name, mode):
+    env = dict(env)
+    env["TTS_STARTUP_MODE"] = "lazy" if mode == "lazy" else "preload"
+    env["TTS_PRELOAD_ENGINES"] = PRELOAD_SPECS.get(provider_name, "") if mode == "engines" else ""
+    return env
+
+
+def run_child_process(command, env, label):
+    print(f"  {label:<22}", end="", flush=True)
+    output = subprocess.run(command, capture_output=True, text=True, env=env)
+    lines = output.stdout.strip().splitlines()
+    if output.returncode != 0 or not lines:
+        error = (output.stderr.strip().splitlines() or ["failed"])[-1]
+        print(f" failed: {error}")
+        return None, error
+    return json.loads(lines[-1]), None
+
+
+def run_startup(args):
+    env = child_environment(args)
+    results = []
+
+    print(f"  {'app import':<22}", end="", flush=True)
+    try:
+        result = measure_imports(args.repeats, env)
+        print(f" median {result['import_median_seconds'] * 1000:.0f} ms "
+              f"(slowest: {', '.join(item['module'] for item in result['slowest_imports'][:3])})")
+        results.append(result)
+    except RuntimeError as e:
+        print(f" failed: {e}")
+        results.append({"provider": "app", "size": "import", "error": str(e)})
+
+    if importlib.util.find_spec("streamlit") is not None:
+        result, error = run_child_process(
+            [sys.executable, __file__, "--child-rerun", "--repeats", str(args.repeats)], env, "app rerun")
+        if result:
+            print(f" first run {result['first_run_seconds']:.2f}s, rerun {result['rerun_median_seconds'] * 1000:.0f} ms")
+        results.append(result or {"provider": "app", "size": "rerun", "error": error})
+    else:
+        print("  app rerun              skipped (streamlit is not installed)")
+
+    for provider_name in args.providers:
+        modes = STARTUP_MODES if provider_name in PRELOAD_SPECS else ("lazy",)
+        for mode in modes:
+            command = [
+                sys.executable, __file__, "--child", provider_name, mode,
+                "--mock-first-byte-delay", str(args.mock_first_byte_delay),
+                "--mock-chunk-delay", str(args.mock_chunk_delay),
+            ]
+            result, error = run_child_process(command, mode_environment(env, provider_name, mode),
+                                              f"{provider_name} {mode}")
+            if result:
+                preload = "" if result["preload_seconds"] is None else f"preload {result['preload_seconds']:.2f}s, "
+                print(f" {preload}first {result['first_request_seconds']:.2f}s, "
+                      f"second {result['second_request_seconds']:.2f}s")
+            results.append(result or {"provider": provider_name, "size": mode, "error": error})
+
+    return {
+        "startup_version": STARTUP_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "corpus_sha256": hashlib.sha256(TEXT.encode("utf-8")).hexdigest(),
+        "settings": {
+            "repeats": args.repeats,
+            "chatterbox_profile": args.chatterbox_profile,
+            "kokoro_backend": args.kokoro_backend,
+            "threads": args.threads,
+            "mock_first_byte_delay": args.mock_first_byte_delay,
+            "mock_chunk_delay": args.mock_chunk_delay,
+        },
+        "machine": machine_info(),
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--providers", nargs="+", choices=[name for name in PROVIDERS if name != "mac"],
+                        default=["kokoro", "chatterbox", "elevenlabs"])
+    parser.add_argument("--repeats", type=int, default=5, help="Import processes and reruns to time")
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads for the local engines")
+    parser.add_argument("--chatterbox-profile", default="cpu", help="Inference profile for Chatterbox (default: cpu)")
+    parser.add_argument("--kokoro-backend", default="torch", help="Kokoro engine: torch or onnx")
+    parser.add_argument("--mock-first-byte-delay", type=float, default=0.05, help="Mock ElevenLabs latency (s)")
+    parser.add_argument("--mock-chunk-delay", type=float, default=0.002, help="Mock ElevenLabs delay between chunks (s)")
+    parser.add_argument("--output", default=None, help="Results file (default: benchmarks/results/startup_<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="Compare the new results against this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="Only compare two result files")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown flagged as a regression")
+    parser.add_argument("--child", nargs=2, metavar=("PROVIDER", "MODE"), help=argparse.SUPPRESS)
+    parser.add_argument("--child-rerun", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        provider_name, mode = args.child
+        print(json.dumps(run_request_child(provider_name, mode, (args.mock_first_byte_delay, args.mock_chunk_delay))))
+        return
+    if args.child_rerun:
+        print(json.dumps(run_rerun_child(args.repeats)))
+        return
+
+    if args.compare:
+        baseline, current = (json.loads(Path(path).read_text()) for path in args.compare)
+    else:
+        print(f"Benchmarking start-up for {', '.join(args.providers)}")
+        current = run_startup(args)
+        output = Path(args.output or Path(__file__).resolve().parent / "results"
+                      / f"startup_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(current, indent=2))
+        print(f"Results written to {output}")
+        if not args.baseline:
+            sys.exit(1 if any("error" in r for r in current["results"]) else 0)
+        baseline = json.loads(Path(args.baseline).read_text())
+
+    rows, regressions = compare(baseline, current, args.threshold, metrics=STARTUP_METRICS)
+    print_comparison(rows, regressions, args.threshold)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""Reproducible end-to-end benchmark suite for the TTS providers.
+
+Runs the Kokoro, Chatterbox and ElevenLabs branches of synthesis (the code
+behind save_audio_file) over a fixed corpus of short, medium and long texts.
+Local engines run on the CPU. ElevenLabs runs against the local mock API
+with fixed latency. Every (provider, size) pair runs in a fresh subprocess
+with an empty audio directory and the synthesis cache disabled, so that:
+
+  * cold      - the first request, including model loading
+  * warm      - the following ``--repeats`` requests (median and p95)
+  * TTFA      - time to first audio (first streamed segment)
+  * RTF       - synthesis seconds per second of audio
+  * peak RSS  - the subprocess's peak resident memory
+
+are comparable between runs. Results are written as JSON; ``--compare``
+flags metrics that got worse by more than ``--threshold``:
+
+    python benchmarks/bench_suite.py --output before.json
+    python benchmarks/bench_suite.py --output after.json --baseline before.json
+    python benchmarks/bench_suite.py --compare before.json after.json
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SUITE_VERSION = 1
+
+CORPUS = {
+    "short": "The meeting has been moved to three o'clock this afternoon.",
+    "medium": (
+        "Speech synthesis has come a long way. Early systems stitched together recorded fragments, "
+        "and listeners could hear every seam. Today's neural models learn pronunciation, rhythm and "
+        "intonation directly from recordings, so a single sentence can sound natural from start to finish. "
+        "That quality comes at a cost, which is why we measure it."
+    ),
+    "long": "\n\n".join([
+        "Every morning the harbor wakes slowly. Fishing boats return with the tide, gulls circle the masts, "
+        "and the first cafes roll up their shutters while the streets are still wet from the night's rain.",
+        "By nine o'clock the market is full. Vendors call out prices for mackerel and sardines, children "
+        "weave between the stalls, and the smell of fresh bread drifts down from the bakery on the hill.",
+        "In the afternoon the town grows quiet. Shops close for a long lunch, old men play cards in the "
+        "shade of the church, and the only sound is the water slapping against the stone of the quay.",
+        "When evening comes, the lights along the promenade flicker on one by one. Families walk by the "
+        "sea, musicians set up on the corners, and the harbor settles in to wait for the boats again.",
+    ]),
+}
+
+PROVIDERS = {
+    "kokoro": "Kokoro (local open model)",
+    "chatterbox": "Chatterbox (open-source)",
+    "elevenlabs": "ElevenLabs",
+    "mac": "Mac (say command)",
+}
+
+# Metric (lower is better) -> smallest absolute change worth flagging
+COMPARED_METRICS = {
+    "cold_seconds": 0.05,
+    "warm_median_seconds": 0.01,
+    "warm_p95_seconds": 0.01,
+    "ttfa_median_seconds": 0.01,
+    "rtf_median": 0.005,
+    "peak_rss_mb": 10.0,
+}
+
+
+def corpus_sha256():
+    return hashlib.sha256(json.dumps(CORPUS, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_child(provider_name, size, repeats, mock_delays):
+    """Benchmark one (provider, size) pair in this process and return its results dict"""
+    extra = {}
+    if provider_name == "elevenlabs":
+        from mock_elevenlabs import start_mock_server
+
+        server = start_mock_server(first_byte_delay=mock_delays[0], chunk_delay=mock_delays[1])
+        os.environ["ELEVENLABS_API_BASE"] = server.base_url
+        extra = {"api_key": "bench", "voice_id": "mock-rachel"}
+
+    from synthesis import synthesize_to_file
+
+    text = CORPUS[size]
+    runs = []
+    with tempfile.TemporaryDirectory() as audio_dir:
+        for _ in range(repeats + 1):
+            start = time.perf_counter()
+            filepath, metadata = synthesize_to_file(text, 1.0, PROVIDERS[provider_name], audio_dir=audio_dir, **extra)
+            elapsed = time.perf_counter() - start
+            audio_seconds = metadata.get("audio_seconds")
+            runs.append({
+                "seconds": elapsed,
+                "ttfa": metadata.get("time_to_first_audio"),
+                "audio_seconds": audio_seconds,
+                "rtf": elapsed / audio_seconds if audio_seconds else None,
+            })
+            if metadata.get("cache_hit"):
+                raise RuntimeError("synthesis cache hit; the suite must run with caching disabled")
+
+    cold, warm = runs[0], runs[1:] or runs[:1]
+    warm_seconds = [run["seconds"] for run in warm]
+    warm_ttfa = [run["ttfa"] for run in warm if run["ttfa"] is not None]
+    warm_rtf = [run["rtf"] for run in warm if run["rtf"] is not None]
+    return {
+        "provider": provider_name,
+        "size": size,
+        "chars": len(text),
+        "audio_seconds": round(cold["audio_seconds"], 3) if cold["audio_seconds"] else None,
+        "cold_seconds": round(cold["seconds"], 4),
+        "cold_ttfa_seconds": cold["ttfa"],
+        "warm_median_seconds": round(statistics.median(warm_seconds), 4),
+        "warm_p95_seconds": round(percentile(warm_seconds, 0.95), 4),
+        "ttfa_median_seconds": round(statistics.median(warm_ttfa), 4) if warm_ttfa else None,
+        "rtf_median": round(statistics.median(warm_rtf), 4) if warm_rtf else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "repeats": len(warm),
+    }
+
+
+def child_environment(args):
+    env = os.environ.copy()
+    env.update({
+        # Local engines on the CPU, every request actually synthesized, plain WAV output
+        "CUDA_VISIBLE_DEVICES": "",
+        "PYTORCH_ENABLE_MPS_FALLBACK": "0",
+        "TTS_CHATTERBOX_PROFILE": args.chatterbox_profile,
+        "TTS_KOKORO_BACKEND": args.kokoro_backend,
+        "TTS_SYNTHESIS_CACHE_MAX_MB": "0",
+        "TTS_STORAGE_FORMAT": "wav",
+        "TTS_PRELOAD_ENGINES": "",
+    })
+    if args.threads:
+        env["TTS_CPU_THREADS"] = str(args.threads)
+        env["OMP_NUM_THREADS"] = str(args.threads)
+    return env
+
+
+def machine_info():
+    info = {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+    }
+    try:
+        from importlib.metadata import version
+
+        for package in ("torch", "kokoro", "chatterbox-tts", "onnxruntime"):
+            try:
+                info[package] = version(package)
+            except Exception:
+                pass
+    except Exception:
+        pass
+    return info
+
+
+def run_suite(args):
+    results = []
+    env = child_environment(args)
+    for provider_name in args.providers:
+        for size in args.sizes:
+            command = [
+                sys.executable, __file__, "--child", provider_name, size,
+                "--repeats", str(args.repeats),
+                "--mock-first-byte-delay", str(args.mock_first_byte_delay),
+                "--mock-chunk-delay", str(args.mock_chunk_delay),
+            ]
+            print(f"  {provider_name:<11} {size:<7}", end="", flush=True)
+            output = subprocess.run(command, capture_output=True, text=True, env=env)
+            lines = output.stdout.strip().splitlines()
+            if output.returncode != 0 or not lines:
+                error = (output.stderr.strip().splitlines() or ["failed"])[-1]
+                print(f" failed: {error}")
+                results.append({"provider": provider_name, "size": size, "error": error})
+                continue
+            result = json.loads(lines[-1])
+            print(f" cold {result['cold_seconds']:.2f}s, warm {result['warm_median_seconds']:.2f}s")
+            results.append(result)
+    return {
+        "suite_version": SUITE_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "corpus_sha256": corpus_sha256(),
+        "settings": {
+            "repeats": args.repeats,
+            "chatterbox_profile": args.chatterbox_profile,
+            "kokoro_backend": args.kokoro_backend,
+            "threads": args.threads,
+            "mock_first_byte_delay": args.mock_first_byte_delay,
+            "mock_chunk_delay": args.mock_chunk_delay,
+        },
+        "machine": machine_info(),
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold, metrics=COMPARED_METRICS):
+    """Return (rows, regressions) comparing two suite result files on metrics (name -> smallest change flagged)"""
+    if baseline.get("corpus_sha256") != current.get("corpus_sha256"):
+        print("⚠️  The corpus changed between the runs; numbers are not directly comparable")
+    if baseline.get("machine", {}).get("platform") != current.get("machine", {}).get("platform"):
+        print("⚠️  The runs were made on different platforms")
+
+    base_by_key = {(r["provider"], r["size"]): r for r in baseline["results"] if "error" not in r}
+    rows, regressions = [], []
+    for result in current["results"]:
+        key = (result["provider"], result["size"])
+        base = base_by_key.get(key)
+        if base is None or "error" in result:
+            continue
+        for metric, min_delta in metrics.items():
+            old, new = base.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            regressed = new - old > min_delta and change > threshold
+            improved = old - new > min_delta and -change > threshold
+            row = {"provider": key[0], "size": key[1], "metric": metric, "baseline": old, "current": new,
+                   "change": round(change, 4), "status": "regression" if regressed else "improved" if improved else "ok"}
+            rows.append(row)
+            if regressed:
+                regressions.append(row)
+    return rows, regressions
+
+
+def print_comparison(rows, regressions, threshold):
+    print(f"\n{'provider':<11}{'size':<8}{'metric':<22}{'baseline':>10}{'current':>10}{'change':>9}")
+    markers = {"regression": "  ▲ regression", "improved": "  ▼ improved", "ok": ""}
+    for row in rows:
+        print(f"{row['provider']:<11}{row['size']:<8}{row['metric']:<22}{row['baseline']:>10.3f}"
+              f"{row['current']:>10.3f}{row['change']:>+9.1%}{markers[row['status']]}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {threshold:.0%}")
+    else:
+        print(f"\nNo regressions beyond {threshold:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    default_providers = ["kokoro", "chatterbox", "elevenlabs"] + (["mac"] if sys.platform == "darwin" else [])
+    parser.add_argument("--providers", nargs="+", choices=list(PROVIDERS), default=default_providers)
+    parser.add_argument("--sizes", nargs="+", choices=list(CORPUS), default=list(CORPUS))
+    parser.add_argument("--repeats", type=int, default=3, help="Warm requests after the cold one")
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads for the local engines")
+    parser.add_argument("--chatterbox-profile", default="cpu", help="Inference profile for Chatterbox (default: cpu)")
+    parser.add_argument("--kokoro-backend", default="torch", help="Kokoro engine: torch or onnx")
+    parser.add_argument("--mock-first-byte-delay", type=float, default=0.05, help="Mock ElevenLabs latency (s)")
+    parser.add_argument("--mock-chunk-delay", type=float, default=0.002, help="Mock ElevenLabs delay between chunks (s)")
+    parser.add_argument("--output", default=None, help="Results file (default: benchmarks/results/suite_<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="Compare the new results against this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="Only compare two result files")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown flagged as a regression")
+    parser.add_argument("--child", nargs=2, metavar=("PROVIDER", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        provider_name, size = args.child
+        result = run_child(provider_name, size, args.repeats, (args.mock_first_byte_delay, args.mock_chunk_delay))
+        print(json.dumps(result))
+        return
+
+    if args.compare:
+        baseline, current = (json.loads(Path(path).read_text()) for path in args.compare)
+    else:
+        print(f"Benchmarking {', '.join(args.providers)} over {', '.join(args.sizes)} texts "
+              f"({args.repeats} warm repeats)")
+        current = run_suite(args)
+        output = Path(args.output or Path(__file__).resolve().parent / "results"
+                      / f"suite_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(current, indent=2))
+        print(f"Results written to {output}")
+        if not args.baseline:
+            sys.exit(1 if any("error" in r for r in current["results"]) else 0)
+        baseline = json.loads(Path(args.baseline).read_text())
+
+    rows, regressions = compare(baseline, current, args.threshold)
+    print_comparison(rows, regressions, args.threshold)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Per-request overhead of the system voice: the old two-process shell path vs. the pipe.
+
+For each text, runs ``--repeats`` requests through:
+
+  * engine     the engine alone, audio discarded: the floor both paths share
+  * two-step   what the Mac provider used to do: ``say -o x.aiff "<text>"``
+               then ``afconvert`` to WAV, via os.system. On Linux the same
+               shape with espeak-ng: ``espeak-ng -w x.wav "<text>"`` then a
+               second process (sox or ffmpeg if installed, else ``cp``)
+  * pipe       system_voice.SystemVoiceStream into write_chunks_to_wav, the
+               provider's current path: one process, no shell, no temp file
+
+and prints median / p95 latency, the overhead over the engine alone and the
+time to first audio (for two-step, the whole request).
+
+    python benchmarks/bench_system_voice.py
+    python benchmarks/bench_system_voice.py --engine espeak-ng --repeats 20 --json
+"""
+import argparse
+import json
+import os
+import shlex
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_suite import machine_info, percentile
+from long_form import write_chunks_to_wav
+from system_voice import SystemVoiceStream, system_voice_engine, system_voice_name
+
+TEXTS = {
+    "word": "Hello.",
+    "sentence": "The quick brown fox jumps over the lazy dog, then naps in the afternoon sun.",
+    "paragraph": (
+        "By nine o'clock the market is full. Vendors call out prices for fruit and fish, children weave "
+        "between the stalls, and the smell of fresh bread drifts from the bakery on the corner. "
+        "By noon the crowds thin out, and by two the square is quiet again."
+    ),
+}
+
+
+def converter_command(source, target):
+    """The second process of the Linux two-step emulation"""
+    if shutil.which("sox"):
+        return f"sox {shlex.quote(str(source))} -b 16 {shlex.quote(str(target))}"
+    if shutil.which("ffmpeg"):
+        return f"ffmpeg -loglevel error -y -i {shlex.quote(str(source))} -c:a pcm_s16le {shlex.quote(str(target))}"
+    return f"cp {shlex.quote(str(source))} {shlex.quote(str(target))}"
+
+
+def engine_only(engine, text, wpm, voice, tmp):
+    argv = engine.command(wpm, voice)
+    start = time.perf_counter()
+    subprocess.run(argv, input=text.encode("utf-8"), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+def two_step(engine, text, wpm, voice, tmp):
+    # Quoted here so the benchmark texts survive; the old code did not quote at all
+    voice_arg = f"-v {shlex.quote(voice)} " if voice else ""
+    target = tmp / "two_step.wav"
+    if engine.name == "say":
+        intermediate = tmp / "two_step.aiff"
+        first = f"say -r {wpm} {voice_arg}-o {shlex.quote(str(intermediate))} {shlex.quote(text)}"
+        second = f"afconvert -f WAVE -d LEI16 {shlex.quote(str(intermediate))} {shlex.quote(str(target))}"
+    else:
+        intermediate = tmp / "two_step_raw.wav"
+        first = f"espeak-ng -s {wpm} {voice_arg}-w {shlex.quote(str(intermediate))} {shlex.quote(text)}"
+        second = converter_command(intermediate, target)
+    start = time.perf_counter()
+    if os.system(first) != 0 or os.system(second) != 0:
+        raise RuntimeError("two-step command failed")
+    os.remove(intermediate)
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+def pipe(engine, text, wpm, voice, tmp):
+    first_audio = None
+    start = time.perf_counter()
+
+    def note_first(audio, sample_rate):
+        nonlocal first_audio
+        if first_audio is None:
+            first_audio = time.perf_counter() - start
+
+    with SystemVoiceStream(engine, text, wpm / engine.base_wpm, voice) as stream:
+        write_chunks_to_wav(tmp / "pipe.wav", stream.chunks(), stream.sample_rate, silence_ms=0, on_chunk=note_first)
+    elapsed = time.perf_counter() - start
+    return elapsed, first_audio if first_audio is not None else elapsed
+
+
+PATHS = {"engine": engine_only, "two-step": two_step, "pipe": pipe}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--engine", default=None, help="say or espeak-ng (default: TTS_SYSTEM_VOICE_ENGINE / auto)")
+    parser.add_argument("--voice", default=None, help="Engine voice (default: TTS_SYSTEM_VOICE)")
+    parser.add_argument("--texts", nargs="+", choices=list(TEXTS), default=list(TEXTS))
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    engine = system_voice_engine(args.engine)
+    voice = args.voice or system_voice_name()
+    wpm = engine.base_wpm
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_system_voice_") as tmp:
+        tmp = Path(tmp)
+        for text_name in args.texts:
+            text = TEXTS[text_name]
+            row = {"text": text_name, "characters": len(text)}
+            for path_name, run in PATHS.items():
+                run(engine, text, wpm, voice, tmp)  # warm the page cache and the engine's data files
+                latencies, first_audio = [], []
+                for _ in range(args.repeats):
+                    elapsed, ttfa = run(engine, text, wpm, voice, tmp)
+                    latencies.append(elapsed)
+                    first_audio.append(ttfa)
+                row[path_name] = {
+                    "median_ms": round(statistics.median(latencies) * 1000, 2),
+                    "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+                    "ttfa_median_ms": round(statistics.median(first_audio) * 1000, 2),
+                }
+            for path_name in ("two-step", "pipe"):
+                row[path_name]["overhead_ms"] = round(row[path_name]["median_ms"] - row["engine"]["median_ms"], 2)
+            results.append(row)
+
+    second_process = "afconvert" if engine.name == "say" else converter_command("a", "b").split()[0]
+    if args.json:
+        print(json.dumps({"machine": machine_info(), "engine": engine.name, "second_process": second_process,
+                          "repeats": args.repeats, "results": results}, indent=2))
+        return
+
+    print(f"{engine.name}, two-step converts with {second_process}, {args.repeats} repeats\n")
+    print(f"{'text':<11}{'path':<10}{'median ms':>11}{'p95 ms':>9}{'overhead ms':>13}{'TTFA ms':>9}")
+    for row in results:
+        for path_name in PATHS:
+            r = row[path_name]
+            overhead = f"{r['overhead_ms']:.1f}" if "overhead_ms" in r else "—"
+            print(f"{row['text']:<11}{path_name:<10}{r['median_ms']:>11.1f}{r['p95_ms']:>9.1f}{overhead:>13}"
+                  f"{r['ttfa_median_ms']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
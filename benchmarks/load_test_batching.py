@@ -0,0 +1,198 @@
+"""Load test: Kokoro throughput with cross-session batching vs. single requests.
+
+Simulates ``--clients`` sessions pressing Submit at the same time, each
+sending ``--requests`` short texts through synthesize_to_file (the path the
+app and the job queue use), with the synthesis cache off. Each batch size
+runs in its own subprocess; ``1`` is single-request mode (batching off):
+
+  * throughput  requests per second and audio-seconds per second
+  * latency     per-request p50 / p95 as the clients see it
+  * batching    mean and largest batch, mean time queued for a batch
+  * fidelity    per sentence against single-request mode: duration ratio
+                (1.00 when every phoneme got the same duration) and
+                log-spectral distance in dB. Kokoro's noise source makes two
+                runs differ slightly even without batching.
+
+    python benchmarks/load_test_batching.py
+    python benchmarks/load_test_batching.py --clients 16 --batch-sizes 1 4 16 --max-wait-ms 20 --json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from bench_chatterbox_profiles import log_spectral_distance_db
+from bench_suite import percentile
+
+SENTENCES = [
+    "The quick brown fox jumps over the lazy dog.",
+    "Please remember to bring your umbrella this afternoon.",
+    "Our quarterly report shows steady growth across every region.",
+    "Turn left at the next intersection, then continue for two miles.",
+    "Thank you for calling, your call is important to us.",
+    "The library will be closed on Monday for the holiday.",
+    "Fresh bread is delivered to the market every morning at six.",
+    "Your package has been shipped and should arrive on Thursday.",
+]
+
+
+def read_wav(path):
+    with wave.open(str(path), "rb") as f:
+        frames = f.readframes(f.getnframes())
+    return np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def run_child(args, dump_path):
+    """Run the load in this process and return the results dict"""
+    from batching import batch_settings, batching_stats
+    from engine_registry import KOKORO_PROVIDER
+    from synthesis import synthesize_to_file
+
+    audio_dir = tempfile.TemporaryDirectory(prefix="load_test_batching_")
+    options = {"audio_dir": audio_dir.name, "kokoro_voice": args.voice, "kokoro_backend": "torch"}
+    # Model load and first-call overhead stay out of the measurement
+    synthesize_to_file("Warming up.", 1.0, KOKORO_PROVIDER, **options)
+
+    latencies, audio_seconds, errors = [], [], []
+    first_output = {}
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(args.clients)
+
+    def client(index):
+        start_barrier.wait()
+        for r in range(args.requests):
+            text = SENTENCES[(index + r) % len(SENTENCES)]
+            start = time.perf_counter()
+            try:
+                filepath, metadata = synthesize_to_file(text, 1.0, KOKORO_PROVIDER, **options)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                audio_seconds.append(metadata.get("audio_seconds") or 0.0)
+                first_output.setdefault(text, str(filepath))
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - wall_start
+
+    np.savez(dump_path, **{str(SENTENCES.index(text)): read_wav(path) for text, path in first_output.items()})
+    audio_dir.cleanup()
+    stats = batching_stats()
+    return {
+        "batch_size": batch_settings()[0],
+        "max_wait_ms": round(batch_settings()[1] * 1000, 2),
+        "clients": args.clients,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "wall_seconds": round(wall, 3),
+        "requests_per_second": round(len(latencies) / wall, 3) if wall else None,
+        "audio_seconds_per_second": round(sum(audio_seconds) / wall, 3) if wall else None,
+        "latency_p50_seconds": round(statistics.median(latencies), 3) if latencies else None,
+        "latency_p95_seconds": round(percentile(latencies, 0.95), 3) if latencies else None,
+        "mean_batch_size": stats[0]["mean_batch_size"] if stats else 1.0,
+        "largest_batch": stats[0]["largest_batch"] if stats else 1,
+        "mean_queue_ms": stats[0]["mean_queue_ms"] if stats else 0.0,
+    }
+
+
+def fidelity(reference_path, candidate_path):
+    reference, candidate = np.load(reference_path), np.load(candidate_path)
+    ratios, distances = [], []
+    for key in reference.files:
+        if key not in candidate.files or not len(reference[key]):
+            continue
+        ratios.append(len(candidate[key]) / len(reference[key]))
+        distances.append(log_spectral_distance_db(reference[key], candidate[key]))
+    return {
+        "duration_ratio": round(float(np.mean(ratios)), 3) if ratios else None,
+        "log_spectral_distance_db": round(float(np.mean(distances)), 2) if distances else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent sessions")
+    parser.add_argument("--requests", type=int, default=4, help="Requests per session")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8], help="TTS_BATCH_MAX_SIZE values (1 = off)")
+    parser.add_argument("--max-wait-ms", type=float, default=10, help="TTS_BATCH_MAX_WAIT_MS")
+    parser.add_argument("--voice", default="af_heart")
+    parser.add_argument("--threads", type=int, default=None, help="Sets TTS_CPU_THREADS / OMP_NUM_THREADS")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    parser.add_argument("--child", metavar="DUMP", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args, args.child)))
+        return
+
+    batch_sizes = sorted(set(args.batch_sizes), key=lambda size: (size != 1, size))
+    results, dumps = [], {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in batch_sizes:
+            env = os.environ.copy()
+            env.update({
+                "CUDA_VISIBLE_DEVICES": "",
+                "PYTORCH_ENABLE_MPS_FALLBACK": "0",
+                "TTS_BATCH_MAX_SIZE": str(size),
+                "TTS_BATCH_MAX_WAIT_MS": str(args.max_wait_ms),
+                "TTS_SYNTHESIS_CACHE_MAX_MB": "0",
+                "TTS_STORAGE_FORMAT": "wav",
+                "TTS_PRELOAD_ENGINES": "",
+            })
+            if args.threads:
+                env["TTS_CPU_THREADS"] = env["OMP_NUM_THREADS"] = str(args.threads)
+            dumps[size] = str(Path(tmp) / f"batch_{size}.npz")
+            passthrough = [arg for arg in sys.argv[1:] if arg != "--json"]
+            output = subprocess.run([sys.executable, __file__, *passthrough, "--child", dumps[size]],
+                                    capture_output=True, text=True, env=env)
+            if output.returncode != 0:
+                print(f"batch size {size}: failed\n{output.stderr.strip()}", file=sys.stderr)
+                continue
+            results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+        single = next((r for r in results if r["batch_size"] == 1), None)
+        for result in results:
+            if single is not None and result is not single:
+                result.update(fidelity(dumps[1], dumps[result["batch_size"]]))
+                result["speedup"] = round(result["requests_per_second"] / single["requests_per_second"], 2)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.clients} clients x {args.requests} requests, max wait {args.max_wait_ms:g} ms\n")
+    print(f"{'batch':>6}{'req/s':>8}{'audio-s/s':>11}{'p50 s':>8}{'p95 s':>8}{'mean bs':>9}{'max bs':>8}"
+          f"{'queue ms':>10}{'speedup':>9}{'dur':>6}{'LSD dB':>8}")
+    for r in results:
+        speedup = f"{r['speedup']:.2f}" if "speedup" in r else "—"
+        ratio = "—" if r.get("duration_ratio") is None else f"{r['duration_ratio']:.2f}"
+        lsd = "—" if r.get("log_spectral_distance_db") is None else f"{r['log_spectral_distance_db']:.2f}"
+        print(f"{r['batch_size']:>6}{r['requests_per_second']:>8.2f}{r['audio_seconds_per_second']:>11.2f}"
+              f"{r['latency_p50_seconds']:>8.2f}{r['latency_p95_seconds']:>8.2f}{r['mean_batch_size']:>9.2f}"
+              f"{r['largest_batch']:>8}{r['mean_queue_ms']:>10.1f}{speedup:>9}{ratio:>6}{lsd:>8}")
+        if r["errors"]:
+            print(f"       {r['errors']} failed requests, e.g. {r['first_error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Local stand-in for the ElevenLabs API, for benchmarks and offline development.
+
+Implements the endpoints the app uses:
+
+- ``GET  /v1/voices``
+- ``POST /v1/text-to-speech/<voice_id>`` (whole response)
+- ``POST /v1/text-to-speech/<voice_id>/stream`` (chunked transfer)
+
+and returns silent MP3 frames whose length scales with the text. Latency can
+be injected (and changed while running) to mimic a slow or long-tailed API:
+``--slow-rate`` sends that fraction of requests into the tail, each waiting
+an extra ``--slow-delay`` before its first byte. ``--chunk-delay`` is the
+time to generate each chunk of audio, on both endpoints: the stream endpoint
+sends each chunk as it is ready, the whole-response one after the last.
+The server speaks HTTP/1.1 keep-alive and counts TCP connections, so
+connection reuse by the client can be verified.
+
+    python benchmarks/mock_elevenlabs.py --port 8765 --first-byte-delay 0.4
+    ELEVENLABS_API_BASE=http://127.0.0.1:8765 streamlit run streamlit_app.py
+"""
+import argparse
+import json
+import random
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# One silent MPEG-1 Layer III frame (128 kbps, 44.1 kHz) is 417 bytes and ~26 ms
+SILENT_MP3_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+FRAME_SECONDS = 1152 / 44100
+# Roughly 15 characters of speech per second
+CHARS_PER_SECOND = 15.0
+FRAMES_PER_CHUNK = 16
+
+MOCK_VOICES = [
+    {"name": "Rachel", "voice_id": "mock-rachel"},
+    {"name": "Adam", "voice_id": "mock-adam"},
+    {"name": "Bella", "voice_id": "mock-bella"},
+]
+
+
+class MockElevenLabsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, first_byte_delay=0.0, chunk_delay=0.0, jitter=0.0, fail_rate=0.0, slow_rate=0.0,
+                 slow_delay=0.0):
+        super().__init__(address, _Handler)
+        # Delays are plain attributes so callers can change them between requests
+        self.first_byte_delay = first_byte_delay
+        self.chunk_delay = chunk_delay
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.slow_rate = slow_rate
+        self.slow_delay = slow_delay
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def get_request(self):
+        conn = super().get_request()
+        # Like a real API server: without this, Nagle holds a response's first
+        # small write on a reused connection until the client's delayed ACK
+        conn[0].setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.lock:
+            self.connections += 1
+        return conn
+
+    def handle_error(self, request, client_address):
+        # Clients that abandon a stream (cancelled or hedged requests) are expected
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+
+    def log_message(self, format, *args):
+        pass
+
+    def _count_request(self):
+        with self.server.lock:
+            self.server.requests += 1
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self):
+        if self.headers.get("xi-api-key"):
+            return True
+        self._send_json(401, {"detail": {"status": "invalid_api_key"}})
+        return False
+
+    def do_GET(self):
+        self._count_request()
+        if self.path.rstrip("/") != "/v1/voices":
+            self._send_json(404, {"detail": "not found"})
+            return
+        if self._authorized():
+            self._send_json(200, {"voices": MOCK_VOICES})
+
+    def do_POST(self):
+        self._count_request()
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        parts = self.path.strip("/").split("/")
+        if len(parts) < 3 or parts[:2] != ["v1", "text-to-speech"]:
+            self._send_json(404, {"detail": "not found"})
+            return
+        if not self._authorized():
+            return
+        try:
+            text = json.loads(raw or b"{}").get("text", "")
+        except ValueError:
+            self._send_json(400, {"detail": "invalid json"})
+            return
+        if not text:
+            self._send_json(422, {"detail": "text is required"})
+            return
+
+        server = self.server
+        delay = server.first_byte_delay + random.uniform(0, server.jitter)
+        if server.slow_rate and random.random() < server.slow_rate:
+            delay += server.slow_delay
+        if delay > 0:
+            time.sleep(delay)
+        if server.fail_rate and random.random() < server.fail_rate:
+            self._send_json(500, {"detail": "injected failure"})
+            return
+
+        frames = max(1, int(len(text) / CHARS_PER_SECOND / FRAME_SECONDS))
+        chunks = [SILENT_MP3_FRAME * min(FRAMES_PER_CHUNK, frames - start)
+                  for start in range(0, frames, FRAMES_PER_CHUNK)]
+        streaming = parts[-1] == "stream"
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        if not streaming:
+            # The audio takes as long to generate as on the stream endpoint,
+            # it is only sent once all of it is ready
+            if server.chunk_delay > 0:
+                time.sleep(server.chunk_delay * len(chunks))
+            body = b"".join(chunks)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.flush()
+            if server.chunk_delay > 0:
+                time.sleep(server.chunk_delay)
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def start_mock_server(host="127.0.0.1", port=0, **delays):
+    """Start the mock on a background thread and return the server (see server.base_url)"""
+    server = MockElevenLabsServer((host, port), **delays)
+    thread = threading.Thread(target=server.serve_forever, name="mock-elevenlabs", daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock of the ElevenLabs API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-byte-delay", type=float, default=0.0, help="Seconds before audio starts")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds to generate each audio chunk")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random first-byte delay (uniform, seconds)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of TTS requests answered with HTTP 500")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Fraction of TTS requests sent into the latency tail")
+    parser.add_argument("--slow-delay", type=float, default=0.0, help="Extra first-byte delay of tail requests (seconds)")
+    args = parser.parse_args()
+
+    server = MockElevenLabsServer(
+        (args.host, args.port),
+        first_byte_delay=args.first_byte_delay,
+        chunk_delay=args.chunk_delay,
+        jitter=args.jitter,
+        fail_rate=args.fail_rate,
+        slow_rate=args.slow_rate,
+        slow_delay=args.slow_delay,
+    )
+    print(f"Mock ElevenLabs API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Cooperative cancellation for synthesis running on worker threads.
+
+A job installs a stop check for the current thread with cancellation_scope().
+Synthesis code calls check_cancelled() at natural boundaries (segments,
+chunks, streamed bytes), and install_cancel_hooks() adds torch forward
+pre-hooks to an engine so even a single long model call (e.g. Chatterbox
+autoregressive decoding) stops at the next layer invocation instead of
+running to the end.
+"""
+import threading
+from contextlib import contextmanager
+
+
+class SynthesisCancelled(Exception):
+    """Raised inside synthesis when the surrounding job was cancelled"""
+
+
+_state = threading.local()
+
+
+def current_stop_check():
+    """Return the stop check installed for this thread, or None"""
+    return getattr(_state, "should_stop", None)
+
+
+@contextmanager
+def cancellation_scope(should_stop):
+    """Install should_stop() as this thread's stop check for the duration of the block"""
+    previous = current_stop_check()
+    _state.should_stop = should_stop
+    try:
+        yield
+    finally:
+        _state.should_stop = previous
+
+
+def check_cancelled():
+    """Raise SynthesisCancelled if this thread's job has been cancelled"""
+    should_stop = current_stop_check()
+    if should_stop is not None and should_stop():
+        raise SynthesisCancelled()
+
+
+def propagate_cancellation(fn):
+    """Wrap fn so it runs under the calling thread's stop check (for thread pools)"""
+    should_stop = current_stop_check()
+    if should_stop is None:
+        return fn
+
+    def wrapped(*args, **kwargs):
+        with cancellation_scope(should_stop):
+            check_cancelled()
+            return fn(*args, **kwargs)
+
+    return wrapped
+
+
+def _pre_hook(module, args):
+    check_cancelled()
+
+
+def install_cancel_hooks(engine):
+    """Make an engine's torch modules raise SynthesisCancelled once its job is cancelled
+
+    Hooks go on every nn.Module held by the engine and on their direct
+    children, which are invoked once per decoding step. Threads without a
+    cancellation scope pay only an attribute lookup. Safe to call repeatedly.
+    """
+    if getattr(engine, "_cancel_hooks_installed", False):
+        return
+    try:
+        import torch
+    except Exception:
+        return
+
+    modules = [engine] + list(getattr(engine, "__dict__", {}).values())
+    for candidate in modules:
+        if not isinstance(candidate, torch.nn.Module):
+            continue
+        candidate.register_forward_pre_hook(_pre_hook)
+        for child in candidate.children():
+            child.register_forward_pre_hook(_pre_hook)
+    try:
+        engine._cancel_hooks_installed = True
+    except Exception:
+        pass
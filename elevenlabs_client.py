@@ -0,0 +1,227 @@
+"""Pooled, streaming HTTP client for the ElevenLabs API.
+
+All calls share one ``requests.Session`` per process, so connections (and
+their TLS handshakes) are reused across requests, reruns and sessions. Every
+call has explicit connect/read timeouts, and speech is fetched from the
+streaming endpoint and written to disk chunk by chunk instead of being
+buffered whole in memory.
+
+Set ``ELEVENLABS_API_BASE`` to point the client at another server, e.g. the
+local mock in ``benchmarks/mock_elevenlabs.py``.
+"""
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_API_BASE = "https://api.elevenlabs.io"
+DEFAULT_MODEL_ID = "eleven_monolingual_v1"
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 60.0
+DEFAULT_VOICES_TTL_SECONDS = 600
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def api_base():
+    return os.environ.get("ELEVENLABS_API_BASE", DEFAULT_API_BASE).rstrip("/")
+
+
+def request_timeout():
+    """Return the (connect, read) timeout tuple passed to every request"""
+    return (
+        float(os.environ.get("ELEVENLABS_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)),
+        float(os.environ.get("ELEVENLABS_READ_TIMEOUT", DEFAULT_READ_TIMEOUT)),
+    )
+
+
+def get_http_session():
+    """Return the process-wide keep-alive session, created on first use"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # Retry only idempotent calls (GET) and only on connection problems or
+            # rate limiting; a retried POST would be billed twice.
+            retry = Retry(
+                total=2,
+                connect=2,
+                read=0,
+                status=2,
+                backoff_factor=0.3,
+                status_forcelist=(429, 502, 503),
+                allowed_methods=frozenset({"GET"}),
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def build_voice_settings(speed_setting, voice_settings_override=None):
+    """Return explicit voice settings, or map the speed setting onto stability/similarity"""
+    if voice_settings_override is not None:
+        return voice_settings_override
+    # Basic mapping of speed to stability/similarity if no override provided
+    stability = max(0.1, min(1.0, 0.75 - (speed_setting - 1.0) * 0.2))
+    similarity_boost = max(0.1, min(1.0, 0.75 + (speed_setting - 1.0) * 0.1))
+    return {
+        "stability": stability,
+        "similarity_boost": similarity_boost,
+        "style": 0.0,
+        "use_speaker_boost": True,
+    }
+
+
+def fetch_voices(api_key):
+    """Return {voice name: voice_id} for the account, or None on any failure"""
+    try:
+        response = get_http_session().get(
+            f"{api_base()}/v1/voices",
+            headers={"xi-api-key": api_key},
+            timeout=request_timeout(),
+        )
+        if response.status_code != 200:
+            return None
+        return {voice["name"]: voice["voice_id"] for voice in response.json()["voices"]}
+    except (requests.RequestException, ValueError, KeyError):
+        return None
+
+
+def api_key_fingerprint(api_key):
+    """Return a one-way hash of an API key, used as a cache key instead of the key itself"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+class VoiceListCache:
+    """Per-API-key voice lists with a TTL and stale-while-revalidate refresh
+
+    A fresh entry is served directly. A stale entry is still served, while a
+    background thread fetches a new list for next time, so a rerun never
+    waits on the network once a key has been seen. Entries are keyed by
+    api_key_fingerprint(), so keys are never kept in memory by the cache.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_VOICES_TTL_SECONDS, fetch=None):
+        self.ttl_seconds = ttl_seconds
+        self.fetch = fetch or fetch_voices
+        self._entries = {}  # fingerprint -> (voices, fetched_at)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.background_refreshes = 0
+
+    def get(self, api_key, force_refresh=False):
+        """Return {voice name: voice_id} (or None if the API call failed)"""
+        fingerprint = api_key_fingerprint(api_key)
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is not None and not force_refresh:
+                self.hits += 1
+                if time.monotonic() - entry[1] > self.ttl_seconds and fingerprint not in self._refreshing:
+                    self._refreshing.add(fingerprint)
+                    threading.Thread(
+                        target=self._refresh, args=(api_key, fingerprint), name="voices-refresh", daemon=True
+                    ).start()
+                return entry[0]
+            self.misses += 1
+
+        voices = self.fetch(api_key)
+        if voices is not None:
+            with self._lock:
+                self._entries[fingerprint] = (voices, time.monotonic())
+        return voices
+
+    def _refresh(self, api_key, fingerprint):
+        try:
+            voices = self.fetch(api_key)
+            with self._lock:
+                self.background_refreshes += 1
+                # Keep serving the old list if the refresh failed
+                if voices is not None:
+                    self._entries[fingerprint] = (voices, time.monotonic())
+        finally:
+            with self._lock:
+                self._refreshing.discard(fingerprint)
+
+    def age_seconds(self, api_key):
+        """Return how old the cached list for api_key is, or None if not cached"""
+        with self._lock:
+            entry = self._entries.get(api_key_fingerprint(api_key))
+        return None if entry is None else time.monotonic() - entry[1]
+
+
+_voice_cache = None
+
+
+def get_voice_cache():
+    """Return the process-wide voice list cache (TTL from ``ELEVENLABS_VOICES_TTL``)"""
+    global _voice_cache
+    with _session_lock:
+        if _voice_cache is None:
+            _voice_cache = VoiceListCache(
+                ttl_seconds=float(os.environ.get("ELEVENLABS_VOICES_TTL", DEFAULT_VOICES_TTL_SECONDS))
+            )
+        return _voice_cache
+
+
+def stream_speech_to_file(text, api_key, voice_id, filepath, speed_setting=1.0, model_id=None,
+                          voice_settings_override=None, on_chunk=None, should_stop=None):
+    """Stream synthesized MP3 into filepath; return the number of bytes written, or None on failure
+
+    Data goes to a ``.part`` file that is renamed into place only once the
+    stream completed, so a failed or cancelled request leaves nothing behind.
+    on_chunk(bytes) sees each chunk as it arrives; should_stop() is polled
+    between chunks to abandon the download early.
+    """
+    filepath = Path(filepath)
+    part_path = filepath.with_name(filepath.name + ".part")
+    payload = {
+        "text": text,
+        "model_id": model_id or DEFAULT_MODEL_ID,
+        "voice_settings": build_voice_settings(speed_setting, voice_settings_override),
+    }
+    headers = {
+        "Accept": "audio/mpeg",
+        "Content-Type": "application/json",
+        "xi-api-key": api_key,
+    }
+    written = 0
+    try:
+        with get_http_session().post(
+            f"{api_base()}/v1/text-to-speech/{voice_id}/stream",
+            json=payload,
+            headers=headers,
+            timeout=request_timeout(),
+            stream=True,
+        ) as response:
+            if response.status_code != 200:
+                return None
+            with open(part_path, "wb") as f:
+                # chunk_size=None hands over each chunk as it arrives, so the
+                # first write and on_chunk are not held back to fill a buffer
+                for chunk in response.iter_content(chunk_size=None):
+                    if should_stop is not None and should_stop():
+                        raise InterruptedError("ElevenLabs stream cancelled")
+                    if not chunk:
+                        continue
+                    f.write(chunk)
+                    written += len(chunk)
+                    if on_chunk is not None:
+                        on_chunk(chunk)
+        if written == 0:
+            part_path.unlink(missing_ok=True)
+            return None
+        os.replace(part_path, filepath)
+        return written
+    except (requests.RequestException, OSError, InterruptedError):
+        part_path.unlink(missing_ok=True)
+        return None
@@ -0,0 +1,294 @@
+"""Process-wide cache of loaded local TTS engines (Kokoro, Chatterbox).
+
+Streamlit re-executes ``streamlit_app.py`` on every interaction, but imported
+modules stay in ``sys.modules`` for the life of the server process. Keeping the
+registry here means a loaded model is shared by every rerun and every session
+instead of being rebuilt on each Submit.
+"""
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from cancellation import install_cancel_hooks
+from inference_profiles import apply_inference_profile, chatterbox_profile, profile_device
+
+CHATTERBOX_PROVIDER = "Chatterbox (open-source)"
+KOKORO_PROVIDER = "Kokoro (local open model)"
+# Not a UI provider: Kokoro requests run on it when the ONNX backend is selected
+KOKORO_ONNX_ENGINE = "Kokoro (ONNX Runtime)"
+
+# RAM budget for all cached engines together, in megabytes
+DEFAULT_RAM_BUDGET_MB = 6144
+
+
+def pick_torch_device():
+    """Return the best available torch device name (cuda, mps or cpu)"""
+    import torch
+
+    if torch.cuda.is_available():
+        return "cuda"
+    if torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+def chatterbox_engine_args(profile=None):
+    """Return the (device, profile) Chatterbox is loaded with for a profile name (default: from the environment)"""
+    profile = chatterbox_profile(profile)
+    return profile_device(profile) or pick_torch_device(), profile
+
+
+def _load_chatterbox(device, lang_code):
+    from chatterbox.tts import ChatterboxTTS
+
+    return ChatterboxTTS.from_pretrained(device=device or pick_torch_device())
+
+
+def _load_kokoro(device, lang_code):
+    from kokoro import KPipeline
+
+    if device:
+        return KPipeline(lang_code=lang_code or "a", device=device)
+    return KPipeline(lang_code=lang_code or "a")
+
+
+def _load_kokoro_onnx(device, lang_code):
+    from onnx_kokoro import OnnxKokoroPipeline
+
+    return OnnxKokoroPipeline(lang_code=lang_code or "a")
+
+
+ENGINE_LOADERS = {
+    CHATTERBOX_PROVIDER: _load_chatterbox,
+    KOKORO_PROVIDER: _load_kokoro,
+    KOKORO_ONNX_ENGINE: _load_kokoro_onnx,
+}
+
+
+def estimate_engine_bytes(engine):
+    """Estimate the memory held by an engine from its torch parameters and buffers"""
+    # Engines outside torch (e.g. ONNX Runtime sessions) report their own size
+    if callable(getattr(engine, "estimated_bytes", None)):
+        try:
+            return engine.estimated_bytes()
+        except Exception:
+            return 0
+    try:
+        import torch
+    except Exception:
+        return 0
+
+    seen = set()
+    total = 0
+
+    def visit_module(module):
+        nonlocal total
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            if id(tensor) in seen:
+                continue
+            seen.add(id(tensor))
+            total += tensor.numel() * tensor.element_size()
+        # Dynamically quantized Linear layers keep their int8 weights in packed
+        # params rather than parameters
+        for submodule in module.modules():
+            if hasattr(submodule, "_packed_params") and callable(getattr(submodule, "weight", None)):
+                try:
+                    weight = submodule.weight()
+                    total += weight.numel() * weight.element_size()
+                except Exception:
+                    pass
+
+    # Engines are plain wrappers around one or more nn.Modules (e.g. ChatterboxTTS
+    # holds t3/s3gen/ve, KPipeline holds model), so look one level down.
+    candidates = [engine] + list(getattr(engine, "__dict__", {}).values())
+    for candidate in candidates:
+        if isinstance(candidate, torch.nn.Module):
+            visit_module(candidate)
+    return total
+
+
+class EngineRegistry:
+    """Thread-safe LRU cache of engines keyed by (provider, device, lang_code, profile)"""
+
+    def __init__(self, ram_budget_mb=DEFAULT_RAM_BUDGET_MB, loaders=None):
+        self.ram_budget_bytes = int(ram_budget_mb * 1024 * 1024)
+        self.loaders = dict(loaders or ENGINE_LOADERS)
+        self._engines = OrderedDict()  # key -> (engine, size_bytes)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds = {}
+
+    @staticmethod
+    def make_key(provider, device=None, lang_code=None, profile=None):
+        # Chatterbox is language agnostic, so never split its cache on lang_code
+        if provider == CHATTERBOX_PROVIDER:
+            lang_code = None
+        return (provider, device, lang_code, profile)
+
+    def get(self, provider, device=None, lang_code=None, profile=None):
+        """Return a cached engine, loading it (once, even under concurrency) on a miss
+
+        profile names an inference_profiles profile applied after loading;
+        engines with different profiles are cached separately.
+        """
+        key = self.make_key(provider, device, lang_code, profile)
+        with self._lock:
+            if key in self._engines:
+                self._engines.move_to_end(key)
+                self.hits += 1
+                return self._engines[key][0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock so other keys stay available meanwhile;
+        # the per-key lock stops two sessions loading the same model twice.
+        with key_lock:
+            with self._lock:
+                if key in self._engines:
+                    self._engines.move_to_end(key)
+                    self.hits += 1
+                    return self._engines[key][0]
+
+            loader = self.loaders.get(provider)
+            if loader is None:
+                raise KeyError(f"No engine loader registered for provider {provider!r}")
+
+            start = time.perf_counter()
+            engine = loader(device, lang_code)
+            if profile:
+                engine = apply_inference_profile(engine, profile)
+            elapsed = time.perf_counter() - start
+            # Lets job cancellation interrupt even a single long model call
+            install_cancel_hooks(engine)
+            size_bytes = estimate_engine_bytes(engine)
+
+            with self._lock:
+                self.misses += 1
+                self.load_seconds[key] = elapsed
+                self._engines[key] = (engine, size_bytes)
+                self._evict_over_budget(keep=key)
+            return engine
+
+    def _evict_over_budget(self, keep):
+        # Least recently used first; the engine just requested always survives,
+        # even if it alone exceeds the budget.
+        evicted = False
+        for key in list(self._engines):
+            if self._total_bytes() <= self.ram_budget_bytes:
+                break
+            if key == keep:
+                continue
+            del self._engines[key]
+            self.evictions += 1
+            evicted = True
+        if evicted:
+            _release_memory()
+
+    def _total_bytes(self):
+        return sum(size for _, size in self._engines.values())
+
+    def evict(self, provider, device=None, lang_code=None, profile=None):
+        """Drop one engine from the cache"""
+        key = self.make_key(provider, device, lang_code, profile)
+        with self._lock:
+            removed = self._engines.pop(key, None) is not None
+        if removed:
+            _release_memory()
+        return removed
+
+    def clear(self):
+        """Drop every cached engine"""
+        with self._lock:
+            self._engines.clear()
+        _release_memory()
+
+    def stats(self):
+        """Return a snapshot of cache contents and counters"""
+        with self._lock:
+            return {
+                "engines": [
+                    {"key": key, "size_mb": round(size / (1024 * 1024), 1)}
+                    for key, (_, size) in self._engines.items()
+                ],
+                "total_mb": round(self._total_bytes() / (1024 * 1024), 1),
+                "budget_mb": round(self.ram_budget_bytes / (1024 * 1024), 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def warm_up(self, specs, background=True):
+        """Load engines ahead of the first request; specs are (provider, device, lang_code, profile) tuples"""
+        def run():
+            for provider, device, lang_code, profile in specs:
+                try:
+                    if provider == CHATTERBOX_PROVIDER and device is None:
+                        # Same key synthesis will ask for
+                        device, profile = chatterbox_engine_args(profile)
+                    self.get(provider, device, lang_code, profile)
+                except Exception as e:
+                    print(f"[engine_registry] warm-up of {provider} failed: {e}")
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="engine-warmup", daemon=True)
+        thread.start()
+        return thread
+
+
+def _release_memory():
+    gc.collect()
+    try:
+        import torch
+
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except Exception:
+        pass
+
+
+def parse_preload_spec(spec):
+    """Parse e.g. "kokoro:a,kokoro-onnx:b,chatterbox:cpu-int8" into (provider, device, lang_code, profile) tuples
+
+    The part after the colon is the language for Kokoro and the inference
+    profile for Chatterbox.
+    """
+    aliases = {"kokoro": KOKORO_PROVIDER, "kokoro-onnx": KOKORO_ONNX_ENGINE, "chatterbox": CHATTERBOX_PROVIDER}
+    specs = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, option = item.partition(":")
+        provider = aliases.get(name.strip().lower())
+        if provider is None:
+            print(f"[engine_registry] ignoring unknown preload engine {name!r}")
+            continue
+        if provider == CHATTERBOX_PROVIDER:
+            specs.append((provider, None, None, option or None))
+        else:
+            specs.append((provider, None, option or "a", None))
+    return specs
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_engine_registry():
+    """Return the process-wide registry, created on first use
+
+    The budget comes from ``TTS_ENGINE_RAM_BUDGET_MB`` when set.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            budget_mb = float(os.environ.get("TTS_ENGINE_RAM_BUDGET_MB", DEFAULT_RAM_BUDGET_MB))
+            _registry = EngineRegistry(ram_budget_mb=budget_mb)
+        return _registry
+
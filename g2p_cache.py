@@ -0,0 +1,215 @@
+"""Memoized grapheme-to-phoneme (misaki G2P) results for Kokoro pipelines.
+
+KPipeline runs ``pipeline.g2p`` on every text chunk it is given, and our
+texts repeat the same intros, disclaimers and product names over and over.
+install_g2p_cache() wraps a pipeline's g2p so each result is computed once
+per (lang_code, text): an in-memory LRU in front of an optional SQLite store
+(``saved_audio/g2p_cache.sqlite3``) that survives restarts.
+
+Results are stored pickled and unpickled on every hit, so each caller gets
+fresh token objects (KPipeline writes timestamps onto them) and the audio is
+exactly what an uncached pipeline produces. The text is used as-is for the
+key: even whitespace can change misaki's tokens.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+from perf_metrics import stage
+
+DB_FILENAME = "g2p_cache.sqlite3"
+DEFAULT_MEMORY_ENTRIES = 4096
+DEFAULT_DISK_ENTRIES = 200000
+
+
+class G2PCache:
+    """LRU of pickled G2P results, optionally backed by SQLite"""
+
+    def __init__(self, db_path=None, max_memory_entries=DEFAULT_MEMORY_ENTRIES, max_disk_entries=DEFAULT_DISK_ENTRIES):
+        self.db_path = Path(db_path) if db_path else None
+        self.max_memory_entries = max(1, int(max_memory_entries))
+        self.max_disk_entries = int(max_disk_entries)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.miss_seconds = 0.0
+        self.hit_seconds = 0.0
+        self._disk_writes = 0
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS g2p ("
+                    " lang TEXT NOT NULL,"
+                    " text TEXT NOT NULL,"
+                    " value BLOB NOT NULL,"
+                    " last_used REAL NOT NULL,"
+                    " PRIMARY KEY (lang, text))"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS g2p_last_used ON g2p (last_used)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _remember(self, key, blob):
+        with self._lock:
+            self._memory[key] = blob
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def lookup(self, lang_code, text):
+        """Return the pickled result for (lang_code, text), or None"""
+        key = (lang_code, text)
+        with self._lock:
+            blob = self._memory.get(key)
+            if blob is not None:
+                self._memory.move_to_end(key)
+                return blob
+        if not self.db_path:
+            return None
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM g2p WHERE lang = ? AND text = ?", key).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE g2p SET last_used = ? WHERE lang = ? AND text = ?", (time.time(),) + key)
+        with self._lock:
+            self.disk_hits += 1
+        self._remember(key, row[0])
+        return row[0]
+
+    def store(self, lang_code, text, blob):
+        self._remember((lang_code, text), blob)
+        if not self.db_path:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO g2p (lang, text, value, last_used) VALUES (?, ?, ?, ?)",
+                (lang_code, text, blob, time.time()),
+            )
+            with self._lock:
+                self._disk_writes += 1
+                check_size = self._disk_writes % 1000 == 0
+            if check_size:
+                # Trim least recently used rows now and then rather than on every insert
+                count = conn.execute("SELECT COUNT(*) FROM g2p").fetchone()[0]
+                if count > self.max_disk_entries:
+                    conn.execute(
+                        "DELETE FROM g2p WHERE rowid IN (SELECT rowid FROM g2p ORDER BY last_used LIMIT ?)",
+                        (count - self.max_disk_entries,),
+                    )
+
+    def phonemize(self, g2p, lang_code, text):
+        """Return g2p(text), computing it only on a cache miss"""
+        start = time.perf_counter()
+        blob = self.lookup(lang_code, text)
+        if blob is not None:
+            result = pickle.loads(blob)
+            with self._lock:
+                self.hits += 1
+                self.hit_seconds += time.perf_counter() - start
+            return result
+
+        result = g2p(text)
+        elapsed = time.perf_counter() - start
+        try:
+            blob = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            blob = None
+        with self._lock:
+            self.misses += 1
+            self.miss_seconds += elapsed
+        if blob is None:
+            return result
+        self.store(lang_code, text, blob)
+        # Hand back an unpickled copy so the cached value is never shared with a caller
+        return pickle.loads(blob)
+
+    def stats(self):
+        """Return hit counters and an estimate of the G2P time saved"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            avg_miss = self.miss_seconds / self.misses if self.misses else 0.0
+            return {
+                "memory_entries": len(self._memory),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "avg_g2p_ms": round(avg_miss * 1000, 2),
+                "avg_hit_ms": round(self.hit_seconds / self.hits * 1000, 3) if self.hits else None,
+                # Each hit would have cost an average miss; subtract what the hits themselves took
+                "seconds_saved": round(max(0.0, self.hits * avg_miss - self.hit_seconds), 3),
+            }
+
+
+class CachedG2P:
+    """Drop-in replacement for a KPipeline's g2p callable"""
+
+    def __init__(self, g2p, lang_code, cache):
+        self.wrapped = g2p
+        self.lang_code = lang_code
+        self.cache = cache
+
+    def __call__(self, text):
+        with stage("g2p"):
+            return self.cache.phonemize(self.wrapped, self.lang_code, text)
+
+    def __getattr__(self, name):
+        # Anything else (lexicon, fallback, ...) is the wrapped G2P's
+        return getattr(self.wrapped, name)
+
+
+def _misaki_version():
+    try:
+        from importlib.metadata import version
+
+        return version("misaki")
+    except Exception:
+        return "unknown"
+
+
+def install_g2p_cache(pipeline, lang_code, cache):
+    """Route pipeline.g2p through cache; safe to call on every request"""
+    g2p = getattr(pipeline, "g2p", None)
+    if g2p is None or isinstance(g2p, CachedG2P):
+        return
+    # Entries from another misaki release may phonemize differently, so keep them apart
+    pipeline.g2p = CachedG2P(g2p, f"{lang_code}@{_misaki_version()}", cache)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_g2p_cache(audio_dir):
+    """Return the process-wide G2P cache for audio_dir
+
+    ``TTS_G2P_CACHE_ENTRIES`` sizes the in-memory LRU,
+    ``TTS_G2P_CACHE_MAX_DISK_ENTRIES`` the SQLite store, and
+    ``TTS_G2P_CACHE_DISK=0`` keeps the cache in memory only.
+    """
+    key = str(Path(audio_dir).resolve())
+    with _caches_lock:
+        if key not in _caches:
+            persist = os.environ.get("TTS_G2P_CACHE_DISK", "1").strip().lower() not in ("0", "false", "no", "off")
+            _caches[key] = G2PCache(
+                db_path=Path(audio_dir) / DB_FILENAME if persist else None,
+                max_memory_entries=int(os.environ.get("TTS_G2P_CACHE_ENTRIES", DEFAULT_MEMORY_ENTRIES)),
+                max_disk_entries=int(os.environ.get("TTS_G2P_CACHE_MAX_DISK_ENTRIES", DEFAULT_DISK_ENTRIES)),
+            )
+        return _caches[key]
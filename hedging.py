@@ -0,0 +1,172 @@
+"""Hedged synthesis: race a backup provider against a slow primary.
+
+ElevenLabs is usually fast but has a long latency tail; Kokoro on the CPU is
+slower on average but predictable. synthesize_hedged() sends a request to the
+primary provider and, if it has not produced any audio within the deadline
+(``TTS_HEDGE_DEADLINE_MS``), starts the same request on a secondary provider.
+If the primary fails outright the secondary starts at once.
+
+Both attempts run synthesize_to_file on their own thread, each under its own
+stop check. The first attempt to finish claims the request: the other one is
+cancelled, its partial file is removed, and only the winner writes a history
+entry. That entry's ``provider`` is the provider that served the request and
+its ``hedge`` field records the race.
+"""
+import os
+import threading
+import time
+
+from cancellation import SynthesisCancelled, cancellation_scope, current_stop_check
+from synthesis import SynthesisError, synthesize_to_file
+
+DEFAULT_HEDGE_DEADLINE_MS = 1500
+# How often the waiting caller checks whether its own job was cancelled
+CANCEL_POLL_SECONDS = 0.05
+
+_stats = {"requests": 0, "hedged": 0, "failovers": 0, "served_by_secondary": 0, "failures": 0}
+_stats_lock = threading.Lock()
+
+
+def hedge_deadline():
+    """Return the hedge deadline in seconds from ``TTS_HEDGE_DEADLINE_MS``"""
+    return max(0.0, float(os.environ.get("TTS_HEDGE_DEADLINE_MS", DEFAULT_HEDGE_DEADLINE_MS))) / 1000
+
+
+def _count(**increments):
+    with _stats_lock:
+        for name, value in increments.items():
+            _stats[name] += value
+
+
+def hedge_stats():
+    """Return this process's hedging counters"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+class _Attempt:
+    def __init__(self, provider, role, started):
+        self.provider = provider
+        self.role = role
+        self.started = started  # seconds after the request started
+        self.stop = threading.Event()
+        self.first_audio = None
+        self.result = None
+        self.error = None
+        self.done = False
+
+
+def synthesize_hedged(text, speed_setting, primary, secondary, deadline=None, primary_options=None,
+                      secondary_options=None, on_segment=None, progress=None, synthesize=synthesize_to_file):
+    """Synthesize with primary, hedged by secondary after deadline seconds; return (filepath, metadata)
+
+    primary_options and secondary_options are the keyword arguments each
+    provider's synthesize_to_file call gets. on_segment receives the segments
+    of whichever attempt produced audio first; progress follows the primary.
+    Raises SynthesisError if both attempts fail and SynthesisCancelled if the
+    calling job is cancelled.
+    """
+    deadline = hedge_deadline() if deadline is None else max(0.0, float(deadline))
+    outer_should_stop = current_stop_check()
+    request_start = time.perf_counter()
+    changed = threading.Condition()
+    attempts = []
+    state = {"winner": None, "streaming": None}
+
+    def start(provider, role, options):
+        attempt = _Attempt(provider, role, round(time.perf_counter() - request_start, 3))
+
+        def should_stop():
+            return attempt.stop.is_set() or (outer_should_stop is not None and outer_should_stop())
+
+        def first_audio():
+            with changed:
+                attempt.first_audio = round(time.perf_counter() - request_start, 3)
+                changed.notify_all()
+
+        def segment(audio, sample_rate):
+            with changed:
+                if state["streaming"] is None:
+                    state["streaming"] = attempt
+                forward = state["streaming"] is attempt
+            if forward and on_segment is not None:
+                on_segment(audio, sample_rate)
+
+        def claim():
+            with changed:
+                if state["winner"] is not None:
+                    raise SynthesisCancelled()
+                state["winner"] = attempt
+                for other in attempts:
+                    if other is not attempt:
+                        other.stop.set()
+                return {"hedge": {
+                    "primary": primary,
+                    "secondary": secondary,
+                    "deadline_seconds": deadline,
+                    "hedged": len(attempts) > 1,
+                    "served_by": attempt.provider,
+                    "served_by_role": attempt.role,
+                    "secondary_started_seconds": attempts[1].started if len(attempts) > 1 else None,
+                    "primary_first_audio_seconds": attempts[0].first_audio,
+                }}
+
+        def run():
+            try:
+                with cancellation_scope(should_stop):
+                    attempt.result = synthesize(
+                        text, speed_setting, provider, on_segment=segment, on_first_audio=first_audio, claim=claim,
+                        progress=progress if role == "primary" else None, **(options or {}),
+                    )
+            except BaseException as e:
+                attempt.error = e
+            finally:
+                with changed:
+                    attempt.done = True
+                    changed.notify_all()
+
+        attempts.append(attempt)
+        threading.Thread(target=run, name=f"hedge-{role}", daemon=True).start()
+        return attempt
+
+    _count(requests=1)
+    with changed:
+        first = start(primary, "primary", primary_options)
+        while True:
+            winner = state["winner"]
+            if winner is not None and winner.done:
+                break
+            if winner is None and all(attempt.done for attempt in attempts) and len(attempts) > 1:
+                break
+            if len(attempts) == 1 and secondary:
+                failed = first.done and first.error is not None and not isinstance(first.error, SynthesisCancelled)
+                late = first.first_audio is None and time.perf_counter() - request_start >= deadline
+                if failed or (late and not first.done):
+                    _count(hedged=1, failovers=int(failed))
+                    start(secondary, "secondary", secondary_options)
+                    continue
+            if len(attempts) == 1 and first.done and winner is None:
+                break
+            if outer_should_stop is not None and outer_should_stop():
+                for attempt in attempts:
+                    attempt.stop.set()
+                raise SynthesisCancelled()
+            remaining = deadline - (time.perf_counter() - request_start)
+            changed.wait(min(CANCEL_POLL_SECONDS, remaining) if remaining > 0 else CANCEL_POLL_SECONDS)
+
+    winner = state["winner"]
+    if winner is not None:
+        if winner.error is not None:
+            _count(failures=1)
+            raise winner.error
+        if winner.role == "secondary":
+            _count(served_by_secondary=1)
+        return winner.result
+
+    _count(failures=1)
+    errors = [attempt.error for attempt in attempts]
+    if any(isinstance(error, SynthesisCancelled) for error in errors) and all(
+        error is None or isinstance(error, SynthesisCancelled) for error in errors
+    ):
+        raise SynthesisCancelled()
+    raise SynthesisError("; ".join(f"{attempt.provider}: {attempt.error}" for attempt in attempts))
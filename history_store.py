@@ -0,0 +1,424 @@
+"""SQLite-backed audio history replacing saved_audio/metadata.json.
+
+The old JSON file was loaded and rewritten in full for every insert and
+delete, which is O(n) per write and loses entries when two sessions write at
+the same time. Entries now live in a WAL-mode SQLite database: inserts and
+deletes touch one row, concurrent writers are serialized by SQLite, and every
+entry gets a random collision-free ID. The full metadata dict is kept as JSON
+next to a few indexed columns used for sorting and filtering.
+
+Titles and texts are also indexed in an FTS5 table (``entries_fts``) that
+triggers keep in step with every insert, delete and update, so search() finds
+entries by words in milliseconds instead of scanning every row.
+"""
+import datetime
+import json
+import re
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+DB_FILENAME = "history.sqlite3"
+LEGACY_METADATA_FILENAME = "metadata.json"
+
+# Columns the history page may sort by (whitelisted because ORDER BY can't be a parameter)
+SORT_COLUMNS = {
+    "created": "created",
+    "title": "title COLLATE NOCASE",
+    "provider": "provider",
+    "speed": "speed",
+}
+
+# Indexed columns search() can filter on by exact value
+FILTER_COLUMNS = ("provider", "voice", "lang", "speed")
+
+SEARCH_TABLE = "entries_fts"
+# Above this share of entries, a newest-first page of matches is found by
+# walking the date index rather than by sorting every match
+COMMON_MATCH_FRACTION = 0.05
+_SEARCH_TERM = re.compile(r"\w+", re.UNICODE)
+
+# External-content FTS5 index over entries.title/text, maintained by triggers
+_SEARCH_SCHEMA = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    " title, text, content='entries', content_rowid='rowid',"
+    " tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"CREATE TRIGGER IF NOT EXISTS entries_fts_insert AFTER INSERT ON entries BEGIN"
+    f" INSERT INTO {SEARCH_TABLE} (rowid, title, text) VALUES (new.rowid, new.title, new.text);"
+    " END",
+    f"CREATE TRIGGER IF NOT EXISTS entries_fts_delete AFTER DELETE ON entries BEGIN"
+    f" INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, title, text) VALUES ('delete', old.rowid, old.title, old.text);"
+    " END",
+    f"CREATE TRIGGER IF NOT EXISTS entries_fts_update AFTER UPDATE OF title, text ON entries BEGIN"
+    f" INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, title, text) VALUES ('delete', old.rowid, old.title, old.text);"
+    f" INSERT INTO {SEARCH_TABLE} (rowid, title, text) VALUES (new.rowid, new.title, new.text);"
+    " END",
+)
+
+
+def new_entry_id():
+    """Return a new collision-free history entry ID"""
+    return uuid.uuid4().hex
+
+
+def _voice_of(metadata):
+    return metadata.get("voice_id") or metadata.get("kokoro_voice")
+
+
+def _match_clause(filtered):
+    """WHERE clause restricting entries to the FTS5 matches of one ``?`` query
+
+    As a subquery the index is always searched first (joined, SQLite may walk
+    a filter's index and run MATCH once per row). With other filters the
+    matches are only used as a set (``+`` disables the rowid lookup), so the
+    filter's covering index drives the query and rows are never read.
+    """
+    rowid = "+entries.rowid" if filtered else "entries.rowid"
+    return f"{rowid} IN (SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH ?)"
+
+
+def search_terms(query):
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix
+
+    Words are quoted, so FTS5 operators and punctuation typed by the user are
+    treated as plain text. Returns None if query has no words.
+    """
+    terms = _SEARCH_TERM.findall(query or "")
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    # Search-as-you-type: the word being typed matches any word it starts
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+class HistoryStore:
+    """Transactional store of generated audio entries"""
+
+    def __init__(self, audio_dir):
+        self.audio_dir = Path(audio_dir)
+        self.audio_dir.mkdir(exist_ok=True)
+        self.db_path = self.audio_dir / DB_FILENAME
+        with self._connect() as conn:
+            # WAL lets readers (history page) run while another session writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " id TEXT PRIMARY KEY,"
+                " filename TEXT NOT NULL,"
+                " provider TEXT,"
+                " voice TEXT,"
+                " lang TEXT,"
+                " speed REAL,"
+                " created TEXT NOT NULL,"
+                " title TEXT,"
+                " text TEXT NOT NULL,"
+                " data TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_created ON entries (created)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_filename ON entries (filename)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_title ON entries (title COLLATE NOCASE)")
+            # One index per search filter, each also covering the other filters, so
+            # filtered counts and pages never read the wide rows
+            for column in FILTER_COLUMNS:
+                others = ", ".join(other for other in FILTER_COLUMNS if other != column)
+                conn.execute(f"CREATE INDEX IF NOT EXISTS entries_by_{column} ON entries ({column}, created, {others})")
+            # Superseded by entries_by_provider
+            conn.execute("DROP INDEX IF EXISTS entries_provider")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.search_enabled = self._create_search_index()
+        self.migrate_legacy_json()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with conn:  # commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def _create_search_index(self):
+        """Create the FTS5 index and its triggers; index existing entries the first time"""
+        try:
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                existed = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = ?", (SEARCH_TABLE,)
+                ).fetchone()
+                for statement in _SEARCH_SCHEMA:
+                    conn.execute(statement)
+                if not existed:
+                    conn.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('rebuild')")
+            self._refresh_statistics()
+            return True
+        except sqlite3.OperationalError as e:
+            # SQLite built without FTS5: search() falls back to LIKE scans
+            print(f"[history_store] full-text search unavailable, using slow text search: {e}")
+            return False
+
+    def _refresh_statistics(self):
+        """ANALYZE entries if its statistics are missing or the table has grown or shrunk a lot since
+
+        The statistics let SQLite pick the most selective filter's index.
+        """
+        with self._connect() as conn:
+            rows = conn.execute("SELECT MAX(rowid) FROM entries").fetchone()[0] or 0
+            try:
+                stat = conn.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = 'entries' LIMIT 1").fetchone()
+            except sqlite3.OperationalError:  # no ANALYZE has run yet
+                stat = None
+            analyzed = int(stat[0].split()[0]) if stat else 0
+            if not analyzed or not 0.8 <= rows / analyzed <= 1.25:
+                conn.execute("ANALYZE entries")
+
+    def rebuild_search_index(self):
+        """Re-index every entry (needed after a VACUUM, which may renumber rowids)"""
+        if self.search_enabled:
+            with self._connect() as conn:
+                conn.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('rebuild')")
+
+    @staticmethod
+    def _row_values(metadata):
+        return (
+            metadata["id"],
+            metadata["filename"],
+            metadata.get("provider"),
+            _voice_of(metadata),
+            metadata.get("kokoro_lang"),
+            metadata.get("speed"),
+            metadata["created"],
+            metadata.get("title"),
+            metadata.get("text", ""),
+            json.dumps(metadata, ensure_ascii=False),
+        )
+
+    def add(self, metadata):
+        """Insert one entry, assigning an ID if it has none; returns the ID"""
+        metadata.setdefault("id", new_entry_id())
+        with self._connect() as conn:
+            conn.execute("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._row_values(metadata))
+        return metadata["id"]
+
+    def add_many(self, entries):
+        """Insert several entries in one transaction; returns their IDs"""
+        for metadata in entries:
+            metadata.setdefault("id", new_entry_id())
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [self._row_values(m) for m in entries]
+            )
+        return [metadata["id"] for metadata in entries]
+
+    def delete(self, entry_id):
+        """Delete one entry; returns True if it existed"""
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+        return cursor.rowcount > 0
+
+    def get(self, entry_id):
+        """Return one entry's metadata dict, or None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM entries WHERE id = ?", (entry_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def count(self):
+        """Return the number of entries"""
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def count_filename_refs(self, filename):
+        """Return how many entries point at filename (cache hits share files)"""
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM entries WHERE filename = ?", (filename,)).fetchone()[0]
+
+    def audio_seconds_of(self, filename):
+        """Return the audio_seconds recorded for filename by its newest entry, or None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT json_extract(data, '$.audio_seconds') FROM entries WHERE filename = ? "
+                "AND json_extract(data, '$.audio_seconds') IS NOT NULL ORDER BY created DESC LIMIT 1",
+                (filename,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def rename_file(self, old_filename, new_filename, updates=None):
+        """Point every entry using old_filename at new_filename, merging updates into its metadata"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, data FROM entries WHERE filename = ?", (old_filename,)).fetchall()
+            for entry_id, data in rows:
+                metadata = json.loads(data)
+                metadata["filename"] = new_filename
+                metadata.update(updates or {})
+                conn.execute(
+                    "UPDATE entries SET filename = ?, data = ? WHERE id = ?",
+                    (new_filename, json.dumps(metadata, ensure_ascii=False), entry_id),
+                )
+        return len(rows)
+
+    def list_entries(self, limit=None, offset=0, sort_by="created", descending=True):
+        """Return one page of entries' metadata dicts, sorted in SQL"""
+        if sort_by not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort history by {sort_by!r}")
+        order = "DESC" if descending else "ASC"
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT data FROM entries ORDER BY {SORT_COLUMNS[sort_by]} {order}, created DESC, id"
+                " LIMIT ? OFFSET ?",
+                (-1 if limit is None else limit, offset),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def _filters(self, query=None, provider=None, voice=None, lang=None, speed=None, created_from=None,
+                 created_to=None):
+        """Return (WHERE clauses, parameters, FTS5 query or None) for a search
+
+        The FTS5 query is left to the caller; without FTS5, words become LIKE
+        clauses instead.
+        """
+        match = search_terms(query)
+        clauses, params = [], []
+        if match and not self.search_enabled:
+            for term in _SEARCH_TERM.findall(query):
+                clauses.append("(entries.title LIKE ? OR entries.text LIKE ?)")
+                params += [f"%{term}%"] * 2
+            match = None
+        for column, value in zip(FILTER_COLUMNS, (provider, voice, lang, speed)):
+            if value is not None:
+                clauses.append(f"entries.{column} = ?")
+                params.append(value)
+        if created_from is not None:
+            clauses.append("entries.created >= ?")
+            params.append(str(created_from))
+        if created_to is not None:
+            # Dates cover the whole day; created is an ISO timestamp
+            if not isinstance(created_to, datetime.datetime):
+                created_to = created_to + datetime.timedelta(days=1)
+            clauses.append("entries.created < ?")
+            params.append(str(created_to))
+        return clauses, params, match
+
+    def search(self, query=None, limit=None, offset=0, sort_by="created", descending=True, **filters):
+        """Return one page of the entries matching query and filters, sorted in SQL
+
+        query matches words of the title or text (see search_terms). filters
+        are provider, voice, lang and speed (exact values) and created_from /
+        created_to (an inclusive range of dates). sort_by may also be
+        "relevance": best match first, title matches weighted above text
+        matches, or newest first without a query.
+        """
+        if sort_by not in SORT_COLUMNS and sort_by != "relevance":
+            raise ValueError(f"Cannot sort history by {sort_by!r}")
+        clauses, params, match = self._filters(query, **filters)
+        source = "entries"
+        if sort_by == "relevance" and match:
+            # CROSS JOIN keeps the index as the outer loop, which bm25() needs
+            source = f"{SEARCH_TABLE} CROSS JOIN entries ON entries.rowid = {SEARCH_TABLE}.rowid"
+            clauses.insert(0, f"{SEARCH_TABLE} MATCH ?")
+            params.insert(0, match)
+            # bm25 scores are negative; smaller is better
+            order_by = f"bm25({SEARCH_TABLE}, 5.0, 1.0), entries.created DESC"
+        else:
+            if match:
+                clauses.insert(0, _match_clause(filtered=bool(clauses)))
+                params.insert(0, match)
+            if sort_by == "relevance":
+                order_by = "entries.created DESC"
+            else:
+                order = "DESC" if descending else "ASC"
+                order_by = f"entries.{SORT_COLUMNS[sort_by]} {order}, entries.created DESC, entries.id"
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as conn:
+            column_filters = any(filters.get(name) is not None for name in ("provider", "voice", "lang", "speed"))
+            if match and sort_by == "created" and not column_filters and self._is_common(conn, match):
+                # Walking the date index until a page of matches is found beats
+                # sorting tens of thousands of matches for one page
+                source = "entries INDEXED BY entries_created"
+            rows = conn.execute(
+                f"SELECT entries.data FROM {source}{where} ORDER BY {order_by} LIMIT ? OFFSET ?",
+                params + [-1 if limit is None else limit, offset],
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    @staticmethod
+    def _is_common(conn, match):
+        """Whether match hits more than COMMON_MATCH_FRACTION of all entries"""
+        hits = conn.execute(f"SELECT COUNT(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH ?", (match,)).fetchone()[0]
+        total = conn.execute("SELECT MAX(rowid) FROM entries").fetchone()[0] or 0
+        return hits > total * COMMON_MATCH_FRACTION
+
+    def count_matches(self, query=None, **filters):
+        """Return how many entries search() would find for query and filters"""
+        clauses, params, match = self._filters(query, **filters)
+        with self._connect() as conn:
+            if match and not clauses:
+                # The index has exactly one row per entry
+                return conn.execute(
+                    f"SELECT COUNT(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH ?", (match,)
+                ).fetchone()[0]
+            if match:
+                clauses.insert(0, _match_clause(filtered=True))
+                params.insert(0, match)
+            where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+            return conn.execute(f"SELECT COUNT(*) FROM entries{where}", params).fetchone()[0]
+
+    def filter_values(self):
+        """Return the distinct providers, voices, languages and speeds present, for filter choices"""
+        values = {}
+        with self._connect() as conn:
+            for column in ("provider", "voice", "lang", "speed"):
+                rows = conn.execute(
+                    f"SELECT DISTINCT {column} FROM entries WHERE {column} IS NOT NULL ORDER BY {column}"
+                ).fetchall()
+                values[column] = [row[0] for row in rows]
+        return values
+
+    def migrate_legacy_json(self):
+        """Import saved_audio/metadata.json once, then rename it so it is not imported again"""
+        legacy_file = self.audio_dir / LEGACY_METADATA_FILENAME
+        if not legacy_file.exists():
+            return 0
+        try:
+            with open(legacy_file, "r") as f:
+                legacy_entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[history_store] could not read {legacy_file}: {e}")
+            return 0
+
+        rows = []
+        for metadata in legacy_entries:
+            if "filename" not in metadata or "created" not in metadata:
+                continue
+            # The old app never stored IDs, so every entry gets a new one
+            metadata["id"] = new_entry_id()
+            rows.append(self._row_values(metadata))
+
+        with self._connect() as conn:
+            # Take the write lock before checking the marker so two server
+            # processes starting together cannot both import the file
+            conn.execute("BEGIN IMMEDIATE")
+            done = conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_json_migrated'").fetchone()
+            if not done:
+                conn.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_json_migrated', ?)", (str(len(rows)),))
+        try:
+            legacy_file.rename(legacy_file.with_name(LEGACY_METADATA_FILENAME + ".migrated"))
+        except OSError:
+            pass
+        return 0 if done else len(rows)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_history_store(audio_dir):
+    """Return the process-wide store for audio_dir (migrating legacy JSON on first use)"""
+    key = str(Path(audio_dir).resolve())
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = HistoryStore(audio_dir)
+        return _stores[key]
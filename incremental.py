@@ -0,0 +1,97 @@
+"""Incremental re-synthesis: only the sentences that changed are rendered again.
+
+In incremental mode a text is rendered one sentence at a time, each sentence
+on its own, so the audio of a sentence depends only on the sentence and the
+voice settings. Every sentence's audio goes into the segment cache; when an
+edited version comes back, the sentences already in the cache are spliced in
+as they are and only the rest are synthesized (on the long-form worker
+pool). All sentences are joined with the same pause whether they were reused
+or new, so a spliced file has the same boundaries as one rendered from
+scratch.
+
+diff_sentences() compares the new text with the previous version the editor
+submitted; the history entry reports it next to the reused / regenerated
+counts. Reuse itself is decided by the cache, so a sentence that moved, or
+that an older version already contained, is not rendered again either.
+"""
+import difflib
+import time
+
+from long_form import DEFAULT_SILENCE_MS, split_sentences, synthesize_chunks, write_chunks_to_wav
+from perf_metrics import stage
+from segment_cache import segment_cache_key
+
+
+def diff_sentences(previous_text, text):
+    """Compare the sentences of two versions; return counts of unchanged / changed / inserted / deleted"""
+    old, new = split_sentences(previous_text), split_sentences(text)
+    counts = {"previous_segments": len(old), "unchanged": 0, "changed": 0, "inserted": 0, "deleted": 0}
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(a=old, b=new, autojunk=False).get_opcodes():
+        if tag == "equal":
+            counts["unchanged"] += i2 - i1
+        elif tag == "replace":
+            changed = min(i2 - i1, j2 - j1)
+            counts["changed"] += changed
+            counts["inserted"] += (j2 - j1) - changed
+            counts["deleted"] += (i2 - i1) - changed
+        elif tag == "insert":
+            counts["inserted"] += j2 - j1
+        else:
+            counts["deleted"] += i2 - i1
+    return counts
+
+
+def synthesize_incremental(text, synthesize_sentence, filepath, sample_rate, cache, provider, params,
+                           previous_text=None, workers=None, silence_ms=DEFAULT_SILENCE_MS, on_chunk=None,
+                           progress=None, processor=None):
+    """Write text to a WAV, reusing cached sentences; return run statistics
+
+    synthesize_sentence(sentence) returns float audio at sample_rate (e.g.
+    make_kokoro_chunk_synth). provider and params key the segment cache.
+    """
+    sentences = split_sentences(text)
+    if not sentences:
+        raise ValueError("No speakable text to synthesize")
+    keys = [segment_cache_key(sentence, provider, params) for sentence in sentences]
+    with stage("segment_cache"):
+        cached = cache.contains(keys)
+    # A sentence that occurs twice in the new text is only rendered once
+    missing = list(dict.fromkeys(sentence for sentence, key in zip(sentences, keys) if key not in cached))
+    counts = {"reused": 0, "regenerated": 0}
+
+    def sentence_audio():
+        fresh = synthesize_chunks(missing, synthesize_sentence, workers=workers)
+        pending = set(missing)
+        for sentence, key in zip(sentences, keys):
+            if sentence in pending:
+                pending.discard(sentence)
+                audio = next(fresh)
+            else:
+                with stage("segment_cache"):
+                    hit = cache.lookup(key)
+                if hit is not None and hit[1] == sample_rate:
+                    counts["reused"] += 1
+                    yield hit[0]
+                    continue
+                # Evicted since the plan was made (or the cache is off): render it here
+                audio = synthesize_sentence(sentence)
+            with stage("segment_cache"):
+                cache.store(key, audio, sample_rate)
+            counts["regenerated"] += 1
+            yield audio
+
+    start = time.perf_counter()
+    audio_seconds = write_chunks_to_wav(
+        filepath, sentence_audio(), sample_rate, silence_ms=silence_ms, on_chunk=on_chunk, progress=progress,
+        total_chunks=len(sentences), processor=processor,
+    )
+    stats = {
+        "segments": len(sentences),
+        "reused": counts["reused"],
+        "regenerated": counts["regenerated"],
+        "synthesis_seconds": round(time.perf_counter() - start, 3),
+        "audio_seconds": round(audio_seconds, 3),
+    }
+    if previous_text:
+        stats["previous"] = diff_sentences(previous_text, text)
+    return stats
@@ -0,0 +1,139 @@
+"""Inference profiles for the local Chatterbox model.
+
+Without a GPU, Chatterbox falls back to full-precision CPU inference, which
+is several times slower than real time. A profile is applied once, when the
+engine registry loads the model:
+
+  * ``standard`` - full precision on the best available device (the default)
+  * ``cpu``      - CPU with explicit thread counts, generation under
+                   torch.inference_mode()
+  * ``cpu-int8`` - as ``cpu``, plus dynamic int8 quantization of the Linear
+                   layers (weights stored as int8, activations quantized on
+                   the fly), which covers the bulk of T3's autoregressive work
+
+Quantization changes the generated audio slightly, so it is part of the
+synthesis cache key; benchmarks/bench_chatterbox_profiles.py measures the
+speed-up and the difference from the fp32 output.
+"""
+import functools
+import os
+import platform
+import threading
+
+DEFAULT_PROFILE = "standard"
+
+PROFILES = {
+    "standard": {"device": None, "cpu_tuning": False, "quantize": False,
+                 "label": "Standard (full precision, best device)"},
+    "cpu": {"device": "cpu", "cpu_tuning": True, "quantize": False,
+            "label": "CPU (fp32, tuned threads)"},
+    "cpu-int8": {"device": "cpu", "cpu_tuning": True, "quantize": True,
+                 "label": "CPU int8 (dynamic quantization, fastest)"},
+}
+
+# T3 (the autoregressive token model) dominates CPU time; S3Gen's flow
+# decoder can be added with TTS_CPU_INT8_MODULES=t3,s3gen
+DEFAULT_INT8_MODULES = "t3"
+
+_threads_lock = threading.Lock()
+_interop_configured = False
+
+
+def chatterbox_profile(name=None):
+    """Return a valid profile name: name, else ``TTS_CHATTERBOX_PROFILE``, else standard"""
+    name = (name or os.environ.get("TTS_CHATTERBOX_PROFILE", DEFAULT_PROFILE)).strip().lower() or DEFAULT_PROFILE
+    if name not in PROFILES:
+        print(f"[inference_profiles] unknown Chatterbox profile {name!r}; using {DEFAULT_PROFILE}")
+        return DEFAULT_PROFILE
+    return name
+
+
+def profile_device(name):
+    """Return the device a profile pins the model to, or None for the best available"""
+    return PROFILES[chatterbox_profile(name)]["device"]
+
+
+def profile_is_quantized(name):
+    return PROFILES[chatterbox_profile(name)]["quantize"]
+
+
+def configure_cpu_threads():
+    """Set torch's intra-op (and, once, inter-op) thread counts from the environment
+
+    ``TTS_CPU_THREADS`` defaults to the number of CPUs; ``TTS_CPU_INTEROP_THREADS``
+    is only applied when set, since torch accepts it once per process.
+    """
+    global _interop_configured
+    import torch
+
+    threads = int(os.environ.get("TTS_CPU_THREADS") or os.cpu_count() or 1)
+    interop = os.environ.get("TTS_CPU_INTEROP_THREADS")
+    with _threads_lock:
+        torch.set_num_threads(max(1, threads))
+        if interop and not _interop_configured:
+            _interop_configured = True
+            try:
+                torch.set_num_interop_threads(max(1, int(interop)))
+            except RuntimeError as e:
+                # Raised once any inter-op parallel work has already run
+                print(f"[inference_profiles] could not set inter-op threads: {e}")
+    return threads
+
+
+def _select_quantized_engine():
+    import torch
+
+    supported = torch.backends.quantized.supported_engines
+    # fbgemm/x86 kernels are x86-only; Apple Silicon and other ARM hosts need qnnpack
+    if platform.machine().lower() in ("arm64", "aarch64") and "qnnpack" in supported:
+        torch.backends.quantized.engine = "qnnpack"
+
+
+def quantize_linear_layers(module):
+    """Replace module's nn.Linear layers in place with dynamically quantized int8 ones"""
+    import torch
+
+    _select_quantized_engine()
+    quantize_dynamic = getattr(torch.ao.quantization, "quantize_dynamic", None) or torch.quantization.quantize_dynamic
+    return quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def _in_inference_mode(method):
+    import torch
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        # inference_mode is thread-local, so it is entered on every call
+        with torch.inference_mode():
+            return method(*args, **kwargs)
+
+    return wrapper
+
+
+def apply_inference_profile(model, name):
+    """Apply a Chatterbox profile to a freshly loaded model and return it"""
+    name = chatterbox_profile(name)
+    spec = PROFILES[name]
+    if spec["cpu_tuning"]:
+        configure_cpu_threads()
+        for method_name in ("generate", "prepare_conditionals"):
+            method = getattr(model, method_name, None)
+            if method is not None:
+                setattr(model, method_name, _in_inference_mode(method))
+    if spec["quantize"]:
+        if str(getattr(model, "device", "cpu")) != "cpu":
+            # Dynamic quantization only has CPU kernels
+            print(f"[inference_profiles] {name} needs a CPU model; leaving {model.device} model in full precision")
+        else:
+            module_names = os.environ.get("TTS_CPU_INT8_MODULES", DEFAULT_INT8_MODULES)
+            for module_name in (part.strip() for part in module_names.split(",")):
+                module = getattr(model, module_name, None) if module_name else None
+                if module is None:
+                    continue
+                module.eval()
+                quantize_linear_layers(module)
+    try:
+        model.inference_profile = name
+    except Exception:
+        pass
+    return model
@@ -0,0 +1,190 @@
+"""Background synthesis jobs: a bounded queue drained by worker threads.
+
+Submitting from the UI returns immediately with a Job; the Streamlit script
+keeps rendering while workers run synthesis. Jobs report progress
+(segments done / total) and support cooperative cancellation: cancel() sets a
+flag that synthesis checks between segments, chunks and streamed bytes, and
+inside model forward passes via the hooks from cancellation.py. Workers are
+threads rather than processes so they share the engines already loaded in
+engine_registry.
+"""
+import itertools
+import os
+import queue
+import threading
+import time
+import traceback
+
+from cancellation import SynthesisCancelled, cancellation_scope
+
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 32
+# Finished jobs are kept this long so sessions can pick up their results
+FINISHED_JOB_TTL_SECONDS = 3600
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+
+class JobQueueFull(Exception):
+    """Raised by submit() when the maximum number of jobs is already waiting"""
+
+
+class Job:
+    """One unit of background work and its observable state"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, fn, owner=None, description=""):
+        self.id = next(self._ids)
+        self.fn = fn
+        self.owner = owner
+        self.description = description
+        self.status = QUEUED
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel_event = threading.Event()
+
+    def report_progress(self, done, total):
+        self.done = done
+        self.total = total
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATES
+
+    @property
+    def fraction(self):
+        return min(1.0, self.done / self.total) if self.total else 0.0
+
+
+class JobManager:
+    """Bounded job queue with a fixed pool of worker threads
+
+    Job status changes happen under one lock, so cancel() and the workers
+    never both move a job out of QUEUED. Only jobs still waiting count
+    towards queue_size; a cancelled job frees its place at once even though
+    a worker removes it from the queue later.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE):
+        self.queue_size = max(1, queue_size)
+        self._queue = queue.Queue()
+        self._waiting = 0
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        for i in range(max(1, workers)):
+            thread = threading.Thread(target=self._worker, name=f"tts-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn, owner=None, description=""):
+        """Queue fn(job) and return its Job; raises JobQueueFull when the queue is full"""
+        job = Job(fn, owner=owner, description=description)
+        with self._lock:
+            if self._waiting >= self.queue_size:
+                raise JobQueueFull(f"The synthesis queue is full ({self.queue_size} jobs); try again shortly")
+            self._waiting += 1
+            self._jobs[job.id] = job
+            self._prune()
+        self._queue.put(job)
+        return job
+
+    def cancel(self, job_id):
+        """Request cancellation; a queued job is cancelled immediately, a running one at its next check"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job.active:
+                return False
+            job.cancel()
+            if job.status == QUEUED:
+                job.status = CANCELLED
+                job.finished = time.time()
+                self._waiting -= 1
+        return True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs_for(self, owner):
+        """Return owner's jobs, newest first"""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.owner == owner]
+        return sorted(jobs, key=lambda job: job.id, reverse=True)
+
+    def queue_depth(self):
+        """Return the number of jobs waiting for a worker"""
+        with self._lock:
+            return self._waiting
+
+    def _prune(self):
+        cutoff = time.time() - FINISHED_JOB_TTL_SECONDS
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                with self._lock:
+                    if job.status != QUEUED:
+                        # Cancelled while still queued; cancel() already finished it
+                        continue
+                    self._waiting -= 1
+                    job.status = RUNNING
+                    job.started = time.time()
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job):
+        try:
+            with cancellation_scope(job.is_cancel_requested):
+                result = job.fn(job)
+            status, error = DONE, None
+        except SynthesisCancelled:
+            status, result, error = CANCELLED, None, None
+        except Exception as e:
+            status, result, error = FAILED, None, str(e) or e.__class__.__name__
+            traceback.print_exc()
+        with self._lock:
+            job.result = result
+            job.error = error
+            job.status = status
+            job.finished = time.time()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """Return the process-wide job manager
+
+    Sized by ``TTS_JOB_WORKERS`` and ``TTS_JOB_QUEUE_SIZE``.
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager(
+                workers=int(os.environ.get("TTS_JOB_WORKERS", DEFAULT_WORKERS)),
+                queue_size=int(os.environ.get("TTS_JOB_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)),
+            )
+        return _manager
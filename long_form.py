@@ -0,0 +1,357 @@
+"""Long-form synthesis: split text into sentence chunks and render them on a worker pool.
+
+Local engines process one segment at a time, so a long article keeps a single
+core busy. Here the text is cut at paragraph/sentence boundaries, chunks are
+synthesized concurrently (torch releases the GIL inside its kernels), and the
+results are written back in their original order with a fixed silence between
+them.
+
+synthesize_sequential() is the constant-memory variant for Chatterbox: chunks
+are sized by the model's text tokens rather than characters and rendered one
+after another, each appended to the WAV as soon as it is done, so peak memory
+depends on the chunk budget instead of the length of the document.
+"""
+import io
+import os
+import re
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from audio_processing import borrow_post_processor
+from cancellation import check_cancelled, propagate_cancellation
+from perf_metrics import propagate_timings, stage, timed_iter
+from voice_conditioning import builtin_conditionals, using_conditionals
+
+DEFAULT_MAX_CHUNK_CHARS = 400
+DEFAULT_SILENCE_MS = 250
+# Chatterbox text tokens per sequential chunk: roughly 15 s of speech, well
+# inside the speech tokens T3 can generate in one pass
+DEFAULT_MAX_CHUNK_TOKENS = 250
+DEFAULT_CHATTERBOX_SEED = 0
+
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n+|\n+")
+# Split after sentence-ending punctuation (including CJK full-width marks)
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|(?<=[。！？])")
+_CLAUSE_SPLIT = re.compile(r"(?<=[,;:])\s+")
+# Seeded chunks reseed torch's process-wide generator, so they run one at a time
+_seeded_generation_lock = threading.Lock()
+
+
+def split_sentences(text):
+    """Split text into sentences, keeping paragraph breaks as hard boundaries"""
+    sentences = []
+    for paragraph in _PARAGRAPH_SPLIT.split(text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        sentences.extend(s.strip() for s in _SENTENCE_SPLIT.split(paragraph) if s and s.strip())
+    return sentences
+
+
+def split_into_chunks(text, max_chars=DEFAULT_MAX_CHUNK_CHARS):
+    """Greedily pack whole sentences into chunks of at most max_chars
+
+    A single sentence longer than max_chars becomes its own chunk rather than
+    being cut mid-sentence.
+    """
+    chunks = []
+    current = ""
+    for sentence in split_sentences(text):
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _pack(parts, count_tokens, max_tokens):
+    chunks = []
+    current = ""
+    for part in parts:
+        candidate = f"{current} {part}" if current else part
+        if current and count_tokens(candidate) > max_tokens:
+            chunks.append(current)
+            current = part
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_into_token_chunks(text, count_tokens, max_tokens=DEFAULT_MAX_CHUNK_TOKENS):
+    """Greedily pack whole sentences into chunks of at most max_tokens
+
+    count_tokens(text) returns the engine's token count for a string. A
+    sentence over the budget is cut at clause punctuation and, failing that,
+    between words; a single word over the budget is kept whole.
+    """
+    pieces = []
+    for sentence in split_sentences(text):
+        if count_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+        for clause in _CLAUSE_SPLIT.split(sentence):
+            if count_tokens(clause) <= max_tokens:
+                pieces.append(clause)
+            else:
+                pieces.extend(_pack(clause.split(), count_tokens, max_tokens))
+    return _pack(pieces, count_tokens, max_tokens)
+
+
+def chatterbox_chunk_tokens():
+    """Return the sequential chunk budget from ``TTS_CHATTERBOX_CHUNK_TOKENS``"""
+    return max(1, int(os.environ.get("TTS_CHATTERBOX_CHUNK_TOKENS", DEFAULT_MAX_CHUNK_TOKENS)))
+
+
+def chatterbox_seed():
+    """Return the sampling seed of constant-memory Chatterbox runs from ``TTS_CHATTERBOX_SEED``"""
+    return int(os.environ.get("TTS_CHATTERBOX_SEED", DEFAULT_CHATTERBOX_SEED))
+
+
+def chatterbox_token_counter(model):
+    """Return count_tokens(text) using the model's own text tokenizer
+
+    Falls back to one token per character (the English tokenizer is close to
+    that) if the model does not expose one.
+    """
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is None or not hasattr(tokenizer, "text_to_tokens"):
+        return len
+
+    def count_tokens(text):
+        return int(tokenizer.text_to_tokens(text).shape[-1])
+
+    return count_tokens
+
+
+def default_worker_count():
+    """Use the available cores, leaving one for Streamlit itself"""
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def _limit_torch_threads(threads_per_worker):
+    # torch.set_num_threads applies to the calling thread's OpenMP team, so each
+    # worker gets a share of the cores instead of every worker claiming all of them.
+    try:
+        import torch
+
+        torch.set_num_threads(threads_per_worker)
+    except Exception:
+        pass
+
+
+def synthesize_chunks(chunks, synthesize_chunk, workers=None):
+    """Run synthesize_chunk over chunks on a thread pool, yielding results in input order
+
+    Results are yielded as soon as every earlier chunk is done, so callers can
+    write or play the beginning while later chunks are still rendering.
+    """
+    workers = max(1, min(workers or default_worker_count(), len(chunks) or 1))
+    if workers == 1:
+        for chunk in chunks:
+            check_cancelled()
+            yield synthesize_chunk(chunk)
+        return
+
+    # Pool threads inherit the caller's cancellation check, so a cancelled job
+    # stops in-flight chunks and skips the ones still queued
+    synthesize_chunk = propagate_timings(propagate_cancellation(synthesize_chunk))
+
+    threads_per_worker = max(1, (os.cpu_count() or workers) // workers)
+    with ThreadPoolExecutor(
+        max_workers=workers,
+        thread_name_prefix="tts-chunk",
+        initializer=_limit_torch_threads,
+        initargs=(threads_per_worker,),
+    ) as pool:
+        yield from pool.map(synthesize_chunk, chunks)
+
+
+def float_to_pcm16(audio):
+    """Convert float audio in [-1, 1] to 16-bit PCM bytes, clipping out-of-range samples"""
+    if isinstance(audio, np.ndarray) and audio.dtype == np.int16:
+        # Already converted by an AudioPostProcessor
+        return audio.tobytes()
+    audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+
+
+def pcm16_wav_bytes(audio, sample_rate):
+    """Encode one float waveform as an in-memory mono 16-bit WAV (for st.audio)"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(float_to_pcm16(audio))
+    return buffer.getvalue()
+
+
+def write_chunks_to_wav(filepath, chunk_audio, sample_rate, silence_ms=DEFAULT_SILENCE_MS, on_chunk=None,
+                        progress=None, total_chunks=None, processor=None):
+    """Write chunk waveforms in order as a mono 16-bit WAV and return the audio duration in seconds
+
+    chunk_audio may be a lazy iterator; each chunk is run through processor
+    (an AudioPostProcessor, by default one borrowed with
+    borrow_post_processor), written, and passed to on_chunk(pcm16,
+    output_rate) as soon as it arrives.
+    """
+    if processor is None:
+        with borrow_post_processor(sample_rate) as processor:
+            return write_chunks_to_wav(filepath, chunk_audio, sample_rate, silence_ms=silence_ms, on_chunk=on_chunk,
+                                       progress=progress, total_chunks=total_chunks, processor=processor)
+    output_rate = processor.output_rate
+    silence = b"\x00\x00" * int(output_rate * silence_ms / 1000)
+    total_samples = 0
+    with wave.open(str(filepath), "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(output_rate)
+        # Producing each chunk is the engine's work; the rest is ours
+        for i, audio in enumerate(timed_iter(chunk_audio, "inference")):
+            with stage("post_processing"):
+                pcm = processor.process(audio)
+            with stage("disk_write"):
+                if i > 0 and silence:
+                    wav_file.writeframes(silence)
+                    total_samples += len(silence) // 2
+                wav_file.writeframes(pcm)
+            total_samples += len(pcm)
+            if on_chunk:
+                # The processor reuses its buffer for the next chunk
+                on_chunk(pcm.copy(), output_rate)
+            if progress:
+                progress(i + 1, total_chunks or i + 1)
+    return total_samples / output_rate
+
+
+def make_kokoro_chunk_synth(pipeline, voice, speed):
+    """Return a callable rendering one chunk with a shared Kokoro pipeline"""
+    # Load the voice pack once up front so worker threads don't race to fill the cache
+    try:
+        pipeline.load_voice(voice)
+    except Exception:
+        pass
+
+    def synthesize_chunk(chunk):
+        parts = []
+        for result in pipeline(chunk, voice=voice, speed=speed, split_pattern=r"\n+"):
+            if result.audio is None:
+                continue
+            parts.append(result.audio.numpy())
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+    return synthesize_chunk
+
+
+def make_chatterbox_chunk_synth(model, conditionals=None, exaggeration=0.5, cfg_weight=0.5, temperature=0.8,
+                                seed=None):
+    """Return a callable rendering one chunk with a shared Chatterbox model
+
+    conditionals comes from voice_conditioning (a cloned voice); by default
+    the model's built-in voice is used. With a seed, every chunk is generated
+    under a process-wide lock on a forked copy of torch's RNG state
+    (torch.random.fork_rng) reseeded with it, so a chunk's audio depends
+    neither on the chunks before it nor on other seeded generations, and the
+    generator is left as it was for everyone else. Unseeded sampling running
+    on another thread at the same moment still shares the generator.
+    """
+    # Resolve the voice once; every chunk then runs with the same conditioning,
+    # so chunks of one request generate concurrently without touching model.conds
+    if conditionals is None:
+        conditionals = builtin_conditionals(model, exaggeration)
+
+    def generate(chunk):
+        return model.generate(
+            chunk,
+            exaggeration=exaggeration,
+            cfg_weight=cfg_weight,
+            temperature=temperature,
+            repetition_penalty=1.2,
+            min_p=0.05,
+            top_p=1.0,
+        )
+
+    def synthesize_chunk(chunk):
+        with using_conditionals(model, conditionals):
+            if seed is None:
+                wav = generate(chunk)
+            else:
+                import torch
+
+                device = torch.device(getattr(model, "device", "cpu"))
+                devices = [device.index or 0] if device.type == "cuda" else []
+                with _seeded_generation_lock, torch.random.fork_rng(devices=devices):
+                    torch.manual_seed(seed)
+                    wav = generate(chunk)
+        return wav.squeeze(0).detach().cpu().numpy()
+
+    return synthesize_chunk
+
+
+def synthesize_long_form(text, synthesize_chunk, filepath, sample_rate, workers=None,
+                         max_chars=DEFAULT_MAX_CHUNK_CHARS, silence_ms=DEFAULT_SILENCE_MS, on_chunk=None,
+                         progress=None, processor=None):
+    """Chunk, synthesize in parallel and write a WAV; return run statistics
+
+    ``rtf`` is the real-time factor: wall-clock seconds per second of audio
+    (lower is faster, below 1.0 is faster than real time). on_chunk is called
+    with each chunk's audio, in order, as soon as it is ready, and
+    progress(done, total) after each chunk is written.
+    """
+    chunks = split_into_chunks(text, max_chars=max_chars)
+    if not chunks:
+        raise ValueError("No speakable text to synthesize")
+    workers = max(1, min(workers or default_worker_count(), len(chunks)))
+
+    start = time.perf_counter()
+    chunk_audio = synthesize_chunks(chunks, synthesize_chunk, workers=workers)
+    audio_seconds = write_chunks_to_wav(
+        filepath, chunk_audio, sample_rate, silence_ms=silence_ms, on_chunk=on_chunk,
+        progress=progress, total_chunks=len(chunks), processor=processor,
+    )
+    synthesis_seconds = time.perf_counter() - start
+    return {
+        "chunks": len(chunks),
+        "workers": workers,
+        "synthesis_seconds": round(synthesis_seconds, 3),
+        "audio_seconds": round(audio_seconds, 3),
+        "rtf": round(synthesis_seconds / audio_seconds, 4) if audio_seconds else None,
+    }
+
+
+def synthesize_sequential(text, synthesize_chunk, filepath, sample_rate, count_tokens,
+                          max_tokens=DEFAULT_MAX_CHUNK_TOKENS, silence_ms=DEFAULT_SILENCE_MS, on_chunk=None,
+                          progress=None, processor=None):
+    """Render token-budgeted chunks one at a time, appending each to a WAV; return run statistics
+
+    Only one chunk's audio is held at a time: it is written (and passed to
+    on_chunk) before the next chunk starts. Statistics are those of
+    synthesize_long_form plus the token budget.
+    """
+    chunks = split_into_token_chunks(text, count_tokens, max_tokens=max_tokens)
+    if not chunks:
+        raise ValueError("No speakable text to synthesize")
+
+    start = time.perf_counter()
+    audio_seconds = write_chunks_to_wav(
+        filepath, synthesize_chunks(chunks, synthesize_chunk, workers=1), sample_rate, silence_ms=silence_ms,
+        on_chunk=on_chunk, progress=progress, total_chunks=len(chunks), processor=processor,
+    )
+    synthesis_seconds = time.perf_counter() - start
+    return {
+        "chunks": len(chunks),
+        "workers": 1,
+        "max_tokens": max_tokens,
+        "synthesis_seconds": round(synthesis_seconds, 3),
+        "audio_seconds": round(audio_seconds, 3),
+        "rtf": round(synthesis_seconds / audio_seconds, 4) if audio_seconds else None,
+    }
@@ -0,0 +1,73 @@
+"""Re-encode an existing saved_audio/ WAV archive to FLAC, Opus or MP3.
+
+Every .wav in the audio directory is encoded with ffmpeg on a worker pool;
+history entries and synthesis-cache rows are repointed at the new files
+(recording the codec) and the WAVs are removed. Safe to interrupt and rerun:
+files already converted are simply no longer WAVs.
+
+    python migrate_audio_storage.py --format flac
+    python migrate_audio_storage.py --format opus --bitrate 24k --workers 8
+    python migrate_audio_storage.py --format flac --dry-run
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from audio_storage import STORAGE_FORMATS, AudioEncoder, ffmpeg_path, storage_format
+from synthesis import DEFAULT_AUDIO_DIR
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    compressed = [name for name in STORAGE_FORMATS if name != "wav"]
+    default_format = storage_format()
+    parser.add_argument("--format", choices=compressed, default=default_format if default_format != "wav" else "flac",
+                        help="Target format (default: TTS_STORAGE_FORMAT, else flac)")
+    parser.add_argument("--bitrate", default=os.environ.get("TTS_STORAGE_BITRATE"),
+                        help="Bitrate for opus/mp3, e.g. 32k (default: per format)")
+    parser.add_argument("--audio-dir", default=DEFAULT_AUDIO_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Parallel ffmpeg processes")
+    parser.add_argument("--keep-wav", action="store_true", help="Leave the original WAV files in place")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be converted")
+    args = parser.parse_args()
+
+    audio_dir = Path(args.audio_dir)
+    wav_files = sorted(path.name for path in audio_dir.glob("*.wav")) if audio_dir.is_dir() else []
+    total_bytes = sum((audio_dir / name).stat().st_size for name in wav_files)
+    print(f"{len(wav_files)} WAV files ({total_bytes / (1024 * 1024):.1f} MB) in {audio_dir} -> {args.format}")
+    if args.dry_run or not wav_files:
+        return
+    if ffmpeg_path() is None:
+        sys.exit("ffmpeg is required: install it (e.g. `brew install ffmpeg`) and make sure it is on PATH")
+
+    encoder = AudioEncoder(audio_dir, args.format, bitrate=args.bitrate)
+    failures = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {pool.submit(encoder.encode_and_replace, name, args.keep_wav): name for name in wav_files}
+        for done, future in enumerate(as_completed(futures), 1):
+            name = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                failures.append(name)
+                print(f"  ✗ {name}: {e}", file=sys.stderr)
+            if done % 50 == 0 or done == len(wav_files):
+                print(f"  {done}/{len(wav_files)} files")
+
+    stats = encoder.stats()
+    elapsed = time.perf_counter() - start
+    before_mb = stats["bytes_before"] / (1024 * 1024)
+    after_mb = stats["bytes_after"] / (1024 * 1024)
+    print("\n=== Migration summary ===")
+    print(f"Encoded:  {stats['encoded']} files in {elapsed:.1f}s, {len(failures)} failed")
+    print(f"Size:     {before_mb:.1f} MB -> {after_mb:.1f} MB"
+          + (f" ({after_mb / before_mb:.0%} of original)" if before_mb else ""))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Kokoro on ONNX Runtime (CPU) instead of PyTorch.
+
+The acoustic model (kokoro.KModel) is exported to ONNX once, on first use or
+with ``python onnx_kokoro.py export``, and then run with ONNX Runtime.
+Everything else stays Kokoro's own: a model-less KPipeline still does the
+misaki G2P, sentence splitting and voice-pack loading, so voices, languages
+and the phoneme cache work exactly as on the PyTorch path.
+
+OnnxKokoroPipeline is a drop-in for KPipeline as synthesis and long_form use
+it: called with (text, voice, speed, split_pattern), it yields results with
+``.audio``. Needs ``pip install onnxruntime`` (plus ``onnx`` for the export).
+"""
+import argparse
+import json
+import os
+import threading
+from pathlib import Path
+
+DEFAULT_REPO_ID = "hexgrad/Kokoro-82M"
+DEFAULT_MODEL_PATH = Path(__file__).resolve().parent / "models" / "kokoro.onnx"
+# KModel's context length: phonemes plus the two boundary tokens
+CONTEXT_LENGTH = 512
+ONNX_OPSET = 17
+
+DEFAULT_BACKEND = "torch"
+KOKORO_BACKENDS = {
+    "torch": "PyTorch",
+    "onnx": "ONNX Runtime (CPU)",
+}
+
+_export_lock = threading.Lock()
+
+
+def kokoro_backend(name=None):
+    """Return a valid backend name: name, else ``TTS_KOKORO_BACKEND``, else torch"""
+    name = (name or os.environ.get("TTS_KOKORO_BACKEND", DEFAULT_BACKEND)).strip().lower() or DEFAULT_BACKEND
+    if name not in KOKORO_BACKENDS:
+        print(f"[onnx_kokoro] unknown Kokoro backend {name!r}; using {DEFAULT_BACKEND}")
+        return DEFAULT_BACKEND
+    return name
+
+
+def default_model_path():
+    return Path(os.environ.get("TTS_KOKORO_ONNX_MODEL") or DEFAULT_MODEL_PATH)
+
+
+def vocab_path(model_path):
+    return Path(model_path).with_suffix(".vocab.json")
+
+
+def export_kokoro_onnx(model_path=None, repo_id=DEFAULT_REPO_ID, opset=ONNX_OPSET):
+    """Export Kokoro's acoustic model to model_path (plus its phoneme vocabulary) and return the path"""
+    import torch
+    from kokoro import KModel
+
+    model_path = Path(model_path or default_model_path())
+    model_path.parent.mkdir(parents=True, exist_ok=True)
+    # The complex-valued iSTFT has no ONNX equivalent; Kokoro ships a real-valued one for export
+    kmodel = KModel(repo_id=repo_id, disable_complex=True).eval()
+
+    class _ExportWrapper(torch.nn.Module):
+        def __init__(self, kmodel):
+            super().__init__()
+            self.kmodel = kmodel
+
+        def forward(self, input_ids, ref_s, speed):
+            return self.kmodel.forward_with_tokens(input_ids, ref_s, speed)
+
+    input_ids = torch.randint(1, 100, (1, 48), dtype=torch.long)
+    input_ids[0, 0] = input_ids[0, -1] = 0
+    ref_s = torch.randn(1, 256)
+    speed = torch.tensor([1.0])
+    partial = model_path.with_name(f"{model_path.stem}.part{model_path.suffix}")
+    with torch.no_grad():
+        torch.onnx.export(
+            _ExportWrapper(kmodel),
+            (input_ids, ref_s, speed),
+            str(partial),
+            input_names=["input_ids", "ref_s", "speed"],
+            output_names=["waveform", "duration"],
+            dynamic_axes={"input_ids": {1: "tokens"}, "waveform": {0: "samples"}, "duration": {0: "tokens"}},
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+    with open(vocab_path(model_path), "w", encoding="utf-8") as f:
+        json.dump(kmodel.vocab, f, ensure_ascii=False)
+    os.replace(partial, model_path)
+    return model_path
+
+
+def ensure_exported(model_path=None):
+    """Return model_path, exporting the model first if it does not exist yet"""
+    model_path = Path(model_path or default_model_path())
+    with _export_lock:
+        if not model_path.exists() or not vocab_path(model_path).exists():
+            print(f"[onnx_kokoro] exporting Kokoro to {model_path} (one-time)")
+            export_kokoro_onnx(model_path)
+    return model_path
+
+
+class OnnxKokoroResult:
+    """The parts of KPipeline.Result that synthesis reads"""
+
+    def __init__(self, graphemes, phonemes, audio, pred_dur=None):
+        self.graphemes = graphemes
+        self.phonemes = phonemes
+        self.audio = audio
+        self.pred_dur = pred_dur
+
+
+class OnnxKokoroPipeline:
+    """KPipeline look-alike running the acoustic model with ONNX Runtime"""
+
+    def __init__(self, lang_code="a", model_path=None, threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("onnxruntime is not installed: pip install onnxruntime")
+        from kokoro import KPipeline
+
+        self.lang_code = lang_code
+        self.model_path = ensure_exported(model_path)
+        with open(vocab_path(self.model_path), encoding="utf-8") as f:
+            self.vocab = json.load(f)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = int(threads or os.environ.get("TTS_CPU_THREADS") or os.cpu_count() or 1)
+        # Concurrency comes from long-form workers sharing the session, not from inter-op threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(str(self.model_path), sess_options=options,
+                                            providers=["CPUExecutionProvider"])
+        # model=False: G2P, text splitting and voice packs only
+        self.pipeline = KPipeline(lang_code=lang_code, model=False)
+        self._packs = {}
+        self._packs_lock = threading.Lock()
+
+    # install_g2p_cache swaps the G2P; it has to land on the inner pipeline that calls it
+    @property
+    def g2p(self):
+        return self.pipeline.g2p
+
+    @g2p.setter
+    def g2p(self, value):
+        self.pipeline.g2p = value
+
+    def load_voice(self, voice):
+        """Return the voice pack as a float32 array of shape (510, 1, 256)"""
+        with self._packs_lock:
+            pack = self._packs.get(voice)
+        if pack is None:
+            pack = self.pipeline.load_voice(voice).numpy().astype("float32")
+            with self._packs_lock:
+                self._packs[voice] = pack
+        return pack
+
+    def estimated_bytes(self):
+        """Size of the ONNX model, for the engine registry's memory budget"""
+        return self.model_path.stat().st_size
+
+    def infer(self, phonemes, pack, speed=1):
+        import numpy as np
+
+        input_ids = [self.vocab[p] for p in phonemes if p in self.vocab][:CONTEXT_LENGTH - 2]
+        waveform, duration = self.session.run(None, {
+            "input_ids": np.array([[0, *input_ids, 0]], dtype=np.int64),
+            # Kokoro picks the style vector by phoneme count
+            "ref_s": pack[min(len(phonemes), len(pack)) - 1],
+            "speed": np.array([speed], dtype=np.float32),
+        })
+        return waveform, duration
+
+    def __call__(self, text, voice=None, speed=1, split_pattern=r"\n+"):
+        import torch
+
+        pack = self.load_voice(voice or "af_heart")
+        for result in self.pipeline(text, voice=None, speed=speed, split_pattern=split_pattern):
+            if not result.phonemes:
+                continue
+            waveform, duration = self.infer(result.phonemes, pack, speed)
+            # A tensor, like KPipeline's results, so callers can keep using .numpy()
+            yield OnnxKokoroResult(result.graphemes, result.phonemes, torch.from_numpy(waveform), duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Kokoro to ONNX for the ONNX Runtime backend")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("--output", default=None, help=f"Model path (default: $TTS_KOKORO_ONNX_MODEL or {DEFAULT_MODEL_PATH})")
+    parser.add_argument("--repo-id", default=DEFAULT_REPO_ID)
+    parser.add_argument("--opset", type=int, default=ONNX_OPSET)
+    args = parser.parse_args()
+    path = export_kokoro_onnx(args.output, repo_id=args.repo_id, opset=args.opset)
+    print(f"Exported {path} ({path.stat().st_size / (1024 * 1024):.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
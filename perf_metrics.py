@@ -0,0 +1,251 @@
+"""Per-stage timing of synthesis requests, and an optional Prometheus endpoint.
+
+synthesize_to_file runs under records_stage_timings(). Code along the request
+path wraps its work in ``with stage("name"):`` (import, model_load, g2p,
+inference, post_processing, disk_write, ...). Stages nest: time spent in an
+inner stage is not counted again in the outer one, so the stages of one
+request add up to at most its total, and the rest is reported as ``other``.
+Stages on long-form worker threads are summed across workers and overlap the
+``inference`` wait of the request thread.
+
+The timings are stored with each history entry (``timings``) and feed the
+Performance page. They also go into a process-wide histogram registry that
+can be scraped in Prometheus text format when ``TTS_METRICS_PORT`` is set,
+together with the start-up gauges recorded by startup.py.
+"""
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram buckets in seconds, from fast cache lookups to long generations
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_state = threading.local()
+
+
+class StageTimings:
+    """Seconds per stage for one request (shared by the request's worker threads)"""
+
+    def __init__(self):
+        self.seconds = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def as_dict(self, total=None):
+        """Return rounded stage seconds, plus ``other`` and ``total`` when total is given"""
+        with self._lock:
+            result = {name: round(value, 4) for name, value in self.seconds.items()}
+            accounted = sum(self.seconds.values())
+        if total is not None:
+            result["other"] = round(max(0.0, total - accounted), 4)
+            result["total"] = round(total, 4)
+        return result
+
+
+def current_timings():
+    """Return the StageTimings being recorded on this thread, or None"""
+    return getattr(_state, "timings", None)
+
+
+@contextmanager
+def recording_timings(timings=None):
+    """Record stages entered on this thread into timings (a new StageTimings by default)"""
+    previous = (current_timings(), getattr(_state, "stack", None))
+    _state.timings = timings or StageTimings()
+    _state.stack = []
+    try:
+        yield _state.timings
+    finally:
+        _state.timings, _state.stack = previous
+
+
+def records_stage_timings(fn):
+    """Decorator: run fn with a fresh StageTimings; fn reads it back with current_timings()"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with recording_timings():
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def stage(name):
+    """Time the block as stage name of the current request (no-op outside a request)"""
+    timings = current_timings()
+    if timings is None:
+        yield
+        return
+    stack = _state.stack
+    frame = [0.0]  # time spent in nested stages
+    stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stack.pop()
+        timings.add(name, elapsed - frame[0])
+        if stack:
+            stack[-1][0] += elapsed
+
+
+def timed_iter(iterable, name):
+    """Yield from iterable, timing the production of each item as stage name"""
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def propagate_timings(fn):
+    """Wrap fn so stages it enters on a pool thread count toward the calling request"""
+    timings = current_timings()
+    if timings is None:
+        return fn
+
+    def wrapped(*args, **kwargs):
+        with recording_timings(timings):
+            return fn(*args, **kwargs)
+
+    return wrapped
+
+
+class MetricsRegistry:
+    """Process-wide histograms of stage seconds and request counters"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._histograms = {}  # (provider, stage) -> [bucket counts..., count, sum]
+        self._requests = {}  # (provider, cache_hit) -> count
+        self._gauges = {}  # name -> (help, {labels tuple: value})
+        self._lock = threading.Lock()
+
+    def observe(self, provider, stage_name, seconds):
+        key = (provider or "", stage_name)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * len(self.buckets) + [0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[-2] += 1
+            histogram[-1] += seconds
+
+    def observe_request(self, provider, timings, cache_hit=False):
+        """Record every stage of a finished request (timings as returned by StageTimings.as_dict)"""
+        with self._lock:
+            key = (provider or "", bool(cache_hit))
+            self._requests[key] = self._requests.get(key, 0) + 1
+        for stage_name, seconds in timings.items():
+            self.observe(provider, stage_name, seconds)
+
+    def set_gauge(self, name, value, help_text="", **labels):
+        """Set a gauge sample, e.g. set_gauge("tts_first_request_seconds", 3.2, provider="Kokoro")"""
+        with self._lock:
+            _, samples = self._gauges.setdefault(name, (help_text, {}))
+            samples[tuple(sorted(labels.items()))] = value
+
+    def render_prometheus(self):
+        """Return all metrics in the Prometheus text exposition format"""
+        lines = [
+            "# HELP tts_stage_seconds Time spent in each synthesis stage.",
+            "# TYPE tts_stage_seconds histogram",
+        ]
+        with self._lock:
+            histograms = {key: list(value) for key, value in self._histograms.items()}
+            requests = dict(self._requests)
+            gauges = {name: (help_text, dict(samples)) for name, (help_text, samples) in self._gauges.items()}
+        for (provider, stage_name), histogram in sorted(histograms.items()):
+            labels = f'provider="{_escape(provider)}",stage="{_escape(stage_name)}"'
+            for bound, count in zip(self.buckets, histogram):
+                lines.append(f'tts_stage_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'tts_stage_seconds_bucket{{{labels},le="+Inf"}} {histogram[-2]}')
+            lines.append(f"tts_stage_seconds_sum{{{labels}}} {histogram[-1]:.6f}")
+            lines.append(f"tts_stage_seconds_count{{{labels}}} {histogram[-2]}")
+        lines += [
+            "# HELP tts_requests_total Synthesis requests completed.",
+            "# TYPE tts_requests_total counter",
+        ]
+        for (provider, cache_hit), count in sorted(requests.items()):
+            lines.append(f'tts_requests_total{{provider="{_escape(provider)}",cache_hit="{str(cache_hit).lower()}"}} {count}')
+        for name, (help_text, samples) in sorted(gauges.items()):
+            lines += [f"# HELP {name} {help_text or name}", f"# TYPE {name} gauge"]
+            for labels, value in sorted(samples.items()):
+                label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels)
+                lines.append(f"{name}{{{label_text}}} {value:.6f}" if label_text else f"{name} {value:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+_server = None
+_server_attempted = False
+
+
+def get_metrics():
+    """Return the process-wide metrics registry"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = MetricsRegistry()
+        return _metrics
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0].rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = get_metrics().render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serve /metrics on a background thread and return the server"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+def start_metrics_server_from_env():
+    """Start the /metrics endpoint once per process if ``TTS_METRICS_PORT`` is set; return its URL or None"""
+    global _server, _server_attempted
+    port = os.environ.get("TTS_METRICS_PORT")
+    if not port:
+        return None
+    with _metrics_lock:
+        if not _server_attempted:
+            _server_attempted = True
+            host = os.environ.get("TTS_METRICS_HOST", "127.0.0.1")
+            try:
+                _server = start_metrics_server(int(port), host)
+            except (OSError, ValueError) as e:
+                print(f"[perf_metrics] could not serve metrics on {host}:{port}: {e}")
+        if _server is None:
+            return None
+        host, port = _server.server_address[:2]
+    return f"http://{host}:{port}/metrics"
@@ -0,0 +1,151 @@
+"""Per-sentence audio cache for incremental re-synthesis.
+
+The synthesis cache only helps when a whole text is resubmitted unchanged.
+Editors usually change one sentence of a long script; this cache keeps the
+raw engine audio of every sentence rendered in incremental mode, keyed like
+the synthesis cache (normalized sentence, provider and every parameter that
+changes the audio), so the unchanged sentences of the next version are
+spliced in instead of synthesized again.
+
+Audio is stored as float32 blobs in ``saved_audio/segment_cache.sqlite3``,
+before post-processing, so output settings still apply to reused sentences.
+Entries are evicted least-recently-used beyond ``TTS_SEGMENT_CACHE_MAX_MB``.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+from synthesis_cache import synthesis_cache_key
+
+DB_FILENAME = "segment_cache.sqlite3"
+DEFAULT_MAX_MB = 1024
+
+
+def segment_cache_key(sentence, provider, params):
+    """Return the cache key of one sentence; params as for synthesis_cache_key"""
+    return synthesis_cache_key(sentence, provider, {**params, "segment": True})
+
+
+class SegmentCache:
+    """LRU store of per-sentence float32 audio"""
+
+    def __init__(self, audio_dir, max_mb=DEFAULT_MAX_MB):
+        self.audio_dir = Path(audio_dir)
+        self.db_path = self.audio_dir / DB_FILENAME
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.audio_dir.mkdir(exist_ok=True)
+        if self.enabled:
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS segments ("
+                    " key TEXT PRIMARY KEY,"
+                    " sample_rate INTEGER NOT NULL,"
+                    " audio BLOB NOT NULL,"
+                    " size_bytes INTEGER NOT NULL,"
+                    " last_used REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS segments_last_used ON segments (last_used)")
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def contains(self, keys):
+        """Return the subset of keys that have cached audio"""
+        if not self.enabled or not keys:
+            return set()
+        keys = list(keys)
+        found = set()
+        with self._connect() as conn:
+            # Chunked to stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT key FROM segments WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    def lookup(self, key):
+        """Return (audio, sample_rate) for key, or None on a miss"""
+        if not self.enabled:
+            return None
+        with self._connect() as conn:
+            row = conn.execute("SELECT sample_rate, audio FROM segments WHERE key = ?", (key,)).fetchone()
+            if row:
+                conn.execute("UPDATE segments SET last_used = ? WHERE key = ?", (time.time(), key))
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not row:
+            return None
+        return np.frombuffer(row[1], dtype="<f4").copy(), row[0]
+
+    def store(self, key, audio, sample_rate):
+        """Keep one sentence's audio and evict old entries beyond the size limit"""
+        if not self.enabled:
+            return
+        blob = np.asarray(audio, dtype="<f4").reshape(-1).tobytes()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO segments (key, sample_rate, audio, size_bytes, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, int(sample_rate), blob, len(blob), time.time()),
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM segments").fetchone()[0]
+            if total > self.max_bytes:
+                for old_key, size in conn.execute("SELECT key, size_bytes FROM segments ORDER BY last_used ASC").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM segments WHERE key = ?", (old_key,))
+                    total -= size
+
+    def stats(self):
+        """Return hit/miss counters of this process and the current size"""
+        count = total = 0
+        if self.enabled:
+            with self._connect() as conn:
+                count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM segments").fetchone()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": count,
+                "size_mb": round(total / (1024 * 1024), 1),
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_segment_cache(audio_dir):
+    """Return the process-wide segment cache for audio_dir
+
+    ``TTS_SEGMENT_CACHE_MAX_MB`` limits its size; 0 disables it.
+    """
+    key = str(Path(audio_dir).resolve())
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = SegmentCache(audio_dir, max_mb=float(os.environ.get("TTS_SEGMENT_CACHE_MAX_MB", DEFAULT_MAX_MB)))
+        return _caches[key]
@@ -0,0 +1,232 @@
+"""Once-per-server-process start-up work, and how long start-up takes.
+
+streamlit_app.py re-executes on every interaction, but imported modules (this
+one included) live for the whole server process. start_from_env() does its
+work the first time the script runs, on a background thread:
+
+  * the heavy modules behind the engines in ``TTS_PRELOAD_ENGINES`` are
+    imported (timed one by one), then those engines are loaded;
+  * with ``TTS_STARTUP_MODE=preload`` the modules of every installed local
+    engine are imported as well, so the first Kokoro/Chatterbox Submit does
+    not pay for ``import torch`` even when no weights are preloaded.
+
+StartupStats keeps the import times, the app's own import time, the time of
+each script rerun and the latency of the first request per provider. The
+Performance page shows them and they are exported as Prometheus gauges.
+"""
+import importlib
+import importlib.util
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from engine_registry import (
+    CHATTERBOX_PROVIDER,
+    KOKORO_ONNX_ENGINE,
+    KOKORO_PROVIDER,
+    get_engine_registry,
+    parse_preload_spec,
+)
+from perf_metrics import get_metrics
+
+DEFAULT_STARTUP_MODE = "lazy"
+STARTUP_MODES = {
+    "lazy": "Import engines on first use",
+    "preload": "Import every installed engine in the background at launch",
+}
+
+# Heavy modules behind each local engine, in import order
+ENGINE_MODULES = {
+    KOKORO_PROVIDER: ("torch", "kokoro"),
+    KOKORO_ONNX_ENGINE: ("onnxruntime", "torch", "kokoro"),
+    CHATTERBOX_PROVIDER: ("torch", "torchaudio", "chatterbox.tts"),
+}
+
+# Script reruns kept for the rerun percentiles
+RERUN_HISTORY = 500
+
+# Close enough to server launch: the app imports this on its first run
+_launched = time.perf_counter()
+
+
+def startup_mode(name=None):
+    """Return a valid start-up mode: name, else ``TTS_STARTUP_MODE``, else lazy"""
+    name = (name or os.environ.get("TTS_STARTUP_MODE", DEFAULT_STARTUP_MODE)).strip().lower() or DEFAULT_STARTUP_MODE
+    if name not in STARTUP_MODES:
+        print(f"[startup] unknown start-up mode {name!r}; using {DEFAULT_STARTUP_MODE}")
+        return DEFAULT_STARTUP_MODE
+    return name
+
+
+def seconds_since_launch():
+    return time.perf_counter() - _launched
+
+
+class StartupStats:
+    """Start-up and first-request timings of this server process"""
+
+    def __init__(self):
+        self.mode = DEFAULT_STARTUP_MODE
+        self.app_import_seconds = None
+        self.module_seconds = {}  # module -> import seconds (only imports done by the preload)
+        self.failed_modules = {}  # module -> error
+        self.engine_seconds = {}  # "provider (option)" -> load seconds
+        self.preload_started = None  # seconds since launch
+        self.preload_finished = None
+        self.first_requests = {}  # provider -> dict
+        self.reruns = deque(maxlen=RERUN_HISTORY)
+        self._lock = threading.Lock()
+
+    def preload_state(self):
+        if self.preload_started is None:
+            return "off"
+        return "done" if self.preload_finished is not None else "running"
+
+    def note_app_import(self, seconds):
+        """Record the app's import time; only the first run of the script imports anything"""
+        with self._lock:
+            if self.app_import_seconds is not None:
+                return
+            self.app_import_seconds = seconds
+        get_metrics().set_gauge("tts_app_import_seconds", seconds, "Time to import the app's modules on first run.")
+
+    def note_rerun(self, seconds):
+        with self._lock:
+            self.reruns.append(seconds)
+
+    def note_module(self, name, seconds):
+        with self._lock:
+            self.module_seconds[name] = seconds
+        get_metrics().set_gauge("tts_startup_import_seconds", seconds, "Import time of heavy modules preloaded at start-up.", module=name)
+
+    def note_engine(self, label, seconds):
+        with self._lock:
+            self.engine_seconds[label] = seconds
+        get_metrics().set_gauge("tts_startup_engine_load_seconds", seconds, "Load time of engines preloaded at start-up.", engine=label)
+
+    def note_request(self, provider, timings, cache_hit=False):
+        """Keep the first uncached request per provider (timings as in metadata["timings"])"""
+        if cache_hit:
+            return
+        with self._lock:
+            if provider in self.first_requests:
+                return
+            self.first_requests[provider] = {
+                "seconds": timings.get("total", 0.0),
+                "import_seconds": timings.get("import", 0.0),
+                "model_load_seconds": timings.get("model_load", 0.0),
+                "since_launch": round(seconds_since_launch(), 2),
+                "preload": self.preload_state(),
+            }
+        get_metrics().set_gauge("tts_first_request_seconds", timings.get("total", 0.0),
+                                "Latency of the first uncached request per provider.", provider=provider)
+
+    def snapshot(self):
+        """Return a copy of everything recorded, for the Performance page"""
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "app_import_seconds": self.app_import_seconds,
+                "modules": dict(self.module_seconds),
+                "failed_modules": dict(self.failed_modules),
+                "engines": dict(self.engine_seconds),
+                "preload": self.preload_state(),
+                "preload_seconds": (
+                    self.preload_finished - self.preload_started if self.preload_finished is not None else None
+                ),
+                "first_requests": {provider: dict(value) for provider, value in self.first_requests.items()},
+                "reruns": list(self.reruns),
+            }
+
+
+def import_timed(name, stats=None):
+    """Import a module and return the seconds it took (0.0 if it was already imported, None on failure)"""
+    if name in sys.modules:
+        return 0.0
+    start = time.perf_counter()
+    try:
+        importlib.import_module(name)
+    except Exception as e:
+        print(f"[startup] could not preload {name}: {e}")
+        if stats is not None:
+            with stats._lock:
+                stats.failed_modules[name] = str(e)
+        return None
+    elapsed = time.perf_counter() - start
+    if stats is not None:
+        stats.note_module(name, elapsed)
+    return elapsed
+
+
+def _installed(module_name):
+    try:
+        return importlib.util.find_spec(module_name.split(".")[0]) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def preload_modules(mode, specs):
+    """Return the modules to import ahead of time: those of specs' engines, then (preload mode) the rest"""
+    providers = [provider for provider, _, _, _ in specs]
+    if mode == "preload":
+        providers += [provider for provider in ENGINE_MODULES if provider not in providers]
+    modules = []
+    for provider in providers:
+        for name in ENGINE_MODULES.get(provider, ()):
+            if name not in modules and _installed(name):
+                modules.append(name)
+    return modules
+
+
+def preload(modules, specs, stats=None):
+    """Import modules, then load the engines in specs (provider, device, lang_code, profile)"""
+    stats = stats or get_startup_stats()
+    stats.preload_started = seconds_since_launch()
+    try:
+        for name in modules:
+            import_timed(name, stats)
+        registry = get_engine_registry()
+        loaded_before = set(registry.load_seconds)
+        registry.warm_up(specs, background=False)
+        # Engines that failed to load (warm_up logs why) have no entry
+        for key, seconds in list(registry.load_seconds.items()):
+            if key not in loaded_before:
+                provider, device, lang_code, profile = key
+                options = ", ".join(option for option in (device, lang_code, profile) if option)
+                stats.note_engine(f"{provider} ({options})" if options else provider, seconds)
+    finally:
+        stats.preload_finished = seconds_since_launch()
+
+
+_stats = None
+_stats_lock = threading.Lock()
+_started = False
+
+
+def get_startup_stats():
+    """Return the process-wide start-up stats"""
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = StartupStats()
+        return _stats
+
+
+def start_from_env():
+    """Start the background preload once per server process; return its thread, or None if there is nothing to do"""
+    global _started
+    with _stats_lock:
+        if _started:
+            return None
+        _started = True
+    stats = get_startup_stats()
+    stats.mode = startup_mode()
+    specs = parse_preload_spec(os.environ.get("TTS_PRELOAD_ENGINES", ""))
+    modules = preload_modules(stats.mode, specs)
+    if not modules and not specs:
+        return None
+    thread = threading.Thread(target=preload, args=(modules, specs, stats), name="startup-preload", daemon=True)
+    thread.start()
+    return thread
@@ -1,17 +1,36 @@
+import time
+script_start = time.perf_counter()  # app import and rerun timings (see startup.py)
+
 import streamlit as st
 import os
-import time
 import datetime
-import json
-from pathlib import Path
-import requests
 import io
 import subprocess
 import threading
-import wave
-import numpy as np
+import uuid
 import sys
 
+from audio_storage import audio_mime_type, get_audio_encoder, resolve_audio_path
+from batching import batching_stats
+from cancellation import SynthesisCancelled
+from elevenlabs_client import get_voice_cache
+from g2p_cache import get_g2p_cache
+from hedging import hedge_deadline, hedge_stats, synthesize_hedged
+from history_store import get_history_store
+from inference_profiles import PROFILES, chatterbox_profile
+from jobs import JobQueueFull, get_job_manager
+from long_form import default_worker_count, pcm16_wav_bytes
+from onnx_kokoro import KOKORO_BACKENDS, kokoro_backend
+from perf_metrics import start_metrics_server_from_env
+from startup import STARTUP_MODES, get_startup_stats, start_from_env
+from synthesis import PROVIDERS, SynthesisError, ensure_audio_directory, generate_title_from_text, synthesize_to_file
+from synthesis_cache import get_synthesis_cache
+from system_voice import stop_system_voices, system_voice_running
+from voice_catalog import KOKORO_LANGUAGE_NAMES, KOKORO_VOICES, kokoro_voice_options
+from voice_conditioning import get_voice_conditioning_cache
+
+get_startup_stats().note_app_import(time.perf_counter() - script_start)
+
 st.set_page_config(
     page_title="Text to Speech",
     page_icon="🗣️",
@@ -88,72 +107,36 @@ if 'kokoro_voice' not in st.session_state:
     st.session_state.kokoro_voice = 'af_heart'
 if 'kokoro_lang' not in st.session_state:
     st.session_state.kokoro_lang = 'a'  # Default to American English
+if 'kokoro_backend' not in st.session_state:
+    st.session_state.kokoro_backend = kokoro_backend()  # TTS_KOKORO_BACKEND or torch
 if 'chatterbox_exaggeration' not in st.session_state:
     st.session_state.chatterbox_exaggeration = 0.5
 if 'chatterbox_cfg_weight' not in st.session_state:
     st.session_state.chatterbox_cfg_weight = 0.5
 if 'chatterbox_temperature' not in st.session_state:
     st.session_state.chatterbox_temperature = 0.8
+if 'chatterbox_profile' not in st.session_state:
+    st.session_state.chatterbox_profile = chatterbox_profile()  # TTS_CHATTERBOX_PROFILE or standard
 if 'chatterbox_audio_prompt' not in st.session_state:
     st.session_state.chatterbox_audio_prompt = None
+if 'last_generation_stats' not in st.session_state:
+    st.session_state.last_generation_stats = None
+if 'last_cache_hit' not in st.session_state:
+    st.session_state.last_cache_hit = False
+if 'last_time_to_first_audio' not in st.session_state:
+    st.session_state.last_time_to_first_audio = None
+if 'session_id' not in st.session_state:
+    # Identifies this browser session's background jobs
+    st.session_state.session_id = uuid.uuid4().hex
 
-def ensure_audio_directory():
-    audio_dir = Path("saved_audio")
-    audio_dir.mkdir(exist_ok=True)
-    return audio_dir
-
-def get_elevenlabs_voices(api_key):
-    """Get available voices from ElevenLabs"""
-    try:
-        headers = {"xi-api-key": api_key}
-        response = requests.get("https://api.elevenlabs.io/v1/voices", headers=headers)
-        if response.status_code == 200:
-            voices = response.json()["voices"]
-            return {voice["name"]: voice["voice_id"] for voice in voices}
-        else:
-            return None
-    except:
-        return None
-
-def generate_elevenlabs_audio(text, api_key, voice_id, speed_setting, model_id=None, voice_settings_override=None):
-    """Generate audio using ElevenLabs API"""
-    try:
-        url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
-
-        # Determine voice settings
-        if voice_settings_override is not None:
-            voice_settings = voice_settings_override
-        else:
-            # Basic mapping of speed to stability/similarity if no override provided
-            stability = max(0.1, min(1.0, 0.75 - (speed_setting - 1.0) * 0.2))
-            similarity_boost = max(0.1, min(1.0, 0.75 + (speed_setting - 1.0) * 0.1))
-            voice_settings = {
-                "stability": stability,
-                "similarity_boost": similarity_boost,
-                "style": 0.0,
-                "use_speaker_boost": True,
-            }
-
-        data = {
-            "text": text,
-            "model_id": model_id or "eleven_monolingual_v1",
-            "voice_settings": voice_settings,
-        }
+# Import heavy modules and preload TTS_PRELOAD_ENGINES in the background (once per server process)
+start_from_env()
+# Serve Prometheus metrics when TTS_METRICS_PORT is set (once per server process)
+metrics_url = start_metrics_server_from_env()
 
-        headers = {
-            "Accept": "audio/mpeg",
-            "Content-Type": "application/json",
-            "xi-api-key": api_key,
-        }
-
-        response = requests.post(url, json=data, headers=headers)
-
-        if response.status_code == 200:
-            return response.content
-        else:
-            return None
-    except:
-        return None
+def get_elevenlabs_voices(api_key, force_refresh=False):
+    """Get available voices from ElevenLabs (cached per API key, refreshed in the background)"""
+    return get_voice_cache().get(api_key, force_refresh=force_refresh)
 
 def audio_player_controls():
     """Display audio player controls using Streamlit's built-in audio player"""
@@ -162,8 +145,8 @@ def audio_player_controls():
     
     st.markdown("### 🎵 Audio Player")
     
-    # Get current file info
-    filepath = Path(st.session_state.current_audio_file)
+    # Get current file info (it may have been re-encoded in the background since)
+    filepath = resolve_audio_path(st.session_state.current_audio_file)
     if not filepath.exists():
         st.error("Audio file not found")
         return
@@ -174,19 +157,7 @@ def audio_player_controls():
             audio_bytes = audio_file.read()
         
         # Determine format based on file extension
-        file_extension = filepath.suffix.lower()
-        if file_extension == '.mp3':
-            audio_format = "audio/mpeg"
-        elif file_extension == '.aiff' or file_extension == '.aif':
-            # Some browsers don't play AIFF; we convert to WAV earlier now,
-            # but keep this for robustness.
-            audio_format = "audio/aiff"
-        elif file_extension == '.wav':
-            audio_format = "audio/wav"
-        else:
-            audio_format = "audio/mpeg"  # default
-        
-        st.audio(audio_bytes, format=audio_format)
+        st.audio(audio_bytes, format=audio_mime_type(filepath))
         
         # Show file info
         st.caption(f"📁 File: {filepath.name}")
@@ -194,175 +165,187 @@ def audio_player_controls():
     except Exception as e:
         st.error(f"Error loading audio file: {str(e)}")
 
-def save_audio_file(text, speed_setting, tts_provider, api_key=None, voice_id=None, model_id=None, voice_settings_override=None, audio_prompt_path=None):
-    """Save TTS audio to a file and return the filepath"""
-    audio_dir = ensure_audio_directory()
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    if tts_provider == "Mac (say command)":
-        # Generate AIFF then convert to WAV for browser-friendly playback
-        tmp_aiff = audio_dir / f"tts_mac_{timestamp}.aiff"
-        filename = f"tts_mac_{timestamp}.wav"
-        filepath = audio_dir / filename
-
-        base_rate = 150
-        adjusted_rate = int(base_rate * speed_setting)
-
-        # Create AIFF via say
-        os.system(f'say -r {adjusted_rate} -o "{tmp_aiff}" "{text}"')
-        # Convert to WAV (HTML5 audio friendly) and remove AIFF
-        os.system(f'afconvert -f WAVE -d LEI16 "{tmp_aiff}" "{filepath}"')
-        if tmp_aiff.exists():
-            try:
-                os.remove(tmp_aiff)
-            except Exception:
-                pass
-        
-    elif tts_provider == "ElevenLabs":
-        filename = f"tts_elevenlabs_{timestamp}.mp3"
-        filepath = audio_dir / filename
-        
-        audio_content = generate_elevenlabs_audio(
+def make_stream_player(container):
+    """Return an on_segment callback that shows each new segment as its own player"""
+    segment_count = 0
+
+    def on_segment(audio, sample_rate):
+        nonlocal segment_count
+        segment_count += 1
+        container.caption(f"🎧 Part {segment_count} ready")
+        container.audio(pcm16_wav_bytes(audio, sample_rate), format="audio/wav")
+
+    return on_segment
+
+def current_voice_settings():
+    """Snapshot the Kokoro/Chatterbox settings from session state for synthesize_to_file"""
+    return {
+        "kokoro_voice": st.session_state.get('kokoro_voice', 'af_heart'),
+        "kokoro_lang": st.session_state.get('kokoro_lang', 'a'),
+        "kokoro_backend": st.session_state.get('kokoro_backend'),
+        "chatterbox_exaggeration": st.session_state.get('chatterbox_exaggeration', 0.5),
+        "chatterbox_cfg_weight": st.session_state.get('chatterbox_cfg_weight', 0.5),
+        "chatterbox_temperature": st.session_state.get('chatterbox_temperature', 0.8),
+        "chatterbox_profile": st.session_state.get('chatterbox_profile'),
+    }
+
+def incremental_settings(tts_provider):
+    """Incremental-mode arguments for synthesize_to_file: reuse the unchanged sentences of the last generated text"""
+    if tts_provider not in ("Kokoro (local open model)", "Chatterbox (open-source)"):
+        return {}
+    if not st.session_state.get("incremental_mode", False):
+        return {}
+    return {"incremental": True, "previous_text": st.session_state.get("last_generated_text")}
+
+def constant_memory_enabled(tts_provider):
+    """Whether Chatterbox should render one token-budgeted chunk at a time"""
+    return tts_provider == "Chatterbox (open-source)" and st.session_state.get("constant_memory_mode", False)
+
+def show_generated_audio(filepath, metadata):
+    """Make a finished generation the one shown in the player"""
+    st.session_state.current_audio_file = str(filepath)
+    st.session_state.last_generation_stats = metadata.get("long_form")
+    st.session_state.last_incremental_stats = metadata.get("incremental")
+    # The version the next incremental Submit is diffed against
+    st.session_state.last_generated_text = metadata.get("text")
+    st.session_state.last_cache_hit = metadata.get("cache_hit", False)
+    st.session_state.last_time_to_first_audio = metadata.get("time_to_first_audio")
+    st.session_state.last_hedge = metadata.get("hedge")
+
+def save_audio_file(text, speed_setting, tts_provider, api_key=None, voice_id=None, model_id=None, voice_settings_override=None, audio_prompt_path=None, long_form=False, workers=None, on_segment=None, audio_prompt_bytes=None, audio_prompt_name=None):
+    """Save TTS audio to a file and return the filepath
+
+    on_segment(audio, sample_rate) is called with each segment of local-engine
+    audio as soon as it is synthesized, before the whole file is finished.
+    """
+    try:
+        filepath, metadata = synthesize_to_file(
             text,
-            api_key,
-            voice_id,
             speed_setting,
+            tts_provider,
+            api_key=api_key,
+            voice_id=voice_id,
             model_id=model_id,
             voice_settings_override=voice_settings_override,
+            audio_prompt_path=audio_prompt_path,
+            long_form=long_form,
+            workers=workers,
+            on_segment=on_segment,
+            audio_prompt_bytes=audio_prompt_bytes,
+            audio_prompt_name=audio_prompt_name,
+            constant_memory=constant_memory_enabled(tts_provider),
+            **current_voice_settings(),
+            **incremental_settings(tts_provider),
         )
-        if audio_content:
-            with open(filepath, 'wb') as f:
-                f.write(audio_content)
-        else:
-            return None, None
-    elif tts_provider == "Chatterbox (open-source)":
-        # Lazy import to avoid heavy import on non-Chatterbox paths
-        try:
-            import torch
-            import torchaudio as ta
-            from chatterbox.tts import ChatterboxTTS
-        except Exception as e:
-            st.error(f"Chatterbox not installed or failed to import: {e}")
-            return None, None
-
-        filename = f"tts_chatterbox_{timestamp}.wav"
-        filepath = audio_dir / filename
-
-        try:
-            # Determine best device
-            if torch.cuda.is_available():
-                device = "cuda"
-            elif torch.backends.mps.is_available():
-                device = "mps"
-            else:
-                device = "cpu"
+    except SynthesisError as e:
+        st.error(str(e))
+        return None, None
+    except SynthesisCancelled:
+        # The Stop button ended the system voice
+        st.info("Stopped TTS generation")
+        return None, None
 
-            # Load model (this might take time on first run)
-            model = ChatterboxTTS.from_pretrained(device=device)
-
-            # Get settings from session state
-            exaggeration = st.session_state.get('chatterbox_exaggeration', 0.5)
-            cfg_weight = st.session_state.get('chatterbox_cfg_weight', 0.5)
-            temperature = st.session_state.get('chatterbox_temperature', 0.8)
-            
-            # Generate audio
-            wav = model.generate(
-                text,
-                audio_prompt_path=audio_prompt_path,
-                exaggeration=exaggeration,
-                cfg_weight=cfg_weight,
-                temperature=temperature,
-                repetition_penalty=1.2,
-                min_p=0.05,
-                top_p=1.0,
-            )
-            
-            # Save audio file
-            ta.save(str(filepath), wav, model.sr)
-            
-        except Exception as e:
-            st.error(f"Chatterbox generation failed: {e}")
-            if filepath.exists():
-                try:
-                    filepath.unlink()
-                except Exception:
-                    pass
-            return None, None
-    else:  # Kokoro
-        # Lazy import to avoid heavy import on non-Kokoro paths
-        try:
-            from kokoro import KPipeline
-        except Exception as e:
-            st.error(f"Kokoro not installed or failed to import: {e}")
-            return None, None
-
-        filename = f"tts_kokoro_{timestamp}.wav"
-        filepath = audio_dir / filename
-
-        # Configure language and voice
-        kokoro_lang = st.session_state.get('kokoro_lang', 'a')
-        kokoro_voice = st.session_state.get('kokoro_voice', 'af_heart')
-
-        try:
-            pipeline = KPipeline(lang_code=kokoro_lang)
-            # Write 24kHz mono 16-bit PCM WAV as per Kokoro README
-            with wave.open(str(filepath.resolve()), "wb") as wav_file:
-                wav_file.setnchannels(1)
-                wav_file.setsampwidth(2)
-                wav_file.setframerate(24000)
-
-                for result in pipeline(text, voice=kokoro_voice, speed=speed_setting, split_pattern=r"\n+"):
-                    if result.audio is None:
-                        continue
-                    audio_bytes = (result.audio.numpy() * 32767).astype(np.int16).tobytes()
-                    wav_file.writeframes(audio_bytes)
-        except Exception as e:
-            st.error(f"Kokoro generation failed: {e}")
-            if filepath.exists():
-                try:
-                    filepath.unlink()
-                except Exception:
-                    pass
-            return None, None
-    
-    metadata = {
-        "filename": filename,
-        "text": text,
-        "title": generate_title_from_text(text),
-        "speed": speed_setting,
-        "provider": tts_provider,
-        "timestamp": timestamp,
-        "created": datetime.datetime.now().isoformat(),
-        "voice_id": voice_id if tts_provider == "ElevenLabs" else None,
-        "kokoro_voice": st.session_state.get('kokoro_voice') if tts_provider == "Kokoro (local open model)" else None,
-        "kokoro_lang": st.session_state.get('kokoro_lang') if tts_provider == "Kokoro (local open model)" else None,
-        "chatterbox_exaggeration": st.session_state.get('chatterbox_exaggeration') if tts_provider == "Chatterbox (open-source)" else None,
-        "chatterbox_cfg_weight": st.session_state.get('chatterbox_cfg_weight') if tts_provider == "Chatterbox (open-source)" else None,
-        "chatterbox_temperature": st.session_state.get('chatterbox_temperature') if tts_provider == "Chatterbox (open-source)" else None,
-        "audio_prompt_path": audio_prompt_path if tts_provider == "Chatterbox (open-source)" else None,
-    }
-    
-    metadata_file = audio_dir / "metadata.json"
-    if metadata_file.exists():
-        with open(metadata_file, 'r') as f:
-            all_metadata = json.load(f)
-    else:
-        all_metadata = []
-    
-    all_metadata.append(metadata)
-    
-    with open(metadata_file, 'w') as f:
-        json.dump(all_metadata, f, indent=2)
-    
     # Set as current audio file for the player
-    st.session_state.current_audio_file = str(filepath)
-    
+    show_generated_audio(filepath, metadata)
+
     return filepath, metadata
 
+def reference_upload():
+    """Return the Chatterbox reference clip upload as {audio_prompt_bytes, audio_prompt_name} (empty if none)
+
+    The bytes go straight to the voice conditioning cache, which only writes
+    them to disk the first time it sees a clip.
+    """
+    upload = st.session_state.get('chatterbox_audio_prompt_uploader')
+    if upload is None:
+        return {}
+    return {"audio_prompt_bytes": upload.getvalue(), "audio_prompt_name": upload.name}
+
+def synthesis_options(tts_provider):
+    """Snapshot the current settings for tts_provider as synthesize_to_file keyword arguments"""
+    elevenlabs_settings = st.session_state.get("elevenlabs_settings", {})
+    local_engine = tts_provider in ("Kokoro (local open model)", "Chatterbox (open-source)")
+    kwargs = {
+        "api_key": st.session_state.elevenlabs_api_key if tts_provider == "ElevenLabs" else None,
+        "voice_id": st.session_state.elevenlabs_voice_id if tts_provider == "ElevenLabs" else None,
+        "model_id": elevenlabs_settings.get("model_id") if tts_provider == "ElevenLabs" else None,
+        "voice_settings_override": elevenlabs_settings.get("voice_settings") if tts_provider == "ElevenLabs" else None,
+        "long_form": local_engine and st.session_state.get("long_form_mode", False),
+        "workers": st.session_state.get("long_form_workers"),
+        "constant_memory": constant_memory_enabled(tts_provider),
+    }
+    kwargs.update(current_voice_settings())
+    kwargs.update(incremental_settings(tts_provider))
+    if tts_provider == "Chatterbox (open-source)":
+        kwargs.update(reference_upload())
+    return kwargs
+
+def hedge_settings(tts_provider):
+    """Return (secondary provider, deadline seconds) when hedging is on for this Submit, else None"""
+    secondary = st.session_state.get("hedge_secondary")
+    if not st.session_state.get("hedge_mode", False) or not secondary or secondary == tts_provider:
+        return None
+    return secondary, st.session_state.get("hedge_deadline_ms", hedge_deadline() * 1000) / 1000
+
+def enqueue_synthesis_job(text, tts_provider):
+    """Queue a background job with a snapshot of the current settings; returns the Job"""
+    kwargs = synthesis_options(tts_provider)
+    hedge = hedge_settings(tts_provider)
+    secondary_kwargs = synthesis_options(hedge[0]) if hedge else None
+    speed_setting = st.session_state.speed_setting
+
+    # Runs on a worker thread: everything it needs is captured above, never read
+    # from st.session_state
+    def run(job):
+        if hedge:
+            return synthesize_hedged(text, speed_setting, tts_provider, hedge[0], deadline=hedge[1],
+                                     primary_options=kwargs, secondary_options=secondary_kwargs,
+                                     progress=job.report_progress)
+        return synthesize_to_file(text, speed_setting, tts_provider, progress=job.report_progress, **kwargs)
+
+    return get_job_manager().submit(
+        run,
+        owner=st.session_state.session_id,
+        description=f"{tts_provider}: {generate_title_from_text(text, max_length=40)}",
+    )
+
+def jobs_panel():
+    """List this session's background jobs with progress, cancel and play controls"""
+    manager = get_job_manager()
+    jobs = manager.jobs_for(st.session_state.session_id)[:10]
+    if not jobs:
+        return
+
+    st.markdown("### 🧵 Background Jobs")
+    status_icons = {"queued": "⏳", "running": "⚙️", "done": "✅", "failed": "❌", "cancelled": "🚫"}
+    for job in jobs:
+        col_info, col_action = st.columns([4, 1])
+        with col_info:
+            st.markdown(f"{status_icons.get(job.status, '•')} **#{job.id}** {job.description}")
+            if job.status == "running":
+                label = f"{job.done}/{job.total} segments" if job.total > 1 else "working..."
+                st.progress(job.fraction, text=label)
+            elif job.status == "failed":
+                st.caption(f"Error: {job.error}")
+        with col_action:
+            if job.active:
+                if st.button("✖️ Cancel", key=f"cancel_job_{job.id}", use_container_width=True):
+                    manager.cancel(job.id)
+                    st.rerun()
+            elif job.status == "done" and job.result:
+                if st.button("🎵 Play", key=f"play_job_{job.id}", use_container_width=True):
+                    filepath, metadata = job.result
+                    show_generated_audio(filepath, metadata)
+                    st.session_state.last_spoken_text = metadata["text"]
+                    st.rerun()
+
+    if manager.queue_depth():
+        st.caption(f"{manager.queue_depth()} job(s) waiting in the shared queue")
+
 st.title("🗣️ Text to Speech")
 
 # Navigation
-page = st.sidebar.selectbox("Choose a page", ["🎤 Text to Speech", "📚 Audio History"])
+page = st.sidebar.selectbox("Choose a page", ["🎤 Text to Speech", "📚 Audio History", "📈 Performance"])
 
 def main_tts_page():
     st.markdown("---")
@@ -390,8 +373,10 @@ def main_tts_page():
         st.session_state.elevenlabs_api_key = api_key
         
         if api_key:
+            refresh_voices = st.button("🔄 Refresh voices", key="refresh_elevenlabs_voices",
+                                       help="Fetch the voice list from ElevenLabs again")
             with st.spinner("Loading voices..."):
-                voices = get_elevenlabs_voices(api_key)
+                voices = get_elevenlabs_voices(api_key, force_refresh=refresh_voices)
             
             if voices:
                 selected_voice = st.selectbox(
@@ -401,6 +386,9 @@ def main_tts_page():
                 )
                 st.session_state.elevenlabs_voice_id = voices[selected_voice]
                 st.success(f"✅ Connected to ElevenLabs! Voice: {selected_voice}")
+                voices_age = get_voice_cache().age_seconds(api_key)
+                if voices_age is not None:
+                    st.caption(f"Voice list updated {int(voices_age // 60)} min ago")
 
                 # Advanced settings
                 st.markdown("#### 🎚️ Advanced Voice Settings (optional)")
@@ -460,80 +448,22 @@ def main_tts_page():
             return
         st.markdown("#### 🧠 Kokoro Configuration (Local, Open-Weight)")
 
-        # Define available voices for each language
-        kokoro_voices = {
-            "🇺🇸 American English (en-us)": {
-                "code": "a",
-                "female": ["af_alloy", "af_aoede", "af_bella", "af_heart", "af_jessica", "af_kore", "af_nicole", "af_nova", "af_river", "af_sarah", "af_sky"],
-                "male": ["am_adam", "am_echo", "am_eric", "am_fenrir", "am_liam", "am_michael", "am_onyx", "am_puck"]
-            },
-            "🇬🇧 British English (en-gb)": {
-                "code": "b",
-                "female": ["bf_alice", "bf_emma", "bf_isabella", "bf_lily"],
-                "male": ["bm_daniel", "bm_fable", "bm_george", "bm_lewis"]
-            },
-            "🇫🇷 French (fr-fr)": {
-                "code": "fr",
-                "female": ["ff_siwis"],
-                "male": []
-            },
-            "🇮🇹 Italian (it)": {
-                "code": "it",
-                "female": ["if_sara"],
-                "male": ["im_nicola"]
-            },
-            "🇯🇵 Japanese (ja)": {
-                "code": "ja",
-                "female": ["jf_alpha", "jf_gongitsune", "jf_nezumi", "jf_tebukuro"],
-                "male": ["jm_kumo"]
-            },
-            "🇨🇳 Chinese (cmn)": {
-                "code": "cmn",
-                "female": ["zf_xiaobei", "zf_xiaoni", "zf_xiaoxiao", "zf_xiaoyi", "zm_yunjian", "zm_yunxi", "zm_yunxia", "zm_yunyang"],
-                "male": []
-            }
-        }
-
         # Language selection
         selected_lang = st.selectbox(
             "🌍 Select Language:",
-            options=list(kokoro_voices.keys()),
+            options=list(KOKORO_VOICES.keys()),
             index=0,
             key="kokoro_lang_selector",
             help="Choose the language for text-to-speech generation"
         )
         
         # Update session state with language code
-        st.session_state.kokoro_lang = kokoro_voices[selected_lang]["code"]
+        st.session_state.kokoro_lang = KOKORO_VOICES[selected_lang]["code"]
         
         # Voice selection based on selected language
-        available_voices = kokoro_voices[selected_lang]
-        all_voices = []
-        voice_labels = []
-        
-        # Add female voices
-        if available_voices["female"]:
-            voice_labels.append("👩 Female Voices")
-            for voice in available_voices["female"]:
-                all_voices.append(voice)
-                voice_labels.append(f"  👩 {voice}")
-        
-        # Add male voices
-        if available_voices["male"]:
-            if available_voices["female"]:  # Only add separator if there are female voices
-                voice_labels.append("👨 Male Voices")
-            for voice in available_voices["male"]:
-                all_voices.append(voice)
-                voice_labels.append(f"  👨 {voice}")
-        
-        # Create a mapping from display labels to actual voice IDs
-        voice_mapping = {}
-        voice_index = 0
-        for i, label in enumerate(voice_labels):
-            if not label.startswith("  "):  # Skip category headers
-                continue
-            voice_mapping[label] = all_voices[voice_index]
-            voice_index += 1
+        available_voices = KOKORO_VOICES[selected_lang]
+        # Mapping from display labels to actual voice IDs (built once per language and process)
+        voice_mapping = dict(kokoro_voice_options(selected_lang))
         
         # Default voice selection
         current_voice = st.session_state.get('kokoro_voice', available_voices["female"][0] if available_voices["female"] else available_voices["male"][0])
@@ -563,6 +493,46 @@ def main_tts_page():
         else:
             st.warning(f"No voices available for {selected_lang}")
             st.session_state.kokoro_voice = "af_heart"  # fallback
+
+        backend_names = list(KOKORO_BACKENDS)
+        st.session_state.kokoro_backend = st.selectbox(
+            "🖥️ Inference engine:",
+            options=backend_names,
+            index=backend_names.index(st.session_state.kokoro_backend),
+            format_func=lambda name: KOKORO_BACKENDS[name],
+            key="kokoro_backend_selector",
+            help="ONNX Runtime runs the same model with less CPU per request; the model is exported to ONNX on first use (needs onnxruntime)"
+        )
+
+        g2p_stats = get_g2p_cache(ensure_audio_directory()).stats()
+        if g2p_stats["hits"] or g2p_stats["misses"]:
+            st.caption(
+                f"🔤 Phoneme cache: {g2p_stats['hit_rate']:.0%} hit rate "
+                f"({g2p_stats['hits']} hits, {g2p_stats['misses']} misses) • ~{g2p_stats['seconds_saved']:.1f}s of G2P saved"
+            )
+    elif tts_provider == "Chatterbox (open-source)":
+        st.markdown("#### 🎭 Chatterbox Configuration")
+        st.file_uploader(
+            "🎙️ Reference voice clip (optional):",
+            type=["wav", "mp3", "flac", "ogg", "m4a"],
+            key="chatterbox_audio_prompt_uploader",
+            help="Clone a voice from a few seconds of clean speech; leave empty for the default voice"
+        )
+        profile_names = list(PROFILES)
+        st.session_state.chatterbox_profile = st.selectbox(
+            "🖥️ Inference profile:",
+            options=profile_names,
+            index=profile_names.index(st.session_state.chatterbox_profile),
+            format_func=lambda name: PROFILES[name]["label"],
+            key="chatterbox_profile_selector",
+            help="On machines without a GPU, the CPU int8 profile quantizes the model for faster generation at a small cost in fidelity"
+        )
+        voice_stats = get_voice_conditioning_cache(ensure_audio_directory()).stats()
+        if voice_stats["hits"] or voice_stats["disk_hits"] or voice_stats["misses"]:
+            st.caption(
+                f"🧬 Cloned voices: {voice_stats['memory_entries']} in memory, {voice_stats['disk_entries']} on disk • "
+                f"{voice_stats['hit_rate']:.0%} of reference clips reused without re-encoding"
+            )
     
     st.markdown("### ⚡ Speed Control")
     speed_options = {
@@ -582,6 +552,75 @@ def main_tts_page():
 
     st.session_state.speed_setting = speed_options[selected_speed_label]
 
+    if tts_provider in ("Kokoro (local open model)", "Chatterbox (open-source)"):
+        st.checkbox(
+            "♻️ Incremental mode (re-render only edited sentences)",
+            value=False,
+            key="incremental_mode",
+            help="Renders sentence by sentence and keeps each sentence's audio; when you edit the text and "
+                 "submit again, unchanged sentences are reused and only the edited ones are synthesized"
+        )
+        if tts_provider == "Chatterbox (open-source)":
+            st.checkbox(
+                "🧮 Constant-memory mode (one chunk at a time)",
+                value=False,
+                key="constant_memory_mode",
+                help="Feeds Chatterbox short sentence chunks one after another with a fixed seed and appends each "
+                     "to the file as it finishes, so memory use does not grow with the length of the text"
+            )
+        long_form = st.checkbox(
+            "📜 Long-form mode (parallel sentence chunks)",
+            value=False,
+            key="long_form_mode",
+            help="Split long texts at sentence/paragraph boundaries and synthesize the chunks on several CPU cores"
+        )
+        if long_form:
+            max_workers = os.cpu_count() or 1
+            st.slider(
+                "Worker threads:",
+                1, max_workers, min(default_worker_count(), max_workers),
+                key="long_form_workers",
+                help="Number of chunks synthesized at the same time"
+            )
+        if (tts_provider == "Kokoro (local open model)" or long_form or st.session_state.get("incremental_mode", False)
+                or constant_memory_enabled(tts_provider)):
+            st.checkbox(
+                "🎧 Stream playback (play the first part while the rest is generated)",
+                value=False,
+                key="stream_playback",
+                help="Each part gets its own player as soon as it is synthesized; the full file is still saved at the end"
+            )
+
+    st.checkbox(
+        "🧵 Run in background",
+        value=False,
+        key="run_in_background",
+        help="Queue the request and keep using the page; progress and cancel controls appear below"
+    )
+
+    if st.checkbox(
+        "🛡️ Hedge with a backup provider",
+        value=False,
+        key="hedge_mode",
+        help="If this provider has not produced any audio by the deadline, the backup provider starts too; "
+             "the first finished result is kept and the other request is cancelled"
+    ):
+        col_backup, col_deadline = st.columns(2)
+        with col_backup:
+            st.selectbox(
+                "Backup provider:",
+                [provider for provider in PROVIDERS if provider != tts_provider],
+                key="hedge_secondary",
+                help="Its settings (voice, API key) are the ones last chosen for it on this page"
+            )
+        with col_deadline:
+            st.slider(
+                "Deadline (ms):",
+                100, 10000, int(min(max(hedge_deadline() * 1000, 100), 10000)), step=100,
+                key="hedge_deadline_ms",
+                help="How long to wait for the first audio before starting the backup"
+            )
+
     text_input = st.text_area(
         "Enter text to speak:",
         placeholder="Type your message here...\n\nThis is a larger text box where you can enter multiple lines of text.",
@@ -589,11 +628,50 @@ def main_tts_page():
         key="text_input"
     )
 
+    # Streamed parts appear here, full width, while generation is still running
+    stream_area = st.container()
+
     col1, col2, col3 = st.columns([1, 1, 1])
 
     with col1:
         if st.button("🎤 Submit", type="primary"):
-            if text_input.strip():
+            # Streaming applies to the local engines that produce audio segment by segment
+            streaming = st.session_state.get("stream_playback", False) and (
+                tts_provider == "Kokoro (local open model)"
+                or (tts_provider == "Chatterbox (open-source)" and (
+                    st.session_state.get("long_form_mode", False) or st.session_state.get("incremental_mode", False)
+                    or constant_memory_enabled(tts_provider)
+                ))
+            )
+            if text_input.strip() and st.session_state.get("run_in_background", False):
+                if tts_provider == "ElevenLabs" and not st.session_state.elevenlabs_api_key:
+                    st.error("Please enter your ElevenLabs API key first!")
+                    return
+                try:
+                    job = enqueue_synthesis_job(text_input, tts_provider)
+                    st.toast(f"Queued job #{job.id}")
+                except JobQueueFull as e:
+                    st.error(str(e))
+            elif text_input.strip() and hedge_settings(tts_provider):
+                secondary, deadline = hedge_settings(tts_provider)
+                if "ElevenLabs" in (tts_provider, secondary) and not st.session_state.elevenlabs_api_key:
+                    st.error("Please enter your ElevenLabs API key first!")
+                    return
+                with st.spinner(f"Generating with {tts_provider} (backup: {secondary} after {deadline:.1f}s)..."):
+                    try:
+                        filepath, metadata = synthesize_hedged(
+                            text_input, st.session_state.speed_setting, tts_provider, secondary, deadline=deadline,
+                            primary_options=synthesis_options(tts_provider),
+                            secondary_options=synthesis_options(secondary),
+                        )
+                    except SynthesisError as e:
+                        st.error(str(e))
+                        return
+                show_generated_audio(filepath, metadata)
+                st.session_state.last_spoken_text = text_input
+                st.info(f"💾 Audio saved as: {metadata['filename']}")
+                st.rerun()
+            elif text_input.strip():
                 if tts_provider == "Mac (say command)":
                     base_rate = 150
                     adjusted_rate = int(base_rate * st.session_state.speed_setting)
@@ -644,22 +722,15 @@ def main_tts_page():
                     else:
                         st.error("Failed to generate audio with ElevenLabs. Check your API key and quota.")
                 elif tts_provider == "Chatterbox (open-source)":
-                    # Get the audio prompt path from the current upload
-                    chatterbox_audio_path = None
-                    if 'chatterbox_audio_prompt_uploader' in st.session_state and st.session_state.chatterbox_audio_prompt_uploader is not None:
-                        temp_dir = Path("temp_audio")
-                        temp_dir.mkdir(exist_ok=True)
-                        temp_audio_path = temp_dir / f"temp_{st.session_state.chatterbox_audio_prompt_uploader.name}"
-                        with open(temp_audio_path, "wb") as f:
-                            f.write(st.session_state.chatterbox_audio_prompt_uploader.getvalue())
-                        chatterbox_audio_path = str(temp_audio_path)
-                    
                     with st.spinner("Generating audio with Chatterbox (first run may take longer)..."):
                         filepath, metadata = save_audio_file(
                             text_input,
                             st.session_state.speed_setting,
                             tts_provider,
-                            audio_prompt_path=chatterbox_audio_path,
+                            **reference_upload(),
+                            long_form=st.session_state.get("long_form_mode", False),
+                            workers=st.session_state.get("long_form_workers"),
+                            on_segment=make_stream_player(stream_area) if streaming else None,
                         )
 
                     if filepath and metadata:
@@ -667,7 +738,9 @@ def main_tts_page():
                         st.session_state.is_speaking = False
                         st.success(f"Generated Chatterbox audio with exaggeration={st.session_state.chatterbox_exaggeration}")
                         st.info(f"💾 Audio saved as: {metadata['filename']}")
-                        st.rerun()
+                        # A rerun would cut off a streamed part that is still playing
+                        if not streaming:
+                            st.rerun()
                     else:
                         st.error("Failed to generate audio with Chatterbox. Check logs and ensure model can be downloaded.")
                 elif tts_provider == "Kokoro (local open model)":
@@ -676,6 +749,9 @@ def main_tts_page():
                             text_input,
                             st.session_state.speed_setting,
                             tts_provider,
+                            long_form=st.session_state.get("long_form_mode", False),
+                            workers=st.session_state.get("long_form_workers"),
+                            on_segment=make_stream_player(stream_area) if streaming else None,
                         )
 
                     if filepath and metadata:
@@ -683,7 +759,9 @@ def main_tts_page():
                         st.session_state.is_speaking = False
                         st.success(f"Generated Kokoro audio at {st.session_state.speed_setting}x speed")
                         st.info(f"💾 Audio saved as: {metadata['filename']}")
-                        st.rerun()
+                        # A rerun would cut off a streamed part that is still playing
+                        if not streaming:
+                            st.rerun()
                     else:
                         st.error("Failed to generate audio with Kokoro. Check logs and internet for first-time weights download.")
                 
@@ -693,7 +771,11 @@ def main_tts_page():
     with col2:
         if st.button("⏹️ Stop TTS"):
             if tts_provider == "Mac (say command)":
-                os.system("killall say")
+                stop_system_voices()
+            # Cancel this session's queued and running background jobs
+            manager = get_job_manager()
+            for job in manager.jobs_for(st.session_state.session_id):
+                manager.cancel(job.id)
             st.session_state.is_speaking = False
             st.session_state.last_spoken_text = ""
             st.info("Stopped TTS generation")
@@ -705,11 +787,11 @@ def main_tts_page():
 
     if st.session_state.is_speaking:
         if tts_provider == "Mac (say command)":
-            result = os.system("pgrep say > /dev/null 2>&1")
+            speaking = system_voice_running()
         else:
-            result = os.system("pgrep afplay > /dev/null 2>&1")
+            speaking = os.system("pgrep afplay > /dev/null 2>&1") == 0
         
-        if result != 0:
+        if not speaking:
             st.session_state.is_speaking = False
             st.session_state.last_spoken_text = ""
 
@@ -724,10 +806,39 @@ def main_tts_page():
         time.sleep(2)
         st.rerun()
     
+    jobs_panel()
+
     # Show audio player and transcript immediately after any audio file is generated
     if st.session_state.current_audio_file:
         audio_player_controls()
 
+        if st.session_state.last_cache_hit:
+            st.caption("♻️ Reused previously generated audio for an identical request")
+        if st.session_state.last_time_to_first_audio is not None:
+            st.caption(f"⏱️ Time to first audio: {st.session_state.last_time_to_first_audio:.2f}s")
+        hedge = st.session_state.get("last_hedge")
+        if hedge and hedge.get("hedged"):
+            st.caption(f"🛡️ Served by {hedge['served_by']} — {hedge['primary']} had no audio after "
+                       f"{hedge['deadline_seconds']:.1f}s, so {hedge['secondary']} was started")
+
+        incremental = st.session_state.get("last_incremental_stats")
+        if incremental:
+            previous = incremental.get("previous")
+            changed = (f" • {previous['changed'] + previous['inserted']} changed or new since the previous version"
+                       if previous else "")
+            st.caption(f"♻️ Incremental: reused {incremental['reused']} of {incremental['segments']} sentences, "
+                       f"regenerated {incremental['regenerated']}{changed}")
+
+        stats = st.session_state.last_generation_stats
+        if stats:
+            layout = (f"🧮 Constant memory: {stats['chunks']} chunks of ≤{stats['max_tokens']} tokens, one at a time"
+                      if stats.get("max_tokens") else f"📜 Long-form: {stats['chunks']} chunks on {stats['workers']} workers")
+            st.caption(
+                f"{layout} • "
+                f"{stats['audio_seconds']:.1f}s audio in {stats['synthesis_seconds']:.1f}s • "
+                f"RTF {stats['rtf']}"
+            )
+
         # Pretty transcript under the player
         if st.session_state.last_spoken_text:
             st.markdown("### 📝 Text read")
@@ -751,7 +862,7 @@ def main_tts_page():
     9. **Click Stop** to interrupt the speech at any time
 
     **TTS Providers:**
-    - **Mac (say command)**: Free, built-in macOS voices, works offline
+    - **Mac (say command)**: Free, built-in macOS voices (espeak-ng on Linux), works offline
     - **ElevenLabs**: Premium AI voices, requires API key, online connection needed
     - **Kokoro (local, open-weight)**: Free, runs entirely on your machine, no API key, high‑quality neural TTS
     - **Chatterbox (open-source)**: State-of-the-art TTS with emotion control and voice cloning, runs locally, watermarked outputs
@@ -764,67 +875,249 @@ def main_tts_page():
     - **2.0x**: Very fast, for quick playback
     """)
 
-def generate_title_from_text(text, max_length=50):
-    """Generate a meaningful title from the text"""
-    # Remove extra whitespace and normalize
-    clean_text = ' '.join(text.strip().split())
-    
-    # If text is short enough, use it as title
-    if len(clean_text) <= max_length:
-        return clean_text
-    
-    # Try to find a good breaking point (sentence end, comma, etc.)
-    sentences = clean_text.split('.')
-    if len(sentences) > 1 and len(sentences[0]) <= max_length:
-        return sentences[0].strip() + '.'
-    
-    # Try breaking at comma
-    parts = clean_text.split(',')
-    if len(parts) > 1 and len(parts[0]) <= max_length:
-        return parts[0].strip() + '...'
-    
-    # Try breaking at natural word boundaries
-    words = clean_text.split()
-    title_words = []
-    current_length = 0
-    
-    for word in words:
-        if current_length + len(word) + 1 > max_length - 3:  # Leave space for "..."
-            break
-        title_words.append(word)
-        current_length += len(word) + 1
-    
-    if title_words:
-        return ' '.join(title_words) + '...'
+    # Keep job progress current while any of this session's jobs is still running
+    if any(job.active for job in get_job_manager().jobs_for(st.session_state.session_id)):
+        time.sleep(1)
+        st.rerun()
+
+# Display order of the stages recorded by perf_metrics
+STAGE_ORDER = [
+    "import", "model_load", "cache_lookup", "voice_conditioning", "g2p", "inference", "network",
+    "post_processing", "encoding", "disk_write", "cache_store", "other", "total", "encode (background)",
+]
+
+def startup_report():
+    """Start-up timings of this server process (see startup.py)"""
+    import numpy as np
+    import pandas as pd
+
+    startup = get_startup_stats().snapshot()
+    st.markdown("#### 🚀 Startup")
+    summary = [f"Mode: {startup['mode']} ({STARTUP_MODES[startup['mode']].lower()})"]
+    if startup["app_import_seconds"] is not None:
+        summary.append(f"app import {startup['app_import_seconds'] * 1000:.0f} ms")
+    if startup["reruns"]:
+        reruns = np.asarray(startup["reruns"]) * 1000
+        summary.append(f"script rerun p50 {np.percentile(reruns, 50):.0f} ms / p95 {np.percentile(reruns, 95):.0f} ms "
+                       f"over {len(reruns)} runs")
+    st.caption(" • ".join(summary))
+
+    if startup["preload"] == "off":
+        st.caption("No background preload. Set TTS_STARTUP_MODE=preload or TTS_PRELOAD_ENGINES to load engines at launch.")
     else:
-        # Fallback: just truncate
-        return clean_text[:max_length-3] + '...'
+        status = "running…" if startup["preload"] == "running" else f"done in {startup['preload_seconds']:.1f} s"
+        st.caption(f"Background preload {status}")
+        rows = [{"Preloaded": name, "Kind": "import", "Seconds": round(seconds, 2)}
+                for name, seconds in startup["modules"].items()]
+        rows += [{"Preloaded": name, "Kind": "engine", "Seconds": round(seconds, 2)}
+                 for name, seconds in startup["engines"].items()]
+        if rows:
+            st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        for name, error in startup["failed_modules"].items():
+            st.caption(f"⚠️ Could not import {name}: {error}")
+
+    if startup["first_requests"]:
+        st.dataframe(pd.DataFrame([
+            {
+                "Provider": provider,
+                "First request s": round(first["seconds"], 2),
+                "Import s": round(first["import_seconds"], 2),
+                "Model load s": round(first["model_load_seconds"], 2),
+                "At (s after launch)": first["since_launch"],
+                "Preload": first["preload"],
+            }
+            for provider, first in startup["first_requests"].items()
+        ]), hide_index=True, use_container_width=True)
+    else:
+        st.caption("No uncached request has run in this server process yet.")
+
+def performance_page():
+    st.markdown("---")
+    st.markdown("### 📈 Performance")
+
+    import numpy as np
+    import pandas as pd
+
+    startup_report()
+    for batcher in batching_stats():
+        st.caption(f"🧺 Kokoro batching: {batcher['items']} forward passes in {batcher['batches']} batches "
+                   f"(mean {batcher['mean_batch_size']}, largest {batcher['largest_batch']} of "
+                   f"{batcher['max_batch_size']}), {batcher['mean_queue_ms']} ms mean wait for a batch")
+    hedging = hedge_stats()
+    if hedging["requests"]:
+        st.caption(f"🛡️ Hedging: {hedging['requests']} hedged requests, backup started for {hedging['hedged']} "
+                   f"({hedging['failovers']} after a failure), backup served {hedging['served_by_secondary']}, "
+                   f"{hedging['failures']} failed")
+    st.markdown("#### ⏱️ Requests")
+
+    window_options = {"Last 100 requests": 100, "Last 500 requests": 500, "Last 2000 requests": 2000, "All": None}
+    col1, col2 = st.columns(2)
+    with col1:
+        window = window_options[st.selectbox("Window:", list(window_options), key="performance_window")]
+    with col2:
+        include_cache_hits = st.checkbox("Include cache hits", value=False, key="performance_cache_hits",
+                                         help="Cache hits skip synthesis and would pull every percentile down")
+
+    entries = [
+        entry for entry in get_history_store(ensure_audio_directory()).list_entries(limit=window)
+        if entry.get("timings") and (include_cache_hits or not entry.get("cache_hit"))
+    ]
+    if not entries:
+        st.info("No timed requests yet. Timings are recorded for every new generation.")
+        return
+
+    samples = {}  # (provider, stage) -> seconds
+    for entry in entries:
+        stages = dict(entry["timings"])
+        if entry.get("encode_seconds") is not None:
+            stages["encode (background)"] = entry["encode_seconds"]
+        for stage_name, seconds in stages.items():
+            samples.setdefault((entry.get("provider", "Unknown"), stage_name), []).append(seconds)
+
+    rows = []
+    for (provider, stage_name), values in samples.items():
+        values = np.asarray(values) * 1000
+        rows.append({
+            "Provider": provider,
+            "Stage": stage_name,
+            "Requests": len(values),
+            "p50 ms": round(float(np.percentile(values, 50)), 1),
+            "p90 ms": round(float(np.percentile(values, 90)), 1),
+            "p99 ms": round(float(np.percentile(values, 99)), 1),
+            "Mean ms": round(float(values.mean()), 1),
+        })
+    order = {name: i for i, name in enumerate(STAGE_ORDER)}
+    table = pd.DataFrame(rows)
+    table["order"] = table["Stage"].map(lambda name: order.get(name, len(order)))
+    table = table.sort_values(["Provider", "order"]).drop(columns="order")
+
+    st.caption(f"{len(entries)} requests • stages nest, so each request's stages add up to its total")
+    for provider in table["Provider"].unique():
+        provider_table = table[table["Provider"] == provider]
+        st.markdown(f"#### {provider}")
+        st.dataframe(provider_table.drop(columns="Provider"), hide_index=True, use_container_width=True)
+        # Where the median request spends its time (excluding the total itself)
+        breakdown = provider_table[~provider_table["Stage"].isin(["total", "encode (background)"])]
+        st.bar_chart(breakdown.set_index("Stage")["p50 ms"])
+
+    if metrics_url:
+        st.caption(f"📡 Live metrics for this server process in Prometheus format: {metrics_url}")
 
 def audio_history_page():
     st.markdown("---")
     st.markdown("### 📚 Audio History")
     
-    audio_dir = Path("saved_audio")
-    metadata_file = audio_dir / "metadata.json"
-    
-    if not metadata_file.exists():
+    audio_dir = ensure_audio_directory()
+    history_store = get_history_store(audio_dir)
+
+    total_entries = history_store.count()
+    if total_entries == 0:
         st.info("No audio files saved yet. Go back to the Text to Speech page to create some!")
         return
-    
-    with open(metadata_file, 'r') as f:
-        all_metadata = json.load(f)
-    
-    if not all_metadata:
-        st.info("No audio files found.")
-        return
-    
-    # Sort by timestamp (newest first)
-    all_metadata.sort(key=lambda x: x['timestamp'], reverse=True)
-    
-    st.markdown(f"**Total saved audio files: {len(all_metadata)}**")
+
+    st.markdown(f"**Total saved audio files: {total_entries}**")
+    synthesis_cache = get_synthesis_cache(audio_dir)
+    cache_stats = synthesis_cache.stats()
+    st.caption(
+        f"♻️ Synthesis cache: {cache_stats['hits']} hits • {cache_stats['misses']} misses "
+        f"({cache_stats['hit_rate']:.0%} hit rate) • {cache_stats['entries']} entries, {cache_stats['size_mb']} MB"
+    )
+    encoder = get_audio_encoder(audio_dir)
+    if encoder is not None:
+        encoder_stats = encoder.stats()
+        saved_mb = (encoder_stats['bytes_before'] - encoder_stats['bytes_after']) / (1024 * 1024)
+        st.caption(
+            f"🗜️ Storage: {encoder_stats['format'].upper()} • {encoder_stats['encoded']} files encoded since start "
+            f"({saved_mb:.1f} MB saved) • {encoder_stats['pending']} pending"
+        )
+
+    # Words are looked up in the full-text index and filters in indexed columns,
+    # so only the matching page is ever loaded
+    search_query = st.text_input(
+        "🔎 Search titles and text:",
+        key="history_search",
+        placeholder="e.g. quarterly report",
+        help="Entries containing every word; the last word also matches longer words it starts"
+    )
+    filter_values = history_store.filter_values()
+    any_value = "Any"
+    with st.expander("🎛️ Filters", expanded=False):
+        col_provider, col_voice, col_lang, col_speed = st.columns(4)
+        with col_provider:
+            provider_filter = st.selectbox("Provider:", [any_value] + filter_values["provider"], key="history_filter_provider")
+        with col_voice:
+            voice_filter = st.selectbox("Voice:", [any_value] + filter_values["voice"], key="history_filter_voice")
+        with col_lang:
+            lang_filter = st.selectbox(
+                "Language:",
+                [any_value] + filter_values["lang"],
+                format_func=lambda code: code if code == any_value else KOKORO_LANGUAGE_NAMES.get(code, code),
+                key="history_filter_lang",
+            )
+        with col_speed:
+            speed_filter = st.selectbox(
+                "Speed:",
+                [any_value] + filter_values["speed"],
+                format_func=lambda speed: speed if speed == any_value else f"{speed}x",
+                key="history_filter_speed",
+            )
+        date_range = st.date_input("Created between:", value=(), key="history_filter_dates")
+    filters = {
+        "provider": None if provider_filter == any_value else provider_filter,
+        "voice": None if voice_filter == any_value else voice_filter,
+        "lang": None if lang_filter == any_value else lang_filter,
+        "speed": None if speed_filter == any_value else speed_filter,
+        # A range still being picked has only its first date
+        "created_from": date_range[0] if len(date_range) > 0 else None,
+        "created_to": date_range[1] if len(date_range) > 1 else None,
+    }
+    searching = bool(search_query.strip()) or any(value is not None for value in filters.values())
+
+    search_start = time.perf_counter()
+    match_count = history_store.count_matches(search_query, **filters) if searching else total_entries
+
+    # Sorting and paging happen in SQL; only the current page is loaded
+    sort_options = {
+        "🕒 Newest first": ("created", True),
+        "🕒 Oldest first": ("created", False),
+        "🔤 Title (A–Z)": ("title", False),
+        "🎙️ Provider": ("provider", False),
+        "⚡ Speed (fastest first)": ("speed", True),
+        "🎯 Best match": ("relevance", True),
+    }
+    col_sort, col_size, col_page = st.columns([2, 1, 1])
+    with col_sort:
+        sort_label = st.selectbox("Sort by:", options=list(sort_options.keys()), key="history_sort")
+    with col_size:
+        page_size = st.selectbox("Per page:", options=[10, 25, 50, 100], index=0, key="history_page_size")
+    page_count = max(1, -(-match_count // page_size))
+    # Keep the page number valid after deletes or a larger page size
+    if st.session_state.get("history_page", 1) > page_count:
+        st.session_state.history_page = page_count
+    with col_page:
+        page_number = st.number_input("Page:", min_value=1, max_value=page_count, value=1, step=1, key="history_page")
+
+    sort_by, descending = sort_options[sort_label]
+    offset = (page_number - 1) * page_size
+    if searching:
+        all_metadata = history_store.search(
+            search_query, limit=page_size, offset=offset, sort_by=sort_by, descending=descending, **filters
+        )
+        st.caption(f"🔎 {match_count} of {total_entries} entries match "
+                   f"({(time.perf_counter() - search_start) * 1000:.0f} ms)")
+        if match_count == 0:
+            st.info("No saved audio matches this search.")
+            return
+    else:
+        all_metadata = history_store.list_entries(
+            limit=page_size, offset=offset, sort_by="created" if sort_by == "relevance" else sort_by,
+            descending=descending,
+        )
+    st.caption(f"Showing {offset + 1}–{offset + len(all_metadata)} of {match_count} (page {page_number} of {page_count})")
     st.markdown("---")
     
-    for i, metadata in enumerate(all_metadata):
+    for metadata in all_metadata:
+        entry_id = metadata['id']
         # Use saved title if available, otherwise generate one (backward compatibility)
         title = metadata.get('title') or generate_title_from_text(metadata['text'])
         
@@ -841,19 +1134,23 @@ def audio_history_page():
         # Create expander with title
         with st.expander(f"{icon} {title}", expanded=False):
             # Check if file exists
-            filepath = audio_dir / metadata['filename']
+            filepath = resolve_audio_path(audio_dir / metadata['filename'])
             if not filepath.exists():
                 st.error("❌ Audio file not found")
                 continue
             
-            # Audio player section
+            # Audio player section; the file is only read once the user asks for it,
+            # so collapsed entries on the page cost no disk reads
             st.markdown("#### 🎵 Audio Player")
-            try:
-                with open(filepath, 'rb') as audio_file:
-                    audio_bytes = audio_file.read()
-                st.audio(audio_bytes, format='audio/wav' if filepath.suffix == '.wav' else 'audio/mpeg')
-            except Exception as e:
-                st.error(f"Error loading audio: {e}")
+            load_audio = st.toggle(
+                f"▶️ Load audio ({filepath.stat().st_size / (1024 * 1024):.1f} MB)",
+                key=f"load_audio_{entry_id}",
+            )
+            if load_audio:
+                try:
+                    st.audio(str(filepath), format=audio_mime_type(filepath))
+                except Exception as e:
+                    st.error(f"Error loading audio: {e}")
             
             # Metadata section
             col1, col2 = st.columns([2, 1])
@@ -861,7 +1158,7 @@ def audio_history_page():
             with col1:
                 st.markdown("#### 📝 Details")
                 st.markdown(f"**Full Text:**")
-                st.text_area("", metadata['text'], height=100, key=f"text_display_{i}", disabled=True)
+                st.text_area("", metadata['text'], height=100, key=f"text_display_{entry_id}", disabled=True)
                 
                 st.markdown(f"**Speed:** {metadata['speed']}x")
                 st.markdown(f"**Provider:** {provider}")
@@ -873,22 +1170,23 @@ def audio_history_page():
                 if metadata.get('kokoro_voice'):
                     st.markdown(f"**Kokoro Voice:** {metadata['kokoro_voice']}")
                     if metadata.get('kokoro_lang'):
-                        lang_names = {
-                            'a': 'American English',
-                            'b': 'British English', 
-                            'fr': 'French',
-                            'it': 'Italian',
-                            'ja': 'Japanese',
-                            'cmn': 'Chinese'
-                        }
-                        lang_name = lang_names.get(metadata['kokoro_lang'], metadata['kokoro_lang'])
+                        lang_name = KOKORO_LANGUAGE_NAMES.get(metadata['kokoro_lang'], metadata['kokoro_lang'])
                         st.markdown(f"**Language:** {lang_name}")
+                    if metadata.get('kokoro_backend'):
+                        st.markdown(f"**Engine:** {KOKORO_BACKENDS.get(metadata['kokoro_backend'], metadata['kokoro_backend'])}")
                 
                 if metadata.get('chatterbox_exaggeration'):
                     st.markdown(f"**Chatterbox Exaggeration:** {metadata['chatterbox_exaggeration']}")
                     st.markdown(f"**CFG Weight:** {metadata.get('chatterbox_cfg_weight', 'N/A')}")
                     st.markdown(f"**Temperature:** {metadata.get('chatterbox_temperature', 'N/A')}")
+                    if metadata.get('chatterbox_profile'):
+                        st.markdown(f"**Inference Profile:** {metadata['chatterbox_profile']}")
                 
+                if metadata.get('incremental'):
+                    incremental = metadata['incremental']
+                    st.markdown(f"**Segments:** {incremental['reused']} reused / {incremental['regenerated']} regenerated "
+                                f"of {incremental['segments']}")
+
                 st.markdown(f"**Created:** {datetime.datetime.fromisoformat(metadata['created']).strftime('%Y-%m-%d %H:%M:%S')}")
             
             with col2:
@@ -896,46 +1194,47 @@ def audio_history_page():
                 
                 # Download button
                 try:
-                    if metadata['filename'].endswith('.aiff'):
-                        mime_type = "audio/aiff"
-                    elif metadata['filename'].endswith('.mp3'):
-                        mime_type = "audio/mpeg"
-                    elif metadata['filename'].endswith('.wav'):
-                        mime_type = "audio/wav"
+                    mime_type = audio_mime_type(filepath)
+
+                    if load_audio:
+                        # st.download_button reads the whole file into its media store, so
+                        # only entries the user has loaded get their bytes buffered
+                        with open(filepath, 'rb') as audio_file:
+                            st.download_button(
+                                label="⬇️ Download Audio",
+                                data=audio_file,
+                                file_name=filepath.name,
+                                mime=mime_type,
+                                key=f"download_{entry_id}",
+                                use_container_width=True
+                            )
                     else:
-                        mime_type = "audio/mpeg"
-                    
-                    st.download_button(
-                        label="⬇️ Download Audio",
-                        data=audio_bytes,
-                        file_name=metadata['filename'],
-                        mime=mime_type,
-                        key=f"download_{i}",
-                        use_container_width=True
-                    )
+                        st.caption("Load the audio to enable download")
                 except:
                     st.error("Download not available")
                 
                 # Delete button
-                if st.button(f"🗑️ Delete Audio", key=f"delete_{i}", use_container_width=True, type="secondary"):
+                if st.button(f"🗑️ Delete Audio", key=f"delete_{entry_id}", use_container_width=True, type="secondary"):
                     # Confirm deletion
-                    if f"confirm_delete_{i}" not in st.session_state:
-                        st.session_state[f"confirm_delete_{i}"] = False
+                    if f"confirm_delete_{entry_id}" not in st.session_state:
+                        st.session_state[f"confirm_delete_{entry_id}"] = False
                     
-                    if not st.session_state[f"confirm_delete_{i}"]:
-                        st.session_state[f"confirm_delete_{i}"] = True
+                    if not st.session_state[f"confirm_delete_{entry_id}"]:
+                        st.session_state[f"confirm_delete_{entry_id}"] = True
                         st.warning("⚠️ Click delete again to confirm!")
                         st.rerun()
                     else:
-                        # Actually delete
-                        if filepath.exists():
-                            filepath.unlink()
-                        all_metadata.remove(metadata)
-                        with open(metadata_file, 'w') as f:
-                            json.dump(all_metadata, f, indent=2)
+                        # Actually delete; cache hits share a file between entries,
+                        # so only remove it once no other entry refers to it
+                        history_store.delete(metadata['id'])
+                        if history_store.count_filename_refs(metadata['filename']) == 0:
+                            if filepath.exists():
+                                filepath.unlink()
+                            synthesis_cache.forget_file(metadata['filename'])
+                            synthesis_cache.forget_file(filepath.name)
                         st.success("✅ Audio file deleted!")
                         # Clear confirmation state
-                        del st.session_state[f"confirm_delete_{i}"]
+                        del st.session_state[f"confirm_delete_{entry_id}"]
                         st.rerun()
             
             st.markdown("---")
@@ -943,4 +1242,8 @@ def audio_history_page():
 if page == "🎤 Text to Speech":
     main_tts_page()
 elif page == "📚 Audio History":
-    audio_history_page()
\ No newline at end of file
+    audio_history_page()
+elif page == "📈 Performance":
+    performance_page()
+
+get_startup_stats().note_rerun(time.perf_counter() - script_start)
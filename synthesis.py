@@ -0,0 +1,523 @@
+"""Provider synthesis logic, independent of Streamlit.
+
+synthesize_to_file() renders text with one of the four providers, writes the
+audio to saved_audio/, records the history entry and returns
+(filepath, metadata). It never touches st.session_state, so it can run on
+job worker threads and from the command line as well as from the UI; the
+Streamlit app passes the current widget settings in explicitly.
+"""
+import datetime
+import importlib
+import os
+import time
+from pathlib import Path
+
+from audio_processing import post_processing_cache_params
+from audio_storage import audio_duration_seconds, codec_for_path, get_audio_encoder, resolve_audio_path
+from batching import install_batching
+from cancellation import SynthesisCancelled, check_cancelled, current_stop_check
+from elevenlabs_client import stream_speech_to_file
+from engine_registry import (
+    CHATTERBOX_PROVIDER,
+    KOKORO_ONNX_ENGINE,
+    KOKORO_PROVIDER,
+    chatterbox_engine_args,
+    get_engine_registry,
+)
+from g2p_cache import get_g2p_cache, install_g2p_cache
+from history_store import get_history_store, new_entry_id
+from incremental import synthesize_incremental
+from inference_profiles import chatterbox_profile as resolve_chatterbox_profile, profile_is_quantized
+from long_form import (
+    chatterbox_chunk_tokens,
+    chatterbox_seed,
+    chatterbox_token_counter,
+    make_chatterbox_chunk_synth,
+    make_kokoro_chunk_synth,
+    synthesize_long_form,
+    synthesize_sequential,
+    write_chunks_to_wav,
+)
+from onnx_kokoro import kokoro_backend as resolve_kokoro_backend
+from perf_metrics import current_timings, get_metrics, records_stage_timings, stage
+from segment_cache import get_segment_cache
+from startup import get_startup_stats
+from synthesis_cache import get_synthesis_cache, synthesis_cache_key
+from system_voice import SystemVoiceError, SystemVoiceStream, system_voice_engine, system_voice_name
+from voice_conditioning import get_voice_conditioning_cache, reference_audio_key, using_conditionals
+
+MAC_PROVIDER = "Mac (say command)"
+ELEVENLABS_PROVIDER = "ElevenLabs"
+PROVIDERS = [MAC_PROVIDER, ELEVENLABS_PROVIDER, KOKORO_PROVIDER, CHATTERBOX_PROVIDER]
+
+DEFAULT_AUDIO_DIR = "saved_audio"
+
+
+class SynthesisError(Exception):
+    """Synthesis failed; the message is suitable for showing to the user"""
+
+
+def ensure_audio_directory(audio_dir=DEFAULT_AUDIO_DIR):
+    audio_dir = Path(audio_dir)
+    audio_dir.mkdir(exist_ok=True)
+    return audio_dir
+
+
+def generate_title_from_text(text, max_length=50):
+    """Generate a meaningful title from the text"""
+    # Remove extra whitespace and normalize
+    clean_text = ' '.join(text.strip().split())
+
+    # If text is short enough, use it as title
+    if len(clean_text) <= max_length:
+        return clean_text
+
+    # Try to find a good breaking point (sentence end, comma, etc.)
+    sentences = clean_text.split('.')
+    if len(sentences) > 1 and len(sentences[0]) <= max_length:
+        return sentences[0].strip() + '.'
+
+    # Try breaking at comma
+    parts = clean_text.split(',')
+    if len(parts) > 1 and len(parts[0]) <= max_length:
+        return parts[0].strip() + '...'
+
+    # Try breaking at natural word boundaries
+    words = clean_text.split()
+    title_words = []
+    current_length = 0
+
+    for word in words:
+        if current_length + len(word) + 1 > max_length - 3:  # Leave space for "..."
+            break
+        title_words.append(word)
+        current_length += len(word) + 1
+
+    if title_words:
+        return ' '.join(title_words) + '...'
+    else:
+        # Fallback: just truncate
+        return clean_text[:max_length-3] + '...'
+
+
+def synthesis_cache_params(tts_provider, speed_setting, voice_id=None, model_id=None, voice_settings_override=None,
+                           audio_prompt_sha256=None, long_form=False, kokoro_voice='af_heart', kokoro_lang='a',
+                           chatterbox_exaggeration=0.5, chatterbox_cfg_weight=0.5, chatterbox_temperature=0.8,
+                           chatterbox_profile=None, kokoro_backend=None, incremental=False, constant_memory=False):
+    """Collect every setting that changes the generated audio, for the synthesis cache key"""
+    params = {"speed": speed_setting}
+    if tts_provider == MAC_PROVIDER:
+        # say and espeak-ng (and their voices) sound nothing alike
+        params.update({
+            "engine": os.environ.get("TTS_SYSTEM_VOICE_ENGINE", "auto").strip().lower() or "auto",
+            "voice": system_voice_name(),
+        })
+    elif tts_provider == ELEVENLABS_PROVIDER:
+        params.update({
+            "voice_id": voice_id,
+            "model_id": model_id or "eleven_monolingual_v1",
+            "voice_settings": voice_settings_override,
+        })
+    elif tts_provider == KOKORO_PROVIDER:
+        params.update({
+            "kokoro_voice": kokoro_voice,
+            "kokoro_lang": kokoro_lang,
+            "long_form": bool(long_form),
+        })
+        # ONNX Runtime output differs from PyTorch's in the last bits; keep them apart
+        if resolve_kokoro_backend(kokoro_backend) != "torch":
+            params["backend"] = resolve_kokoro_backend(kokoro_backend)
+    elif tts_provider == CHATTERBOX_PROVIDER:
+        params.update({
+            "exaggeration": chatterbox_exaggeration,
+            "cfg_weight": chatterbox_cfg_weight,
+            "temperature": chatterbox_temperature,
+            # The clip's content, not its name, decides the cloned voice
+            "audio_prompt_sha256": audio_prompt_sha256,
+            "long_form": bool(long_form),
+        })
+        # int8 weights change the audio slightly; full-precision profiles share entries
+        if profile_is_quantized(chatterbox_profile):
+            params["quantization"] = "int8-dynamic"
+        # Chunk boundaries and the seed decide the sampled audio
+        if constant_memory:
+            params["constant_memory"] = {"max_tokens": chatterbox_chunk_tokens(), "seed": chatterbox_seed()}
+    # Sentence-by-sentence rendering differs from whole-text and long-form output
+    if incremental and tts_provider in (KOKORO_PROVIDER, CHATTERBOX_PROVIDER):
+        params["incremental"] = True
+    # Local and system-voice audio is written through the post-processor; ElevenLabs MP3 is saved as sent
+    if tts_provider in (MAC_PROVIDER, KOKORO_PROVIDER, CHATTERBOX_PROVIDER):
+        post_processing = post_processing_cache_params()
+        if post_processing:
+            params["post_processing"] = post_processing
+    return params
+
+
+def _remove_partial(filepath):
+    if filepath.exists():
+        try:
+            filepath.unlink()
+        except Exception:
+            pass
+
+
+@records_stage_timings
+def synthesize_to_file(text, speed_setting, tts_provider, api_key=None, voice_id=None, model_id=None,
+                       voice_settings_override=None, audio_prompt_path=None, long_form=False, workers=None,
+                       kokoro_voice='af_heart', kokoro_lang='a', chatterbox_exaggeration=0.5,
+                       chatterbox_cfg_weight=0.5, chatterbox_temperature=0.8, audio_dir=DEFAULT_AUDIO_DIR,
+                       on_segment=None, progress=None, audio_prompt_bytes=None, audio_prompt_name=None,
+                       chatterbox_profile=None, kokoro_backend=None, on_first_audio=None, claim=None,
+                       incremental=False, previous_text=None, constant_memory=False):
+    """Synthesize text, save the audio and its history entry, and return (filepath, metadata)
+
+    A Chatterbox reference clip is given as audio_prompt_path or, for
+    uploads, as audio_prompt_bytes (with its original audio_prompt_name);
+    its conditioning is cached by content hash in voice_conditioning.
+    chatterbox_profile picks an inference_profiles profile (default:
+    ``TTS_CHATTERBOX_PROFILE``) and kokoro_backend runs Kokoro on
+    ``torch`` or ``onnx`` (default: ``TTS_KOKORO_BACKEND``). With
+    incremental, Kokoro and Chatterbox render sentence by sentence and reuse
+    the cached audio of sentences they rendered before (see incremental.py);
+    previous_text, the version this text was edited from, is diffed for the
+    history entry. constant_memory makes Chatterbox render token-budgeted
+    chunks one after another with a fixed seed, appending each to the file,
+    so memory stays flat however long the text is (``TTS_CHATTERBOX_CHUNK_TOKENS``,
+    ``TTS_CHATTERBOX_SEED``).
+
+    on_segment(audio, sample_rate) receives each segment of local-engine audio
+    as soon as it is synthesized. progress(done, total) is called as segments
+    or chunks complete. on_first_audio() is called once, when the first
+    segment or streamed byte of audio exists. claim() is called once the
+    audio is complete, before anything is recorded: it returns a dict merged
+    into the metadata, or raises SynthesisCancelled to discard the result
+    (hedging keeps only the first finisher). Raises SynthesisError on failure
+    and SynthesisCancelled if the calling job is cancelled; partial files are
+    removed in both cases. Per-stage timings are stored in metadata["timings"].
+    """
+    request_start = time.perf_counter()
+    first_audio_seconds = None
+    audio_started = False
+
+    def note_audio_started():
+        nonlocal audio_started
+        if not audio_started:
+            audio_started = True
+            if on_first_audio is not None:
+                on_first_audio()
+
+    def emit_segment(audio, sample_rate):
+        nonlocal first_audio_seconds
+        if first_audio_seconds is None:
+            first_audio_seconds = time.perf_counter() - request_start
+        note_audio_started()
+        if on_segment is not None:
+            on_segment(audio, sample_rate)
+
+    def report(done, total):
+        if progress is not None:
+            progress(done, max(done, total))
+
+    audio_dir = ensure_audio_directory(audio_dir)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Random suffix keeps filenames unique when several sessions submit in the same second
+    entry_id = new_entry_id()
+    file_stem = f"{timestamp}_{entry_id[:8]}"
+    long_form_stats = None
+    incremental_stats = None
+    audio_prompt_sha256 = None
+    if tts_provider == CHATTERBOX_PROVIDER:
+        audio_prompt_sha256 = reference_audio_key(audio_prompt_bytes, audio_prompt_path)
+        chatterbox_profile = resolve_chatterbox_profile(chatterbox_profile)
+    elif tts_provider == KOKORO_PROVIDER:
+        kokoro_backend = resolve_kokoro_backend(kokoro_backend)
+
+    # Identical requests reuse the file generated the first time
+    with stage("cache_lookup"):
+        synthesis_cache = get_synthesis_cache(audio_dir)
+        cache_key = synthesis_cache_key(
+            text,
+            tts_provider,
+            synthesis_cache_params(
+                tts_provider, speed_setting, voice_id, model_id, voice_settings_override, audio_prompt_sha256,
+                long_form, kokoro_voice, kokoro_lang, chatterbox_exaggeration, chatterbox_cfg_weight,
+                chatterbox_temperature, chatterbox_profile, kokoro_backend, incremental, constant_memory,
+            ),
+        )
+        cached_filename = synthesis_cache.lookup(cache_key)
+    report(0, 1)
+
+    def segment_params():
+        # The same settings key each sentence, whichever text it came from
+        return synthesis_cache_params(
+            tts_provider, speed_setting, audio_prompt_sha256=audio_prompt_sha256, kokoro_voice=kokoro_voice,
+            kokoro_lang=kokoro_lang, chatterbox_exaggeration=chatterbox_exaggeration,
+            chatterbox_cfg_weight=chatterbox_cfg_weight, chatterbox_temperature=chatterbox_temperature,
+            chatterbox_profile=chatterbox_profile, kokoro_backend=kokoro_backend,
+        )
+
+    if cached_filename:
+        # The cached WAV may have been re-encoded since it was looked up
+        filepath = resolve_audio_path(audio_dir / cached_filename)
+        filename = filepath.name
+        note_audio_started()
+    elif tts_provider == MAC_PROVIDER:
+        # One engine process, no shell: text in on stdin, PCM out of a pipe into the WAV writer
+        filename = f"tts_mac_{file_stem}.wav"
+        filepath = audio_dir / filename
+        try:
+            with SystemVoiceStream(system_voice_engine(), text, speed_setting, system_voice_name()) as voice_stream:
+                def system_voice_chunks():
+                    for chunk in voice_stream.chunks():
+                        check_cancelled()
+                        yield chunk
+
+                write_chunks_to_wav(
+                    filepath.resolve(), system_voice_chunks(), voice_stream.sample_rate, silence_ms=0,
+                    on_chunk=emit_segment,
+                )
+        except SynthesisCancelled:
+            _remove_partial(filepath)
+            raise
+        except SystemVoiceError as e:
+            _remove_partial(filepath)
+            raise SynthesisError(f"System voice failed: {e}")
+
+    elif tts_provider == ELEVENLABS_PROVIDER:
+        filename = f"tts_elevenlabs_{file_stem}.mp3"
+        filepath = audio_dir / filename
+
+        # Chunks are written to disk as they arrive from the streaming endpoint
+        with stage("network"):
+            written = stream_speech_to_file(
+                text,
+                api_key,
+                voice_id,
+                filepath,
+                speed_setting=speed_setting,
+                model_id=model_id,
+                voice_settings_override=voice_settings_override,
+                on_chunk=lambda chunk: note_audio_started(),
+                should_stop=current_stop_check(),
+            )
+        check_cancelled()
+        if written is None:
+            raise SynthesisError("ElevenLabs request failed. Check your API key and quota.")
+    elif tts_provider == CHATTERBOX_PROVIDER:
+        # Lazy import to avoid heavy import on non-Chatterbox paths
+        try:
+            with stage("import"):
+                importlib.import_module("chatterbox.tts")  # fail fast here if the package is missing
+        except Exception as e:
+            raise SynthesisError(f"Chatterbox not installed or failed to import: {e}")
+
+        filename = f"tts_chatterbox_{file_stem}.wav"
+        filepath = audio_dir / filename
+
+        try:
+            device, profile = chatterbox_engine_args(chatterbox_profile)
+
+            # Shared across reruns and sessions; only the first request pays the load
+            with stage("model_load"):
+                model = get_engine_registry().get(tts_provider, device=device, profile=profile)
+            # Cloned-voice conditioning is computed once per distinct clip
+            with stage("voice_conditioning"):
+                conditionals = get_voice_conditioning_cache(audio_dir).conditionals_for(
+                    model,
+                    chatterbox_exaggeration,
+                    audio_bytes=audio_prompt_bytes,
+                    audio_path=audio_prompt_path,
+                    key=audio_prompt_sha256,
+                    suffix=Path(audio_prompt_name or audio_prompt_path or "clip.wav").suffix or ".wav",
+                )
+
+            if incremental:
+                # Only sentences missing from the segment cache are generated
+                chunk_synth = make_chatterbox_chunk_synth(
+                    model,
+                    conditionals=conditionals,
+                    exaggeration=chatterbox_exaggeration,
+                    cfg_weight=chatterbox_cfg_weight,
+                    temperature=chatterbox_temperature,
+                )
+                incremental_stats = synthesize_incremental(
+                    text, chunk_synth, filepath, model.sr, get_segment_cache(audio_dir), tts_provider,
+                    segment_params(), previous_text=previous_text, workers=workers, on_chunk=emit_segment,
+                    progress=report,
+                )
+            elif constant_memory:
+                # One token-budgeted chunk in memory at a time, appended to the file as it completes
+                chunk_synth = make_chatterbox_chunk_synth(
+                    model,
+                    conditionals=conditionals,
+                    exaggeration=chatterbox_exaggeration,
+                    cfg_weight=chatterbox_cfg_weight,
+                    temperature=chatterbox_temperature,
+                    seed=chatterbox_seed(),
+                )
+                long_form_stats = synthesize_sequential(
+                    text, chunk_synth, filepath, model.sr, chatterbox_token_counter(model),
+                    max_tokens=chatterbox_chunk_tokens(), on_chunk=emit_segment, progress=report,
+                )
+            elif long_form:
+                # Sentence chunks rendered on a worker pool, reassembled in order
+                chunk_synth = make_chatterbox_chunk_synth(
+                    model,
+                    conditionals=conditionals,
+                    exaggeration=chatterbox_exaggeration,
+                    cfg_weight=chatterbox_cfg_weight,
+                    temperature=chatterbox_temperature,
+                )
+                long_form_stats = synthesize_long_form(
+                    text, chunk_synth, filepath, model.sr, workers=workers, on_chunk=emit_segment, progress=report,
+                )
+            else:
+                # Generate audio
+                with stage("inference"), using_conditionals(model, conditionals):
+                    wav = model.generate(
+                        text,
+                        exaggeration=chatterbox_exaggeration,
+                        cfg_weight=chatterbox_cfg_weight,
+                        temperature=chatterbox_temperature,
+                        repetition_penalty=1.2,
+                        min_p=0.05,
+                        top_p=1.0,
+                    )
+
+                # Save audio file through the shared post-processing stage
+                write_chunks_to_wav(filepath, [wav.squeeze(0).detach().cpu().numpy()], model.sr, silence_ms=0)
+
+        except SynthesisCancelled:
+            _remove_partial(filepath)
+            raise
+        except Exception as e:
+            _remove_partial(filepath)
+            raise SynthesisError(f"Chatterbox generation failed: {e}")
+    else:  # Kokoro
+        # Lazy import to avoid heavy import on non-Kokoro paths
+        try:
+            with stage("import"):
+                importlib.import_module("kokoro")  # fail fast here if the package is missing
+        except Exception as e:
+            raise SynthesisError(f"Kokoro not installed or failed to import: {e}")
+
+        filename = f"tts_kokoro_{file_stem}.wav"
+        filepath = audio_dir / filename
+
+        try:
+            engine = KOKORO_ONNX_ENGINE if kokoro_backend == "onnx" else tts_provider
+            with stage("model_load"):
+                pipeline = get_engine_registry().get(engine, lang_code=kokoro_lang)
+                # Repeated sentences reuse their phonemes instead of re-running G2P
+                install_g2p_cache(pipeline, kokoro_lang, get_g2p_cache(audio_dir))
+                # Forward passes from all sessions share one batching queue per model
+                install_batching(pipeline)
+            if incremental:
+                # Only sentences missing from the segment cache are synthesized
+                incremental_stats = synthesize_incremental(
+                    text, make_kokoro_chunk_synth(pipeline, kokoro_voice, speed_setting), filepath.resolve(), 24000,
+                    get_segment_cache(audio_dir), tts_provider, segment_params(), previous_text=previous_text,
+                    workers=workers, on_chunk=emit_segment, progress=report,
+                )
+            elif long_form:
+                # Sentence chunks rendered on a worker pool, reassembled in order
+                chunk_synth = make_kokoro_chunk_synth(pipeline, kokoro_voice, speed_setting)
+                long_form_stats = synthesize_long_form(
+                    text, chunk_synth, filepath.resolve(), 24000, workers=workers, on_chunk=emit_segment, progress=report,
+                )
+            else:
+                # Kokoro yields at least one segment per non-empty line
+                expected_segments = sum(1 for line in text.splitlines() if line.strip()) or 1
+
+                def kokoro_segments():
+                    for result in pipeline(text, voice=kokoro_voice, speed=speed_setting, split_pattern=r"\n+"):
+                        check_cancelled()
+                        if result.audio is not None:
+                            yield result.audio.numpy()
+
+                # Written as 24kHz mono 16-bit PCM WAV (per Kokoro README), one
+                # segment at a time, with no pause added between lines
+                write_chunks_to_wav(
+                    filepath.resolve(), kokoro_segments(), 24000, silence_ms=0, on_chunk=emit_segment,
+                    progress=report, total_chunks=expected_segments,
+                )
+        except SynthesisCancelled:
+            _remove_partial(filepath)
+            raise
+        except Exception as e:
+            _remove_partial(filepath)
+            raise SynthesisError(f"Kokoro generation failed: {e}")
+
+    if not filepath.exists():
+        raise SynthesisError(f"{tts_provider} did not produce an audio file")
+
+    claimed = {}
+    if claim is not None:
+        try:
+            claimed = claim() or {}
+        except SynthesisCancelled:
+            # A cached file belongs to earlier entries; only new audio is ours to remove
+            if not cached_filename:
+                _remove_partial(filepath)
+            raise
+
+    if not cached_filename:
+        with stage("cache_store"):
+            synthesis_cache.store(cache_key, filename)
+
+    # Without segment streaming, the first audio is the finished file
+    if first_audio_seconds is None:
+        first_audio_seconds = time.perf_counter() - request_start
+    report(1, 1)
+
+    # A cache hit reports what the entry that made the file recorded; encoded
+    # files have no header to read it from cheaply
+    audio_seconds = get_history_store(audio_dir).audio_seconds_of(filename) if cached_filename else None
+    if audio_seconds is None:
+        audio_seconds = audio_duration_seconds(filepath)
+    metadata = {
+        "id": entry_id,
+        "filename": filename,
+        "text": text,
+        "title": generate_title_from_text(text),
+        "speed": speed_setting,
+        "provider": tts_provider,
+        "timestamp": timestamp,
+        "created": datetime.datetime.now().isoformat(),
+        "voice_id": voice_id if tts_provider == ELEVENLABS_PROVIDER else None,
+        "kokoro_voice": kokoro_voice if tts_provider == KOKORO_PROVIDER else None,
+        "kokoro_lang": kokoro_lang if tts_provider == KOKORO_PROVIDER else None,
+        "kokoro_backend": kokoro_backend if tts_provider == KOKORO_PROVIDER else None,
+        "chatterbox_exaggeration": chatterbox_exaggeration if tts_provider == CHATTERBOX_PROVIDER else None,
+        "chatterbox_cfg_weight": chatterbox_cfg_weight if tts_provider == CHATTERBOX_PROVIDER else None,
+        "chatterbox_temperature": chatterbox_temperature if tts_provider == CHATTERBOX_PROVIDER else None,
+        "chatterbox_profile": chatterbox_profile if tts_provider == CHATTERBOX_PROVIDER else None,
+        "audio_prompt_path": audio_prompt_path if tts_provider == CHATTERBOX_PROVIDER else None,
+        "audio_prompt_name": audio_prompt_name if tts_provider == CHATTERBOX_PROVIDER else None,
+        "audio_prompt_sha256": audio_prompt_sha256,
+        "long_form": long_form_stats,
+        "incremental": incremental_stats,
+        "cache_hit": bool(cached_filename),
+        "time_to_first_audio": round(first_audio_seconds, 3),
+        "codec": codec_for_path(filepath),
+        "audio_seconds": audio_seconds,
+    }
+    metadata.update(claimed)
+    timings = current_timings()
+    metadata["timings"] = timings.as_dict(total=time.perf_counter() - request_start)
+
+    with stage("history_write"):
+        get_history_store(audio_dir).add(metadata)
+    # The stored entry cannot include its own write; the live metrics do
+    get_metrics().observe_request(
+        tts_provider, timings.as_dict(total=time.perf_counter() - request_start), cache_hit=bool(cached_filename)
+    )
+    # First-request latency per provider, for regressions in start-up work
+    get_startup_stats().note_request(tts_provider, metadata["timings"], cache_hit=bool(cached_filename))
+
+    # Compress new WAVs off the request path; the entry is repointed when done
+    encoder = get_audio_encoder(audio_dir)
+    if encoder is not None and not cached_filename and filepath.suffix.lower() == ".wav":
+        encoder.submit(filename)
+
+    return filepath, metadata
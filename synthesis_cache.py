@@ -0,0 +1,193 @@
+"""Content-addressed cache mapping synthesis requests to files already in saved_audio/.
+
+A request is identified by a SHA-256 over the normalized text, the provider and
+every parameter that changes the audio. Identical requests reuse the existing
+file instead of regenerating it, which for ElevenLabs also saves paid quota.
+The index is a small SQLite database next to the audio files; entries are
+evicted least-recently-used once the entry or size limit is exceeded. Eviction
+only drops the index entry: the audio file belongs to the history entries that
+reference it and is removed when the last of them is deleted.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+DEFAULT_MAX_MB = 2048
+DEFAULT_MAX_ENTRIES = 10000
+
+
+def normalize_text(text):
+    """Collapse whitespace so cosmetic edits still hit the cache"""
+    return " ".join(text.split())
+
+
+def file_sha256(path, block_size=1 << 20):
+    """Hash a file's contents (used for reference audio, whose temp path is reused)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def synthesis_cache_key(text, provider, params):
+    """Return the cache key for a request; params must be JSON serializable"""
+    payload = json.dumps(
+        {"text": normalize_text(text), "provider": provider, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SynthesisCache:
+    """LRU index of generated audio files keyed by request hash"""
+
+    def __init__(self, audio_dir, max_mb=DEFAULT_MAX_MB, max_entries=DEFAULT_MAX_ENTRIES):
+        self.audio_dir = Path(audio_dir)
+        self.db_path = self.audio_dir / "synthesis_cache.sqlite3"
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.audio_dir.mkdir(exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " filename TEXT NOT NULL,"
+                " size_bytes INTEGER NOT NULL,"
+                " created REAL NOT NULL,"
+                " last_used REAL NOT NULL,"
+                " hits INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_filename ON entries (filename)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 and self.max_entries > 0
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:  # commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _bump(conn, name):
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1)"
+            " ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def lookup(self, key):
+        """Return the cached filename for key, or None on a miss"""
+        if not self.enabled:
+            return None
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT filename FROM entries WHERE key = ?", (key,)).fetchone()
+            if row and (self.audio_dir / row[0]).exists():
+                conn.execute(
+                    "UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?",
+                    (time.time(), key),
+                )
+                self._bump(conn, "hits")
+                return row[0]
+            if row:
+                # The file was deleted behind our back; treat as a miss
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._bump(conn, "misses")
+            return None
+
+    def store(self, key, filename):
+        """Record a freshly generated file and evict old entries beyond the limits"""
+        if not self.enabled:
+            return
+        path = self.audio_dir / filename
+        if not path.exists():
+            return
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, filename, size_bytes, created, last_used, hits)"
+                " VALUES (?, ?, ?, ?, ?, 0)",
+                (key, filename, path.stat().st_size, now, now),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM entries").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size_bytes FROM entries ORDER BY last_used ASC").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._bump(conn, "evictions")
+            count -= 1
+            total -= size
+
+    def rename_file(self, old_filename, new_filename):
+        """Repoint entries at a re-encoded copy of their file"""
+        path = self.audio_dir / new_filename
+        if not path.exists():
+            return
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE entries SET filename = ?, size_bytes = ? WHERE filename = ?",
+                (new_filename, path.stat().st_size, old_filename),
+            )
+
+    def forget_file(self, filename):
+        """Drop every entry pointing at filename (called when a file is deleted)"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE filename = ?", (filename,))
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current size"""
+        with self._lock, self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            count, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM entries"
+            ).fetchone()
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "entries": count,
+            "size_mb": round(total / (1024 * 1024), 1),
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_synthesis_cache(audio_dir):
+    """Return the process-wide cache for audio_dir
+
+    Limits come from ``TTS_SYNTHESIS_CACHE_MAX_MB`` and
+    ``TTS_SYNTHESIS_CACHE_MAX_ENTRIES``; setting either to 0 disables caching.
+    """
+    key = str(Path(audio_dir).resolve())
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = SynthesisCache(
+                audio_dir,
+                max_mb=float(os.environ.get("TTS_SYNTHESIS_CACHE_MAX_MB", DEFAULT_MAX_MB)),
+                max_entries=int(os.environ.get("TTS_SYNTHESIS_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            )
+        return _caches[key]
@@ -0,0 +1,289 @@
+"""System voices (macOS ``say``, ``espeak-ng`` on Linux) read straight from a pipe.
+
+The Mac provider used to run two shell commands per request: ``say -o
+x.aiff "<text>"`` and then ``afconvert`` to WAV. That meant an AIFF round
+trip through the disk, a second process, text pasted into a shell command
+line (quotes broke it) and no way to run on Linux servers. Here one engine
+process runs without a shell: the text goes in on stdin, 16-bit PCM comes
+back on stdout and is handed to the caller's WAV writer chunk by chunk.
+
+Engines (``TTS_SYSTEM_VOICE_ENGINE``):
+
+  * ``say``        macOS; writes CAF (16-bit little-endian PCM) to /dev/stdout
+  * ``espeak-ng``  Linux (and anywhere it is installed); ``--stdout`` WAV
+  * ``auto``       say on macOS, otherwise espeak-ng if it is on the PATH
+
+``TTS_SYSTEM_VOICE`` picks the engine's voice (e.g. ``Samantha`` or
+``en-us``); empty means the system default. Running processes are tracked so
+the app's Stop button ends this server's speech and nothing else.
+"""
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+from cancellation import SynthesisCancelled
+
+DEFAULT_SYSTEM_VOICE_ENGINE = "auto"
+# Bytes read from the pipe per chunk: ~0.2 s of 22.05 kHz mono audio
+CHUNK_BYTES = 8192
+# Tail of the engine's stderr quoted in error messages
+STDERR_TAIL_BYTES = 2000
+
+
+class SystemVoiceError(Exception):
+    """The system voice engine is missing, failed, or wrote something we cannot read"""
+
+
+def _read_exact(stream, n):
+    data = b""
+    while len(data) < n:
+        block = stream.read(n - len(data))
+        if not block:
+            raise SystemVoiceError("audio stream ended inside its header")
+        data += block
+    return data
+
+
+def _skip(stream, n):
+    while n > 0:
+        n -= len(_read_exact(stream, min(n, 65536)))
+
+
+class SystemVoiceEngine:
+    """One command-line engine: how to run it and how to find the PCM in what it writes"""
+
+    name = None
+    executable = None
+    # Speaking rate at 1.0x, in words per minute
+    base_wpm = 175
+
+    def available(self):
+        return shutil.which(self.executable) is not None
+
+    def command(self, wpm, voice=None):
+        """Return the argv that reads UTF-8 text from stdin and writes audio to stdout"""
+        raise NotImplementedError
+
+    def read_header(self, stream):
+        """Consume the container header; return (sample_rate, channels, byteorder) of the 16-bit PCM that follows"""
+        raise NotImplementedError
+
+
+class SayEngine(SystemVoiceEngine):
+    name = "say"
+    executable = "say"
+    base_wpm = 150
+
+    def command(self, wpm, voice=None):
+        argv = [self.executable, "-r", str(wpm), "-f", "-", "-o", "/dev/stdout",
+                "--file-format=caff", "--data-format=LEI16@22050"]
+        if voice:
+            argv += ["-v", voice]
+        return argv
+
+    def read_header(self, stream):
+        # CAF: 'caff' + version/flags, then chunks of (type, int64 size); a
+        # streamed 'data' chunk has size -1 and starts with a 4-byte edit count
+        if _read_exact(stream, 8)[:4] != b"caff":
+            raise SystemVoiceError("say did not write a CAF stream")
+        sample_rate = channels = None
+        byteorder = "little"
+        while True:
+            chunk_type, size = struct.unpack(">4sq", _read_exact(stream, 12))
+            if chunk_type == b"desc":
+                desc = _read_exact(stream, size)
+                rate, format_id, flags, _, _, channels, bits = struct.unpack(">d4sIIIII", desc[:32])
+                if format_id != b"lpcm" or bits != 16 or flags & 1:
+                    raise SystemVoiceError(f"say wrote unsupported audio ({format_id!r}, {bits}-bit)")
+                sample_rate = int(rate)
+                byteorder = "little" if flags & 2 else "big"
+            elif chunk_type == b"data":
+                if sample_rate is None:
+                    raise SystemVoiceError("CAF stream has no format description")
+                _read_exact(stream, 4)
+                return sample_rate, channels, byteorder
+            else:
+                _skip(stream, size)
+
+
+class EspeakNgEngine(SystemVoiceEngine):
+    name = "espeak-ng"
+    executable = "espeak-ng"
+    base_wpm = 175
+
+    def command(self, wpm, voice=None):
+        argv = [self.executable, "--stdin", "--stdout", "-b", "1", "-s", str(wpm)]
+        if voice:
+            argv += ["-v", voice]
+        return argv
+
+    def read_header(self, stream):
+        # espeak-ng writes the WAV header before it knows the length, so the
+        # sizes are placeholders and the data runs to the end of the stream
+        riff = _read_exact(stream, 12)
+        if riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            raise SystemVoiceError("espeak-ng did not write a WAV stream")
+        sample_rate = channels = None
+        while True:
+            chunk_id, size = struct.unpack("<4sI", _read_exact(stream, 8))
+            if chunk_id == b"fmt ":
+                fmt = _read_exact(stream, size + (size & 1))
+                format_tag, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+                if format_tag != 1 or bits != 16:
+                    raise SystemVoiceError(f"espeak-ng wrote unsupported audio (format {format_tag}, {bits}-bit)")
+            elif chunk_id == b"data":
+                if sample_rate is None:
+                    raise SystemVoiceError("WAV stream has no fmt chunk")
+                return sample_rate, channels, "little"
+            else:
+                _skip(stream, size + (size & 1))
+
+
+ENGINES = {engine.name: engine for engine in (SayEngine(), EspeakNgEngine())}
+
+_running = set()  # SystemVoiceStreams whose engine may still be speaking
+_running_lock = threading.Lock()
+
+
+def system_voice_engine(name=None):
+    """Return the engine for name, else ``TTS_SYSTEM_VOICE_ENGINE``, else the platform's; raise SystemVoiceError if none"""
+    name = (name or os.environ.get("TTS_SYSTEM_VOICE_ENGINE", DEFAULT_SYSTEM_VOICE_ENGINE)).strip().lower()
+    if name in ("", "auto"):
+        candidates = [ENGINES["say"]] if sys.platform == "darwin" else []
+        candidates.append(ENGINES["espeak-ng"])
+        for engine in candidates:
+            if engine.available():
+                return engine
+        raise SystemVoiceError("No system voice found: install espeak-ng (apt install espeak-ng) or run on macOS")
+    engine = ENGINES.get(name)
+    if engine is None:
+        raise SystemVoiceError(f"Unknown system voice engine {name!r}; choose one of: auto, {', '.join(ENGINES)}")
+    if not engine.available():
+        raise SystemVoiceError(f"System voice engine {name!r} is not installed")
+    return engine
+
+
+def system_voice_name():
+    """Return the configured ``TTS_SYSTEM_VOICE``, or None for the engine's default"""
+    return os.environ.get("TTS_SYSTEM_VOICE", "").strip() or None
+
+
+class SystemVoiceStream:
+    """A running engine: sample_rate is known on construction, chunks() yields float32 audio until it finishes
+
+    Use as a context manager; leaving it early (an error, a cancelled job)
+    kills the process. If stop_system_voices() kills it, reading raises
+    SynthesisCancelled.
+    """
+
+    def __init__(self, engine, text, speed=1.0, voice=None):
+        self.engine = engine
+        self.stopped = False
+        argv = engine.command(max(1, int(engine.base_wpm * speed)), voice)
+        # stderr goes to a file, not a pipe: nobody reads it while the engine
+        # runs, and a chatty engine would block once a pipe buffer filled up
+        self._stderr = tempfile.TemporaryFile()
+        try:
+            self.process = subprocess.Popen(argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=self._stderr)
+        except OSError as e:
+            self._stderr.close()
+            raise SystemVoiceError(f"Could not start {engine.name}: {e}")
+        with _running_lock:
+            _running.add(self)
+        # Fed from a thread so a long text cannot deadlock against a full stdout pipe
+        self._feeder = threading.Thread(target=self._feed, args=(text.encode("utf-8"),), daemon=True)
+        self._feeder.start()
+        try:
+            self.sample_rate, self.channels, self.byteorder = engine.read_header(self.process.stdout)
+        except SystemVoiceError as e:
+            self.process.kill()
+            self.process.wait()
+            message = f"{e}{self._stderr_suffix()}"
+            self.close()
+            if self.stopped:
+                raise SynthesisCancelled()
+            raise SystemVoiceError(message)
+
+    def _feed(self, data):
+        try:
+            self.process.stdin.write(data)
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError, ValueError):
+            pass  # The engine exited (or was stopped) before reading everything
+
+    def _stderr_suffix(self):
+        # Only called once the process has exited, so the file is complete
+        try:
+            size = self._stderr.seek(0, os.SEEK_END)
+            self._stderr.seek(max(0, size - STDERR_TAIL_BYTES))
+            message = self._stderr.read().decode("utf-8", "replace").strip()
+        except (OSError, ValueError):
+            message = ""
+        return f": {message}" if message else ""
+
+    def chunks(self, chunk_bytes=CHUNK_BYTES):
+        """Yield float32 mono chunks as the engine writes them"""
+        dtype = np.dtype("<i2" if self.byteorder == "little" else ">i2")
+        frame_bytes = 2 * max(1, self.channels or 1)
+        chunk_bytes = max(frame_bytes, chunk_bytes - chunk_bytes % frame_bytes)
+        pending = b""
+        while True:
+            block = self.process.stdout.read1(chunk_bytes)
+            if not block:
+                break
+            pending += block
+            usable = len(pending) - len(pending) % frame_bytes
+            if not usable:
+                continue
+            samples = np.frombuffer(pending[:usable], dtype=dtype).astype(np.float32) / 32768.0
+            pending = pending[usable:]
+            if frame_bytes > 2:
+                samples = samples.reshape(-1, frame_bytes // 2).mean(axis=1)
+            yield samples
+        if self.process.wait() != 0:
+            if self.stopped:
+                raise SynthesisCancelled()
+            raise SystemVoiceError(f"{self.engine.name} exited with status {self.process.returncode}{self._stderr_suffix()}")
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        for pipe in (self.process.stdout, self._stderr):
+            try:
+                pipe.close()
+            except Exception:
+                pass
+        with _running_lock:
+            _running.discard(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def stop_system_voices():
+    """Kill every system voice process this server started; return how many were running"""
+    with _running_lock:
+        streams = list(_running)
+    stopped = 0
+    for stream in streams:
+        if stream.process.poll() is None:
+            stream.stopped = True
+            stream.process.kill()
+            stopped += 1
+    return stopped
+
+
+def system_voice_running():
+    with _running_lock:
+        return any(stream.process.poll() is None for stream in _running)
@@ -0,0 +1,60 @@
+"""Static voice tables for the UI.
+
+These used to be literals inside streamlit_app.py, rebuilt on every rerun.
+As module constants they are built once per server process.
+"""
+import functools
+
+# Kokoro voices per language, as shown in the language selector
+KOKORO_VOICES = {
+    "🇺🇸 American English (en-us)": {
+        "code": "a",
+        "female": ["af_alloy", "af_aoede", "af_bella", "af_heart", "af_jessica", "af_kore", "af_nicole", "af_nova", "af_river", "af_sarah", "af_sky"],
+        "male": ["am_adam", "am_echo", "am_eric", "am_fenrir", "am_liam", "am_michael", "am_onyx", "am_puck"]
+    },
+    "🇬🇧 British English (en-gb)": {
+        "code": "b",
+        "female": ["bf_alice", "bf_emma", "bf_isabella", "bf_lily"],
+        "male": ["bm_daniel", "bm_fable", "bm_george", "bm_lewis"]
+    },
+    "🇫🇷 French (fr-fr)": {
+        "code": "fr",
+        "female": ["ff_siwis"],
+        "male": []
+    },
+    "🇮🇹 Italian (it)": {
+        "code": "it",
+        "female": ["if_sara"],
+        "male": ["im_nicola"]
+    },
+    "🇯🇵 Japanese (ja)": {
+        "code": "ja",
+        "female": ["jf_alpha", "jf_gongitsune", "jf_nezumi", "jf_tebukuro"],
+        "male": ["jm_kumo"]
+    },
+    "🇨🇳 Chinese (cmn)": {
+        "code": "cmn",
+        "female": ["zf_xiaobei", "zf_xiaoni", "zf_xiaoxiao", "zf_xiaoyi", "zm_yunjian", "zm_yunxi", "zm_yunxia", "zm_yunyang"],
+        "male": []
+    }
+}
+
+# Kokoro language code -> name, for the history page
+KOKORO_LANGUAGE_NAMES = {
+    'a': 'American English',
+    'b': 'British English',
+    'fr': 'French',
+    'it': 'Italian',
+    'ja': 'Japanese',
+    'cmn': 'Chinese'
+}
+
+
+@functools.lru_cache(maxsize=None)
+def kokoro_voice_options(language):
+    """Return ((display label, voice id), ...) for a KOKORO_VOICES language, female voices first"""
+    voices = KOKORO_VOICES[language]
+    return tuple(
+        [(f"  👩 {voice}", voice) for voice in voices["female"]]
+        + [(f"  👨 {voice}", voice) for voice in voices["male"]]
+    )
@@ -0,0 +1,279 @@
+"""Cache of Chatterbox voice-clone conditioning, keyed by a hash of the reference clip.
+
+model.generate(audio_prompt_path=...) re-runs prepare_conditionals() on every
+call: it decodes and resamples the clip, embeds the speaker and tokenizes the
+prompt speech. The result only depends on the clip's content, so it is
+computed once per distinct clip and kept in an LRU in memory and as a
+``<sha256>.pt`` file on disk (surviving restarts), both with size limits.
+Generation then sets ``model.conds`` from the cache and calls generate()
+without a prompt path, so repeat requests neither write the upload to disk
+nor re-encode it.
+
+The model is shared by every session, and ``model.conds`` is one slot on it.
+A per-model gate lets any number of generations run with the same
+conditioning at once while making a request for a different voice (or
+exaggeration) wait until they finish, so one session can never swap the
+voice out from under another.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import replace
+from pathlib import Path
+
+from synthesis_cache import file_sha256
+
+CACHE_DIRNAME = "voice_conditioning"
+DEFAULT_MEMORY_ENTRIES = 16
+DEFAULT_DISK_MB = 256
+
+
+def reference_audio_key(audio_bytes=None, audio_path=None):
+    """Return the cache key (sha256 of the content) for a reference clip given as bytes or a path"""
+    if audio_bytes is not None:
+        return hashlib.sha256(audio_bytes).hexdigest()
+    if audio_path:
+        return file_sha256(audio_path)
+    return None
+
+
+class _ConditioningGate:
+    """Shared/exclusive access to one model's ``conds`` slot
+
+    Holders of the same token run concurrently; a different token waits
+    until the current holders are done.
+    """
+
+    def __init__(self, default_conds):
+        self.default_conds = default_conds
+        self.default_variants = {}
+        self._cond = threading.Condition()
+        self._active = None
+        self._users = 0
+
+    @contextmanager
+    def hold(self, model, token, conds=None):
+        with self._cond:
+            while self._users and self._active is not token:
+                self._cond.wait()
+            self._active = token
+            self._users += 1
+            if conds is not None:
+                model.conds = conds
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._users -= 1
+                if not self._users:
+                    self._active = None
+                    self._cond.notify_all()
+
+
+_gates_lock = threading.Lock()
+
+
+def conditioning_gate(model):
+    """Return the model's gate, snapshotting its built-in voice the first time"""
+    with _gates_lock:
+        gate = getattr(model, "_conditioning_gate", None)
+        if gate is None:
+            gate = _ConditioningGate(model.conds)
+            model._conditioning_gate = gate
+        return gate
+
+
+@contextmanager
+def using_conditionals(model, conds):
+    """Run the block with model.conds set to conds, excluding generations with other conditioning"""
+    with conditioning_gate(model).hold(model, conds, conds):
+        yield
+
+
+def with_exaggeration(conds, exaggeration):
+    """Return a copy of conds whose emotion setting matches exaggeration
+
+    generate() would otherwise rewrite ``conds.t3`` in place, mutating the
+    cached object that concurrent generations are using.
+    """
+    import torch
+
+    t3 = conds.t3
+    emotion = torch.full((1, 1, 1), float(exaggeration), device=t3.speaker_emb.device)
+    return replace(conds, t3=replace(t3, emotion_adv=emotion))
+
+
+def builtin_conditionals(model, exaggeration):
+    """Return the model's built-in voice at exaggeration (one shared object per value)"""
+    gate = conditioning_gate(model)
+    exaggeration = float(exaggeration)
+    with _gates_lock:
+        variant = gate.default_variants.get(exaggeration)
+        if variant is None:
+            variant = with_exaggeration(gate.default_conds, exaggeration)
+            gate.default_variants[exaggeration] = variant
+        return variant
+
+
+class VoiceConditioningCache:
+    """Two-level (memory LRU + disk) cache of Chatterbox Conditionals"""
+
+    def __init__(self, cache_dir, max_memory_entries=DEFAULT_MEMORY_ENTRIES, max_disk_mb=DEFAULT_DISK_MB):
+        self.cache_dir = Path(cache_dir)
+        self.max_memory_entries = max(1, int(max_memory_entries))
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        # (device, key) -> {"base": Conditionals, "variants": {exaggeration: Conditionals}}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.compute_seconds = 0.0
+
+    def conditionals_for(self, model, exaggeration, audio_bytes=None, audio_path=None, key=None, suffix=".wav"):
+        """Return the Conditionals for a reference clip (or the built-in voice) at exaggeration
+
+        The clip is given as bytes (e.g. an upload, written to a temporary
+        file only on a cache miss) or as a path; key may be passed when its
+        hash is already known. The same object is returned for repeated
+        calls so concurrent generations with one voice share the gate.
+        """
+        if audio_bytes is None and not audio_path:
+            return builtin_conditionals(model, exaggeration)
+        key = key or reference_audio_key(audio_bytes, audio_path)
+        memory_key = (str(getattr(model, "device", "")), key)
+
+        entry = self._memory_get(memory_key)
+        if entry is None:
+            with self._lock:
+                key_lock = self._key_locks.setdefault(memory_key, threading.Lock())
+            # One computation per clip even when several sessions miss at once
+            with key_lock:
+                entry = self._memory_get(memory_key)
+                if entry is None:
+                    entry = self._load_or_compute(model, key, audio_bytes, audio_path, suffix)
+                    with self._lock:
+                        self._memory[memory_key] = entry
+                        while len(self._memory) > self.max_memory_entries:
+                            self._memory.popitem(last=False)
+
+        exaggeration = float(exaggeration)
+        with self._lock:
+            variant = entry["variants"].get(exaggeration)
+            if variant is None:
+                variant = with_exaggeration(entry["base"], exaggeration)
+                entry["variants"][exaggeration] = variant
+            return variant
+
+    def _memory_get(self, memory_key):
+        with self._lock:
+            entry = self._memory.get(memory_key)
+            if entry is not None:
+                self._memory.move_to_end(memory_key)
+                self.hits += 1
+            return entry
+
+    def _disk_path(self, key):
+        return self.cache_dir / f"{key}.pt"
+
+    def _load_or_compute(self, model, key, audio_bytes, audio_path, suffix):
+        gate = conditioning_gate(model)
+        disk_path = self._disk_path(key)
+        if disk_path.exists():
+            try:
+                from chatterbox.tts import Conditionals
+
+                conds = Conditionals.load(disk_path, map_location=model.device).to(model.device)
+                os.utime(disk_path)  # mark as recently used for disk eviction
+                with self._lock:
+                    self.disk_hits += 1
+                return {"base": conds, "variants": {}}
+            except Exception as e:
+                print(f"[voice_conditioning] ignoring unreadable {disk_path.name}: {e}")
+
+        start = time.perf_counter()
+        temp_path = None
+        try:
+            if audio_path is None:
+                # prepare_conditionals reads from a path; only a miss pays for this write
+                with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as temp_file:
+                    temp_file.write(audio_bytes)
+                    temp_path = temp_file.name
+            # prepare_conditionals writes model.conds, so nobody may be generating meanwhile
+            with gate.hold(model, object()):
+                model.prepare_conditionals(audio_path or temp_path)
+                conds = model.conds
+                model.conds = gate.default_conds
+        finally:
+            if temp_path:
+                os.unlink(temp_path)
+        with self._lock:
+            self.misses += 1
+            self.compute_seconds += time.perf_counter() - start
+
+        self._save_to_disk(key, conds)
+        return {"base": conds, "variants": {}}
+
+    def _save_to_disk(self, key, conds):
+        if self.max_disk_bytes <= 0:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            disk_path = self._disk_path(key)
+            partial = disk_path.with_suffix(".part")
+            conds.save(partial)
+            os.replace(partial, disk_path)
+            self._evict_disk()
+        except Exception as e:
+            print(f"[voice_conditioning] could not save {key[:12]}: {e}")
+
+    def _evict_disk(self):
+        # Least recently used (by mtime) first
+        files = sorted(self.cache_dir.glob("*.pt"), key=lambda path: path.stat().st_mtime)
+        total = sum(path.stat().st_size for path in files)
+        for path in files:
+            if total <= self.max_disk_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink()
+
+    def stats(self):
+        with self._lock:
+            memory_entries = len(self._memory)
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "memory_entries": memory_entries,
+                "disk_entries": len(list(self.cache_dir.glob("*.pt"))) if self.cache_dir.exists() else 0,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "avg_compute_seconds": self.compute_seconds / self.misses if self.misses else None,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_voice_conditioning_cache(audio_dir):
+    """Return the process-wide conditioning cache stored under audio_dir
+
+    Limits come from ``TTS_VOICE_CACHE_ENTRIES`` (in memory) and
+    ``TTS_VOICE_CACHE_MAX_MB`` (on disk).
+    """
+    cache_dir = Path(audio_dir) / CACHE_DIRNAME
+    key = str(cache_dir.resolve())
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = VoiceConditioningCache(
+                cache_dir,
+                max_memory_entries=int(os.environ.get("TTS_VOICE_CACHE_ENTRIES", DEFAULT_MEMORY_ENTRIES)),
+                max_disk_mb=float(os.environ.get("TTS_VOICE_CACHE_MAX_MB", DEFAULT_DISK_MB)),
+            )
+        return _caches[key]